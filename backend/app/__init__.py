@@ -1,6 +1,6 @@
 """
 Toon Parser UI Backend
-FastAPI application for token counting with Anthropic and Google Gemini.
+FastAPI application for token counting with Anthropic, Google Gemini and OpenAI.
 """
 
 __version__ = "1.0.0"
@@ -2,16 +2,122 @@
 Application configuration using pydantic-settings.
 """
 
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
-    # API Keys
-    ANTHROPIC_API_KEY: str
-    GOOGLE_API_KEY: str
+    # API Keys (a remote vendor is only available when its key is set)
+    ANTHROPIC_API_KEY: Optional[str] = None
+    GOOGLE_API_KEY: Optional[str] = None
+
+    # Vendor Plugin Settings (comma-separated, e.g. "anthropic,openai"; unset enables every
+    # vendor that is installed and, for remote vendors, has an API key)
+    ENABLED_VENDORS: Optional[str] = None
+
+    # Upstream Vendor API Settings (base URLs override the vendor endpoints, e.g. for a proxy)
+    ANTHROPIC_BASE_URL: Optional[str] = None
+    GOOGLE_BASE_URL: Optional[str] = None
+    UPSTREAM_TIMEOUT_SECONDS: float = 30.0
+    ANTHROPIC_BATCH_CONCURRENCY: int = 16
+    GOOGLE_BATCH_CONCURRENCY: int = 16
+    OPENAI_BATCH_CONCURRENCY: int = 4
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Upstream Connection Pool Settings (one pool per remote vendor; HTTP/2 needs httpx[http2])
+    UPSTREAM_POOL_SIZE: int = 100
+    UPSTREAM_POOL_KEEPALIVE: int = 20
+    UPSTREAM_KEEPALIVE_SECONDS: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_PREWARM_CONNECTIONS: int = 2
+
+    # Upstream Scheduler Settings (requests per second of 0 disables the rate limit)
+    ANTHROPIC_REQUESTS_PER_SECOND: float = 0.0
+    GOOGLE_REQUESTS_PER_SECOND: float = 0.0
+    ANTHROPIC_MAX_CONCURRENCY: int = 64
+    GOOGLE_MAX_CONCURRENCY: int = 64
+    UPSTREAM_MAX_RETRIES: int = 3
+    UPSTREAM_MAX_BACKOFF_SECONDS: float = 30.0
+
+    # Hedged Request Settings (Anthropic and Google; opt-in)
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_MAX_PERCENT: float = 5.0
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_WINDOW: int = 256
+
+    # Chunked Counting Settings
+    CHUNK_MIN_CHARS: int = 4096
+    CHUNK_MAX_CHARS: int = 65536
+    CHUNK_MASK_BITS: int = 8
+
+    # Packed Counting Settings (several texts per upstream request; verification recounts
+    # one in PACKED_VERIFY_EVERY packs unpacked, 0 disables it)
+    PACKED_MAX_TEXTS: int = 64
+    PACKED_MAX_CHARS: int = 400_000
+    PACKED_VERIFY_EVERY: int = 20
+
+    # Sampled Counting Settings (arrays with fewer records than SAMPLED_MIN_RECORDS are counted whole;
+    # SAMPLED_MAX_RECORDS caps the records counted per request)
+    SAMPLED_MIN_RECORDS: int = 2000
+    SAMPLED_STRATA: int = 4
+    SAMPLED_CLUSTER_SIZE: int = 25
+    SAMPLED_MAX_RECORDS: int = 1000
+
+    # Estimation Settings (calibration is kept in memory unless a path is set)
+    ESTIMATOR_STATE_PATH: Optional[str] = None
+    ESTIMATOR_SAVE_INTERVAL_SECONDS: float = 60.0
+    ESTIMATE_MAX_REFINEMENTS: int = 64
+
+    # Bulk NDJSON Counting Settings
+    BULK_CONCURRENCY: int = 32
+    BULK_MAX_LINE_BYTES: int = 16 * 1024 * 1024
+    BULK_MAX_FORMATS: int = 64
+
+    # Asynchronous Job Settings
+    JOB_WORKERS: int = 4
+    JOB_MAX_QUEUED: int = 1000
+    JOB_CONCURRENCY: int = 16
+    JOB_MAX_TEXTS: int = 100000
+    JOB_RETENTION_SECONDS: float = 3600.0
+    JOB_MAX_RETAINED: int = 1000
+
+    # Live Counting WebSocket Settings
+    LIVE_DEBOUNCE_MS: float = 150.0
+    LIVE_MAX_DELAY_MS: float = 1000.0
+    LIVE_MAX_TARGETS: int = 4
+    LIVE_MAX_FORMATS: int = 16
+
+    # Model Catalog Cache Settings
+    MODEL_CATALOG_TTL_SECONDS: float = 3600.0
+    MODEL_CATALOG_MAX_STALE_SECONDS: float = 7 * 86400.0
+    MODEL_CATALOG_PREFETCH: bool = True
+
+    # Token Count Cache Settings
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    TOKEN_CACHE_TTL_SECONDS: float = 86400.0
+
+    # Persistent Token Count Store Settings (disabled unless a path is set)
+    TOKEN_STORE_PATH: Optional[str] = None
+    TOKEN_STORE_MAX_BYTES: int = 256 * 1024 * 1024
+    TOKEN_STORE_FLUSH_BATCH_SIZE: int = 64
+    TOKEN_STORE_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # Metrics Settings
+    METRICS_ENABLED: bool = True
+
+    # Request Timing and Profiling Settings (profiles are written in folded stack format)
+    SERVER_TIMING_ENABLED: bool = False
+    PROFILE_SLOW_REQUESTS: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.05
+    PROFILE_THRESHOLD_MS: float = 1000.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_DIR: str = "profiles"
 
     # CORS Configuration
     CORS_ORIGINS: str = "*"
@@ -33,6 +139,13 @@ class Settings(BaseSettings):
             return ["*"]
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
+    @property
+    def enabled_vendors_list(self) -> Optional[List[str]]:
+        """Parse ENABLED_VENDORS into a list, or None if it is unset."""
+        if self.ENABLED_VENDORS is None:
+            return None
+        return [vendor.strip().lower() for vendor in self.ENABLED_VENDORS.split(",") if vendor.strip()]
+
 
 # Global settings instance
 settings = Settings()
@@ -0,0 +1,78 @@
+"""
+Cancellation of request handlers whose client has disconnected.
+
+Once FastAPI has read the request body, the only message left for the
+route to receive is ``http.disconnect``. ``CancelOnDisconnectRoute`` runs
+the handler as a task and watches for that message alongside it; if the
+client goes away first, the handler is cancelled, which cancels its
+outstanding upstream calls (including shared calls no other request still
+waits on), and a 499 (client closed request) is recorded.
+"""
+
+import asyncio
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.types import Receive
+
+from app import metrics
+from app.services.single_flight import cancel_abandoned
+from app.timing import TimedRoute
+
+# Nginx's status for requests the client abandoned; never reaches the client
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    """Return once the client disconnects."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+class CancelOnDisconnectRoute(APIRoute):
+    """APIRoute cancelling its handler when the client disconnects.
+
+    Routes that read the body themselves (a raw ``Request`` streamed by the
+    endpoint) are left alone, since watching would consume their body.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        has_body = self.body_field is not None
+        if not has_body and self.methods & {"POST", "PUT", "PATCH"}:
+            return handler
+        endpoint = self.path
+
+        async def cancellable_handler(request: Request) -> Response:
+            if has_body:
+                # FastAPI reuses the cached body, leaving only the disconnect to receive
+                await request.body()
+
+            # Counts of this request may stop their upstream calls once it is cancelled
+            token = cancel_abandoned.set(True)
+            try:
+                task = asyncio.ensure_future(handler(request))
+            finally:
+                cancel_abandoned.reset(token)
+            watcher = asyncio.ensure_future(_wait_for_disconnect(request.receive))
+            try:
+                await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not task.done():
+                    task.cancel()
+                watcher.cancel()
+                await asyncio.gather(task, watcher, return_exceptions=True)
+
+            if task.cancelled():
+                metrics.CLIENT_DISCONNECTS.labels(endpoint).inc()
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+            return task.result()
+
+        return cancellable_handler
+
+
+class TimedCancellableRoute(TimedRoute, CancelOnDisconnectRoute):
+    """TimedRoute whose handler is also cancelled when the client disconnects."""
@@ -0,0 +1,53 @@
+"""
+Fast JSON encoding of API responses.
+
+FastAPI encodes a returned model by validating it against the route's
+``response_model`` again, dumping it to Python objects and then to JSON
+text. Hot routes instead build their response model once (which validates
+it) and return ``model_response``, which serializes it straight to JSON
+bytes with pydantic-core. The ``response_model`` on the route still
+documents the schema, so the OpenAPI description is unchanged.
+
+Everything else is rendered with ``DefaultJSONResponse``: orjson when it
+is installed, otherwise the standard library encoder.
+"""
+
+import importlib.util
+from typing import Mapping, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+DefaultJSONResponse = ORJSONResponse if importlib.util.find_spec("orjson") is not None else JSONResponse
+
+
+def model_response(model: BaseModel, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Render an already validated response model as JSON.
+
+    Args:
+        model: Response model instance, validated when it was constructed
+        status_code: HTTP status code
+        headers: Extra response headers
+
+    Returns:
+        Response with the model's JSON encoding
+    """
+    return json_bytes_response(model.model_dump_json().encode(), status_code, headers)
+
+
+def json_bytes_response(
+    body: bytes,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Wrap pre-encoded JSON, such as a cached serialization, in a response.
+
+    Args:
+        body: JSON document
+        status_code: HTTP status code
+        headers: Extra response headers
+
+    Returns:
+        Response with the given body and a JSON content type
+    """
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
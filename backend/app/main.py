@@ -2,20 +2,43 @@
 Main FastAPI application for token counting.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from scalar_fastapi import get_scalar_api_reference
 
+from app import metrics
 from app.config import settings
-from app.routers import models_router, tokens_router
+from app.encoding import DefaultJSONResponse
+from app.profiling import SlowRequestProfiler
+from app.registry import ServiceRegistry
+from app.routers import models_router, tokens_router, convert_router, compare_router, jobs_router, live_router
+from app.services.plugins import VENDOR_PLUGINS
+from app.timing import TimingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: build and warm shared services, close them on shutdown."""
+    services = ServiceRegistry(settings)
+    app.state.services = services
+    await services.start()
+    try:
+        yield
+    finally:
+        await services.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="Token counting API for Anthropic and Google Gemini models",
+    description="Token counting API for Anthropic, Google Gemini and OpenAI models",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse,
 )
 
 # Configure CORS
@@ -27,9 +50,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.SERVER_TIMING_ENABLED or settings.PROFILE_SLOW_REQUESTS:
+    profiler = None
+    if settings.PROFILE_SLOW_REQUESTS:
+        profiler = SlowRequestProfiler(
+            threshold_seconds=settings.PROFILE_THRESHOLD_MS / 1000,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            interval_seconds=settings.PROFILE_INTERVAL_MS / 1000,
+            directory=settings.PROFILE_DIR
+        )
+    app.add_middleware(TimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED, profiler=profiler)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, vendors=VENDOR_PLUGINS)
+
 # Include routers
 app.include_router(models_router)
 app.include_router(tokens_router)
+app.include_router(convert_router)
+app.include_router(compare_router)
+app.include_router(jobs_router)
+app.include_router(live_router)
 
 
 @app.get("/", tags=["root"])
@@ -43,7 +84,11 @@ async def root():
         "scalar": "/scalar",
         "endpoints": {
             "list_models": "/api/v1/{vendor}/models",
-            "count_tokens": "/api/v1/{vendor}/counttokens"
+            "count_tokens": "/api/v1/{vendor}/counttokens",
+            "convert": "/api/v1/{vendor}/convert",
+            "compare": "/api/v1/compare",
+            "jobs": "/api/v1/{vendor}/jobs",
+            "live": "/api/v1/live"
         }
     }
 
@@ -65,3 +110,11 @@ async def health_check():
         "status": "healthy",
         "version": settings.APP_VERSION
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """Prometheus metrics in the text exposition format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
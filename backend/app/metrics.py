@@ -0,0 +1,356 @@
+"""
+Prometheus metrics.
+
+A minimal, dependency-free implementation of counters, gauges and
+histograms rendered in the Prometheus text exposition format. Recording a
+sample is a dictionary lookup and an increment, so instrumentation stays
+cheap on the hot path; all formatting happens when ``/metrics`` is scraped.
+
+HTTP requests are measured by ``MetricsMiddleware``; services record their
+upstream calls through the module-level metrics below.
+"""
+
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from a cache hit to a slow vendor call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Distinct model label values kept per process; later models are reported as "other"
+_MAX_MODELS = 256
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a label set, e.g. ``{vendor="google",le="0.5"}``."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, using integers where possible."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Value:
+    """Single counter or gauge series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        """Start at zero."""
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the value."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the value (gauges only)."""
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Set the value (gauges only)."""
+        self.value = value
+
+
+class _Buckets:
+    """Single histogram series."""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        """Start with empty buckets."""
+        self.bounds = bounds
+        # One slot per bound plus +Inf; counts are per bucket, made cumulative when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    """Metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Create a metric family.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels every series carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _new_series(self):
+        """Create an empty series."""
+        return _Value()
+
+    def labels(self, *values: str):
+        """Get the series of a label value combination, creating it on first use."""
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = self._new_series()
+        return series
+
+    def render(self) -> List[str]:
+        """Render HELP, TYPE and all samples."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in list(self._series.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(series.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        """Create a histogram family.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels every series carries
+            buckets: Increasing upper bounds of the buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        """Create an empty series."""
+        return _Buckets(self.buckets)
+
+    def render(self) -> List[str]:
+        """Render HELP, TYPE and bucket, sum and count samples."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "tokencounter_http_request_duration_seconds",
+    "Time to handle an HTTP request, including streaming the response.",
+    ("endpoint", "vendor", "model")
+)
+HTTP_REQUESTS = Counter(
+    "tokencounter_http_requests_total",
+    "HTTP requests handled, by response status.",
+    ("endpoint", "vendor", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "tokencounter_http_requests_in_flight",
+    "HTTP requests currently being handled."
+)
+UPSTREAM_DURATION = Histogram(
+    "tokencounter_upstream_request_duration_seconds",
+    "Time of one token count against a vendor, including hedges.",
+    ("vendor", "model")
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "tokencounter_upstream_requests_in_flight",
+    "Token counts currently waiting on a vendor.",
+    ("vendor",)
+)
+UPSTREAM_ERRORS = Counter(
+    "tokencounter_upstream_errors_total",
+    "Failed token counts against a vendor, by the HTTP status they map to.",
+    ("vendor", "status")
+)
+UPSTREAM_CANCELLED = Counter(
+    "tokencounter_upstream_cancelled_total",
+    "Token counts cancelled while waiting on a vendor, e.g. because the client disconnected.",
+    ("vendor",)
+)
+TEXT_BYTES = Counter(
+    "tokencounter_counted_text_bytes_total",
+    "UTF-8 bytes of text counted against a vendor.",
+    ("vendor",)
+)
+TOKENS = Counter(
+    "tokencounter_counted_tokens_total",
+    "Tokens counted by a vendor.",
+    ("vendor",)
+)
+PACKED_TEXTS = Counter(
+    "tokencounter_packed_texts_total",
+    "Texts counted in packed upstream requests; divide by the requests for the texts saved per call.",
+    ("vendor",)
+)
+PACKED_REQUESTS = Counter(
+    "tokencounter_packed_requests_total",
+    "Packed upstream requests counting several texts at once.",
+    ("vendor",)
+)
+PACKED_VERIFICATIONS = Counter(
+    "tokencounter_packed_verifications_total",
+    "Packed requests recounted unpacked to check the framing baseline, by whether it still held.",
+    ("vendor", "outcome")
+)
+SAMPLED_REQUESTS = Counter(
+    "tokencounter_sampled_requests_total",
+    "Sampled batch requests, by whether the target error was met, the budget ran out or the document was counted whole.",
+    ("vendor", "outcome")
+)
+SAMPLED_RECORDS = Counter(
+    "tokencounter_sampled_records_total",
+    "Records drawn into counted samples by sampled batch requests.",
+    ("vendor",)
+)
+CLIENT_DISCONNECTS = Counter(
+    "tokencounter_client_disconnects_total",
+    "Requests whose handler was cancelled because the client disconnected.",
+    ("endpoint",)
+)
+LIVE_REVISIONS = Counter(
+    "tokencounter_live_revisions_total",
+    "Revisions received on live counting WebSockets, by whether they were counted or superseded.",
+    ("outcome",)
+)
+LIVE_COUNTS = Counter(
+    "tokencounter_live_counts_total",
+    "Per-format counts of live revisions: counted, unchanged (reused), or cancelled when superseded.",
+    ("outcome",)
+)
+
+_in_flight = HTTP_REQUESTS_IN_FLIGHT.labels()
+_models: Set[str] = set()
+
+
+def model_label(model: str) -> str:
+    """Bound the cardinality of model labels: the first models seen keep their name."""
+    if model in _models:
+        return model
+    if len(_models) >= _MAX_MODELS:
+        return "other"
+    _models.add(model)
+    return model
+
+
+# Labels a handler attaches to the request being measured (e.g. the model)
+_request_labels: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar(
+    "request_labels",
+    default=None
+)
+
+
+def label_request(model: str) -> None:
+    """Attach the model of the current request to its request metrics."""
+    labels = _request_labels.get()
+    if labels is not None:
+        labels["model"] = model_label(model)
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency, status and in-flight counts.
+
+    Endpoints are labelled with their route template (e.g.
+    ``/api/v1/{vendor}/counttokens``) so label cardinality stays bounded;
+    requests matching no route share the ``unmatched`` endpoint. For the
+    same reason, vendor path parameters that name no known vendor (e.g. on
+    422 responses) are labelled ``other``.
+    """
+
+    def __init__(self, app: ASGIApp, vendors: Iterable[str] = ()):
+        """Wrap an ASGI application.
+
+        Args:
+            app: ASGI application to measure
+            vendors: Vendor names that keep their own label
+        """
+        self.app = app
+        self.vendors = frozenset(vendors)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        labels: Dict[str, str] = {}
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _request_labels.set(labels)
+        _in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight.dec()
+            _request_labels.reset(token)
+
+            # Routing fills in the matched route and path parameters
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            vendor = scope.get("path_params", {}).get("vendor", "")
+            if vendor and vendor not in self.vendors:
+                vendor = "other"
+            HTTP_REQUEST_DURATION.labels(endpoint, vendor, labels.get("model", "")).observe(elapsed)
+            HTTP_REQUESTS.labels(endpoint, vendor, str(status)).inc()
@@ -2,14 +2,68 @@
 Pydantic models for request/response validation.
 """
 
-from .requests import CountTokensRequest, CountTokensBatchRequest
-from .responses import ModelInfo, ModelsResponse, TokenCountResponse, TokenCountBatchResponse
+from .requests import (
+    CountTokensRequest,
+    CountTokensBatchRequest,
+    CountTokensJobRequest,
+    ConvertRequest,
+    CompareTarget,
+    CompareRequest,
+    LiveRevision,
+)
+from .responses import (
+    ModelInfo,
+    ModelsResponse,
+    TokenCountResponse,
+    SampledCountSummary,
+    TokenCountBatchResponse,
+    ConvertResponse,
+    CompareCell,
+    CompareResult,
+    CompareResponse,
+    BulkCountError,
+    BulkCountResult,
+    BulkFormatSummary,
+    BulkCountSummary,
+    JobTextResult,
+    JobResponse,
+    JobQueueStats,
+    LiveCount,
+    LiveRevisionDone,
+    CacheStatsResponse,
+    HedgingStats,
+    VendorUpstreamStats,
+    UpstreamStatsResponse,
+)
 
 __all__ = [
     "CountTokensRequest",
     "CountTokensBatchRequest",
+    "CountTokensJobRequest",
+    "ConvertRequest",
+    "CompareTarget",
+    "CompareRequest",
+    "LiveRevision",
     "ModelInfo",
     "ModelsResponse",
     "TokenCountResponse",
+    "SampledCountSummary",
     "TokenCountBatchResponse",
+    "ConvertResponse",
+    "CompareCell",
+    "CompareResult",
+    "CompareResponse",
+    "BulkCountError",
+    "BulkCountResult",
+    "BulkFormatSummary",
+    "BulkCountSummary",
+    "JobTextResult",
+    "JobResponse",
+    "JobQueueStats",
+    "LiveCount",
+    "LiveRevisionDone",
+    "CacheStatsResponse",
+    "HedgingStats",
+    "VendorUpstreamStats",
+    "UpstreamStatsResponse",
 ]
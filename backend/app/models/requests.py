@@ -2,7 +2,7 @@
 Request models for API endpoints.
 """
 
-from typing import Dict
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -19,6 +19,18 @@ class CountTokensRequest(BaseModel):
         description="Model ID to use for token counting",
         examples=["claude-3-5-sonnet-20241022"]
     )
+    mode: Literal["exact", "chunked", "estimate"] = Field(
+        "exact",
+        description=(
+            "Counting mode: 'exact' counts each text in one call; 'chunked' splits large texts "
+            "at content-defined boundaries, counts chunks concurrently and reuses cached chunk counts; "
+            "'estimate' returns a calibrated estimate with an error bound without calling the vendor"
+        )
+    )
+    refine: bool = Field(
+        False,
+        description="In estimate mode, also count exactly in the background to improve calibration"
+    )
 
     class Config:
         json_schema_extra = {
@@ -48,6 +60,31 @@ class CountTokensBatchRequest(BaseModel):
         description="Model ID to use for token counting",
         examples=["claude-3-5-sonnet-20241022"]
     )
+    mode: Literal["exact", "chunked", "estimate", "packed", "sampled"] = Field(
+        "exact",
+        description=(
+            "Counting mode: 'exact' counts each text in one call; 'chunked' splits large texts "
+            "at content-defined boundaries, counts chunks concurrently and reuses cached chunk counts; "
+            "'estimate' returns a calibrated estimate with an error bound without calling the vendor; "
+            "'packed' counts all uncounted texts in one call, exact in total, and splits the total "
+            "by calibrated estimates when more than one text is uncounted; 'sampled' parses the "
+            "'json' or 'jsonCompact' text, counts a stratified sample of the records of its largest "
+            "array of objects in every format and extrapolates the totals with confidence intervals"
+        )
+    )
+    refine: bool = Field(
+        False,
+        description="In estimate mode, also count exactly in the background to improve calibration"
+    )
+    target_error: float = Field(
+        0.01,
+        gt=0,
+        le=0.5,
+        description=(
+            "In sampled mode, relative half-width of the 95% confidence interval to reach for every "
+            "format (0.01 is ±1%); sampling stops early when the record budget runs out"
+        )
+    )
 
     class Config:
         json_schema_extra = {
@@ -61,3 +98,146 @@ class CountTokensBatchRequest(BaseModel):
                 "model": "claude-3-5-sonnet-20241022"
             }
         }
+
+
+class CountTokensJobRequest(BaseModel):
+    """Request model for submitting a token counting job."""
+
+    texts: Dict[str, str] = Field(
+        ...,
+        description="Dictionary of names to text content; may be far larger than a batch request",
+        examples=[{"doc-1": '{"key": "value"}', "doc-2": "key: value\n"}]
+    )
+    model: str = Field(
+        ...,
+        description="Model ID to use for token counting",
+        examples=["claude-3-5-sonnet-20241022"]
+    )
+    mode: Literal["exact", "chunked"] = Field(
+        "exact",
+        description=(
+            "Counting mode: 'exact' counts each text in one call; 'chunked' splits large texts "
+            "at content-defined boundaries and reuses cached chunk counts"
+        )
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "texts": {
+                    "doc-1": '{"greeting": "Hello, world!"}',
+                    "doc-2": "greeting: Hello, world!\n"
+                },
+                "model": "claude-3-5-sonnet-20241022"
+            }
+        }
+
+
+class ConvertRequest(BaseModel):
+    """Request model for the format conversion endpoint."""
+
+    document: Any = Field(
+        ...,
+        description="JSON document to convert into every compared format",
+        examples=[{"users": [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]}]
+    )
+    model: str = Field(
+        ...,
+        description="Model ID to use for token counting",
+        examples=["claude-3-5-sonnet-20241022"]
+    )
+    include_texts: bool = Field(
+        True,
+        description="Whether to return the converted texts alongside their counts"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "document": {"users": [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]},
+                "model": "claude-3-5-sonnet-20241022",
+                "include_texts": True
+            }
+        }
+
+
+class CompareTarget(BaseModel):
+    """A vendor and model to count tokens with."""
+
+    vendor: Literal["anthropic", "google", "openai"] = Field(
+        ...,
+        description="Vendor name (anthropic, google or openai)",
+        examples=["anthropic"]
+    )
+    model: str = Field(
+        ...,
+        description="Model ID to use for token counting",
+        examples=["claude-3-5-sonnet-20241022"]
+    )
+
+
+class CompareRequest(BaseModel):
+    """Request model for the cross-vendor comparison endpoint."""
+
+    texts: Dict[str, str] = Field(
+        ...,
+        description="Dictionary of format names to text content",
+        examples=[{
+            "json": '{"key": "value"}',
+            "yaml": "key: value\n"
+        }]
+    )
+    targets: List[CompareTarget] = Field(
+        ...,
+        min_length=1,
+        description="Vendor and model pairs to count every text with"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "texts": {
+                    "json": '{"greeting": "Hello, world!"}',
+                    "yaml": "greeting: Hello, world!\n"
+                },
+                "targets": [
+                    {"vendor": "anthropic", "model": "claude-3-5-sonnet-20241022"},
+                    {"vendor": "google", "model": "gemini-1.5-pro"},
+                    {"vendor": "openai", "model": "gpt-4o"}
+                ]
+            }
+        }
+
+
+class LiveRevision(BaseModel):
+    """One document revision sent over the live counting WebSocket."""
+
+    revision: int = Field(
+        ...,
+        description="Client revision number; must increase with every message",
+        examples=[1]
+    )
+    texts: Dict[str, str] = Field(
+        ...,
+        description="Dictionary of format names to the full text of this revision",
+        examples=[{"json": '{"key": "value"}', "yaml": "key: value\n"}]
+    )
+    targets: Optional[List[CompareTarget]] = Field(
+        None,
+        description="Vendors and models to count with; omit to keep the previous revision's targets"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "revision": 1,
+                "texts": {
+                    "json": '{"greeting": "Hello, world!"}',
+                    "yaml": "greeting: Hello, world!\n"
+                },
+                "targets": [
+                    {"vendor": "anthropic", "model": "claude-3-5-sonnet-20241022"},
+                    {"vendor": "google", "model": "gemini-1.5-flash"}
+                ]
+            }
+        }
@@ -2,7 +2,7 @@
 Response models for API endpoints.
 """
 
-from typing import List, Dict
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -58,6 +58,22 @@ class TokenCountResponse(BaseModel):
         description="Number of tokens in the text",
         examples=[42]
     )
+    exact: bool = Field(
+        True,
+        description="Whether the count is exact; false for chunked or calibrated estimates"
+    )
+    chunks: int = Field(
+        1,
+        description="Number of chunks the text was counted in"
+    )
+    reused_chunks: int = Field(
+        0,
+        description="Number of chunks whose counts were reused from the cache or store"
+    )
+    error_bound: Optional[int] = Field(
+        None,
+        description="Approximate 95% bound on the absolute error of an estimate, in tokens"
+    )
 
     class Config:
         json_schema_extra = {
@@ -69,6 +85,50 @@ class TokenCountResponse(BaseModel):
         }
 
 
+class SampledCountSummary(BaseModel):
+    """Summary of the record sample behind sampled totals."""
+
+    records: int = Field(
+        ...,
+        description="Records in the sampled array",
+        examples=[1_000_000]
+    )
+    sampled_records: int = Field(
+        ...,
+        description="Records drawn into counted samples",
+        examples=[400]
+    )
+    strata: int = Field(
+        ...,
+        description="Contiguous strata the records were split into",
+        examples=[4]
+    )
+    rounds: int = Field(
+        ...,
+        description="Rounds of counting, each adding samples where costs vary most",
+        examples=[2]
+    )
+    upstream_texts: int = Field(
+        ...,
+        description="Sample texts counted across all formats",
+        examples=[85]
+    )
+    target_error: float = Field(
+        ...,
+        description="Requested relative half-width of the 95% confidence intervals",
+        examples=[0.01]
+    )
+    achieved_error: float = Field(
+        ...,
+        description="Largest relative half-width reached across formats",
+        examples=[0.0062]
+    )
+    target_met: bool = Field(
+        ...,
+        description="Whether every format reached the target before the record budget ran out"
+    )
+
+
 class TokenCountBatchResponse(BaseModel):
     """Response model for batch token counting endpoint."""
 
@@ -92,6 +152,36 @@ class TokenCountBatchResponse(BaseModel):
             "toon": 32
         }]
     )
+    latencies_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to upstream latency in milliseconds",
+        examples=[{
+            "json": 182.4,
+            "jsonCompact": 175.9,
+            "yaml": 190.2,
+            "toon": 168.7
+        }]
+    )
+    exact: Dict[str, bool] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to whether their count is exact (false for estimates)"
+    )
+    error_bounds: Dict[str, int] = Field(
+        default_factory=dict,
+        description=(
+            "Dictionary mapping format names to an approximate 95% error bound, for estimates, "
+            "counts split from a packed total and sampled totals"
+        )
+    )
+    confidence_intervals: Dict[str, List[int]] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to the [low, high] 95% confidence interval of sampled totals",
+        examples=[{"json": [4_812_300, 4_861_900], "toon": [2_015_400, 2_031_800]}]
+    )
+    sample: Optional[SampledCountSummary] = Field(
+        None,
+        description="Summary of the sample behind sampled totals (sampled mode only)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -103,6 +193,354 @@ class TokenCountBatchResponse(BaseModel):
                     "jsonCompact": 35,
                     "yaml": 38,
                     "toon": 32
+                },
+                "latencies_ms": {
+                    "json": 182.4,
+                    "jsonCompact": 175.9,
+                    "yaml": 190.2,
+                    "toon": 168.7
+                }
+            }
+        }
+
+
+class ConvertResponse(BaseModel):
+    """Response model for the format conversion endpoint."""
+
+    vendor: str = Field(
+        ...,
+        description="Vendor name",
+        examples=["anthropic"]
+    )
+    model: str = Field(
+        ...,
+        description="Model ID used for counting",
+        examples=["claude-3-5-sonnet-20241022"]
+    )
+    texts: Optional[Dict[str, str]] = Field(
+        None,
+        description="Dictionary mapping format names to converted text, if requested"
+    )
+    token_counts: Dict[str, int] = Field(
+        ...,
+        description="Dictionary mapping format names to token counts",
+        examples=[{
+            "json": 42,
+            "jsonCompact": 35,
+            "yaml": 38,
+            "toon": 32,
+            "xml": 51
+        }]
+    )
+    latencies_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to upstream latency in milliseconds"
+    )
+    conversion_ms: float = Field(
+        ...,
+        description="Time spent converting the document into all formats, in milliseconds",
+        examples=[0.42]
+    )
+
+
+class CompareCell(BaseModel):
+    """Token count of one text for one vendor and model."""
+
+    token_count: Optional[int] = Field(
+        None,
+        description="Number of tokens, or null if counting failed",
+        examples=[42]
+    )
+    latency_ms: float = Field(
+        0.0,
+        description="Upstream latency in milliseconds; 0 for empty or already known texts",
+        examples=[183.4]
+    )
+    status_code: Optional[int] = Field(
+        None,
+        description="HTTP status code of the failure, if counting failed",
+        examples=[400]
+    )
+    error: Optional[str] = Field(
+        None,
+        description="Error detail, if counting failed",
+        examples=["Invalid model: claude-unknown"]
+    )
+
+
+class CompareResult(BaseModel):
+    """Token counts of every text for one vendor and model."""
+
+    vendor: str = Field(
+        ...,
+        description="Vendor name",
+        examples=["anthropic"]
+    )
+    model: str = Field(
+        ...,
+        description="Model ID used for counting",
+        examples=["claude-3-5-sonnet-20241022"]
+    )
+    cells: Dict[str, CompareCell] = Field(
+        ...,
+        description="Dictionary mapping format names to their counting outcome"
+    )
+    elapsed_ms: float = Field(
+        ...,
+        description="Wall-clock time to count every text for this target, in milliseconds",
+        examples=[201.7]
+    )
+
+
+class CompareResponse(BaseModel):
+    """Response model for the cross-vendor comparison endpoint."""
+
+    results: List[CompareResult] = Field(
+        ...,
+        description="One row per requested target, in request order"
+    )
+    elapsed_ms: float = Field(
+        ...,
+        description="Wall-clock time for the whole comparison, in milliseconds",
+        examples=[245.3]
+    )
+
+
+class BulkCountError(BaseModel):
+    """Failure of one bulk counting record."""
+
+    status_code: int = Field(..., description="HTTP status code of the failure", examples=[400])
+    detail: str = Field(..., description="Error detail", examples=["Invalid model: claude-unknown"])
+
+
+class BulkCountResult(BaseModel):
+    """One NDJSON result line of the bulk counting endpoint."""
+
+    line: int = Field(..., description="1-based line number of the record in the upload", examples=[1])
+    model: Optional[str] = Field(None, description="Model ID used for counting")
+    token_counts: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to token counts"
+    )
+    latencies_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Dictionary mapping format names to upstream latency in milliseconds"
+    )
+    error: Optional[BulkCountError] = Field(None, description="Failure of this record, if any")
+
+
+class BulkFormatSummary(BaseModel):
+    """Distribution of token counts for one format across a bulk upload."""
+
+    records: int = Field(..., description="Number of records counted for this format")
+    total: int = Field(..., description="Sum of token counts")
+    mean: float = Field(..., description="Mean token count per record")
+    min: int = Field(..., description="Smallest token count")
+    max: int = Field(..., description="Largest token count")
+    percentiles: Dict[str, float] = Field(
+        ...,
+        description="Token count percentiles (p50, p90, p95, p99), accurate to within 1%",
+        examples=[{"p50": 42.0, "p90": 77.0, "p95": 91.0, "p99": 130.6}]
+    )
+
+
+class BulkCountSummary(BaseModel):
+    """Final NDJSON summary line of the bulk counting endpoint."""
+
+    records: int = Field(..., description="Number of records processed")
+    failed: int = Field(..., description="Number of records that failed")
+    elapsed_ms: float = Field(..., description="Wall-clock time for the whole upload, in milliseconds")
+    formats: Dict[str, BulkFormatSummary] = Field(
+        ...,
+        description="Dictionary mapping format names to their token count distribution"
+    )
+
+
+class JobTextResult(BaseModel):
+    """Outcome of one text of a job; one NDJSON line of the job stream."""
+
+    name: str = Field(..., description="Name of the text in the submitted job", examples=["doc-1"])
+    token_count: Optional[int] = Field(None, description="Token count, if counting succeeded", examples=[12])
+    error: Optional[BulkCountError] = Field(None, description="Failure of this text, if any")
+
+
+class JobResponse(BaseModel):
+    """Status, progress and optionally results of a token counting job."""
+
+    id: str = Field(..., description="Job ID", examples=["5f0c2b6de2a44c1a9d1f3f1e8c7a9b21"])
+    vendor: str = Field(..., description="Vendor name", examples=["anthropic"])
+    model: str = Field(..., description="Model ID used for counting", examples=["claude-3-5-sonnet-20241022"])
+    mode: str = Field(..., description="Counting mode", examples=["exact"])
+    status: Literal["queued", "running", "completed", "failed", "cancelled"] = Field(
+        ...,
+        description="Job status; 'completed' jobs may still have failed texts",
+        examples=["running"]
+    )
+    total: int = Field(..., description="Number of texts in the job")
+    completed: int = Field(..., description="Number of texts counted or failed so far")
+    failed: int = Field(..., description="Number of texts that failed")
+    queue_position: Optional[int] = Field(
+        None,
+        description="Number of queued jobs ahead of this one, while it is queued"
+    )
+    created_at: float = Field(..., description="Submission time (Unix seconds)")
+    started_at: Optional[float] = Field(None, description="Time a worker picked the job up (Unix seconds)")
+    finished_at: Optional[float] = Field(None, description="Time the job finished (Unix seconds)")
+    elapsed_ms: float = Field(..., description="Time spent running so far, in milliseconds")
+    error: Optional[str] = Field(None, description="Reason the job failed as a whole")
+    token_counts: Optional[Dict[str, int]] = Field(
+        None,
+        description="Token counts of the texts counted so far, when results are requested"
+    )
+    errors: Optional[Dict[str, BulkCountError]] = Field(
+        None,
+        description="Failures of the texts that failed so far, when results are requested"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "5f0c2b6de2a44c1a9d1f3f1e8c7a9b21",
+                "vendor": "anthropic",
+                "model": "claude-3-5-sonnet-20241022",
+                "mode": "exact",
+                "status": "running",
+                "total": 50000,
+                "completed": 12840,
+                "failed": 2,
+                "queue_position": None,
+                "created_at": 1760000000.0,
+                "started_at": 1760000001.5,
+                "finished_at": None,
+                "elapsed_ms": 48211.4,
+                "error": None
+            }
+        }
+
+
+class JobQueueStats(BaseModel):
+    """Response model for job queue statistics."""
+
+    workers: int = Field(..., description="Number of jobs counted at once")
+    queued: int = Field(..., description="Jobs waiting for a worker")
+    running: int = Field(..., description="Jobs being counted")
+    max_queued: int = Field(..., description="Maximum number of waiting jobs before submissions are rejected")
+    retained: int = Field(..., description="Jobs currently known, including finished jobs kept for retrieval")
+    by_status: Dict[str, int] = Field(
+        ...,
+        description="Known jobs by status",
+        examples=[{"queued": 3, "running": 4, "completed": 120, "cancelled": 1}]
+    )
+
+
+class LiveCount(BaseModel):
+    """Token count of one format for one target, pushed over the live counting WebSocket."""
+
+    revision: int = Field(..., description="Revision the count belongs to", examples=[3])
+    vendor: str = Field(..., description="Vendor name", examples=["anthropic"])
+    model: str = Field(..., description="Model ID used for counting", examples=["claude-3-5-sonnet-20241022"])
+    format: str = Field(..., description="Format name", examples=["json"])
+    token_count: Optional[int] = Field(None, description="Token count, if counting succeeded", examples=[42])
+    changed: bool = Field(
+        ...,
+        description="Whether the text changed since the last counted revision; unchanged counts are not re-counted"
+    )
+    error: Optional[BulkCountError] = Field(None, description="Failure of this count, if any")
+
+
+class LiveRevisionDone(BaseModel):
+    """Final message of a revision on the live counting WebSocket."""
+
+    revision: int = Field(..., description="Revision whose counts are complete", examples=[3])
+    done: bool = Field(True, description="Always true; marks the end of the revision's counts")
+    counted: int = Field(..., description="Counts requested for changed texts")
+    unchanged: int = Field(..., description="Counts reused because the text had not changed")
+    elapsed_ms: float = Field(..., description="Time from starting the revision to its last count, in milliseconds")
+
+
+class CacheStatsResponse(BaseModel):
+    """Response model for token count cache statistics."""
+
+    enabled: bool = Field(
+        ...,
+        description="Whether the token count cache is enabled"
+    )
+    entries: int = Field(0, description="Number of cached token counts")
+    bytes: int = Field(0, description="Approximate memory used by cached entries")
+    max_entries: int = Field(0, description="Maximum number of cached entries")
+    max_bytes: int = Field(0, description="Maximum approximate memory for cached entries")
+    ttl_seconds: float = Field(0.0, description="Time-to-live of a cached entry in seconds")
+    hits: int = Field(0, description="Number of cache hits")
+    misses: int = Field(0, description="Number of cache misses")
+    evictions: int = Field(0, description="Number of entries evicted to stay within limits")
+    hit_rate: float = Field(0.0, description="Fraction of lookups served from the cache")
+    store: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Persistent token count store counters, if a store is configured"
+    )
+
+
+class HedgingStats(BaseModel):
+    """Hedged request counters of one vendor."""
+
+    calls: int = Field(..., description="Number of upstream counts run through the hedger")
+    hedged: int = Field(..., description="Number of counts that sent a duplicate request")
+    hedge_rate: float = Field(..., description="Fraction of counts that were hedged")
+    hedge_wins: int = Field(..., description="Number of hedged counts answered first by the duplicate")
+    hedge_win_rate: float = Field(..., description="Fraction of hedged counts won by the duplicate")
+    max_fraction: float = Field(..., description="Configured maximum fraction of counts that may be hedged")
+    delays_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Current hedge delay (rolling latency percentile) per model, in milliseconds"
+    )
+
+
+class VendorUpstreamStats(BaseModel):
+    """Upstream call statistics of one vendor."""
+
+    scheduler: Dict[str, Any] = Field(
+        ...,
+        description="Scheduler concurrency limit, queue depths and rate limit counters"
+    )
+    hedging: Optional[HedgingStats] = Field(
+        None,
+        description="Hedged request counters, or null if hedging is disabled"
+    )
+
+
+class UpstreamStatsResponse(BaseModel):
+    """Response model for upstream scheduling and hedging statistics."""
+
+    vendors: Dict[str, VendorUpstreamStats] = Field(
+        ...,
+        description="Statistics keyed by vendor"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "vendors": {
+                    "anthropic": {
+                        "scheduler": {
+                            "limit": 16.0,
+                            "in_flight": 2,
+                            "queued_interactive": 0,
+                            "queued_bulk": 0,
+                            "paused_seconds": 0.0,
+                            "calls": 1200,
+                            "rate_limited": 3,
+                            "retries": 3
+                        },
+                        "hedging": {
+                            "calls": 1200,
+                            "hedged": 41,
+                            "hedge_rate": 0.0342,
+                            "hedge_wins": 29,
+                            "hedge_win_rate": 0.7073,
+                            "max_fraction": 0.05,
+                            "delays_ms": {"claude-sonnet-4-5-20250929": 412.5}
+                        }
+                    }
                 }
             }
         }
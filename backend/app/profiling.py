@@ -0,0 +1,143 @@
+"""
+Sampling profiler for slow requests.
+
+A fraction of requests is profiled. While any profiled request is in
+flight, a background thread samples the stack of the event loop thread
+every few milliseconds. When a profiled request takes longer than the
+threshold, the stacks sampled during it are written in collapsed ("folded")
+format, one ``frame;frame;frame count`` line per stack, ready for
+flamegraph tools. Samples cover everything the event loop ran while the
+request was in flight, including other concurrent requests.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Set
+
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class ProfileSession:
+    """Stacks sampled while one profiled request was in flight."""
+
+    __slots__ = ("stacks",)
+
+    def __init__(self):
+        """Start with no samples."""
+        self.stacks: Counter = Counter()
+
+
+class SlowRequestProfiler:
+    """Profile sampled requests and dump the profiles of slow ones."""
+
+    def __init__(
+        self,
+        threshold_seconds: float = 1.0,
+        sample_rate: float = 0.05,
+        interval_seconds: float = 0.005,
+        directory: str = "profiles",
+        max_depth: int = 64
+    ):
+        """Configure the profiler.
+
+        Args:
+            threshold_seconds: Requests at least this slow have their profile written
+            sample_rate: Fraction of requests that are profiled
+            interval_seconds: Time between stack samples
+            directory: Directory profiles are written to
+            max_depth: Maximum number of frames kept per stack
+        """
+        self.threshold_seconds = threshold_seconds
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_seconds
+        self.directory = directory
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._sessions: Set[ProfileSession] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._target = 0
+
+    def begin(self) -> Optional[ProfileSession]:
+        """Start profiling the current request if it is sampled.
+
+        Must be called from the event loop thread.
+
+        Returns:
+            Session to pass to ``end``, or None if the request is not profiled
+        """
+        if random.random() >= self.sample_rate:
+            return None
+
+        session = ProfileSession()
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._target = threading.get_ident()
+                self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def end(self, session: ProfileSession, scope: Scope, elapsed: float) -> None:
+        """Stop profiling a request and write its profile if it was slow.
+
+        Args:
+            session: Session returned by ``begin``
+            scope: ASGI scope of the request, used to name the profile
+            elapsed: Request duration in seconds
+        """
+        with self._lock:
+            self._sessions.discard(session)
+        if elapsed < self.threshold_seconds or not session.stacks:
+            return
+
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope.get('method', '')}{scope.get('path', '')}-{elapsed * 1000:.0f}ms"
+        path = os.path.join(self.directory, _UNSAFE_FILENAME.sub("_", name) + ".folded")
+        logger.warning(
+            "Slow request %s %s took %.0f ms; profile written to %s",
+            scope.get("method"), scope.get("path"), elapsed * 1000, path
+        )
+        # Write off the event loop
+        asyncio.get_running_loop().run_in_executor(None, self._write, path, session.stacks)
+
+    def _write(self, path: str, stacks: Counter) -> None:
+        """Write sampled stacks in folded format."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                for stack, count in stacks.most_common():
+                    handle.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.warning("Failed to write profile %s: %s", path, e)
+
+    def _fold(self, frame) -> str:
+        """Render a stack root-first as ``function (file:line);...``."""
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ":"))
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    def _sample(self) -> None:
+        """Sample the event loop thread until no profiled request is in flight."""
+        while True:
+            time.sleep(self.interval_seconds)
+            frame = sys._current_frames().get(self._target)
+            stack = self._fold(frame) if frame is not None else "<idle>"
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                for session in self._sessions:
+                    session.stacks[stack] += 1
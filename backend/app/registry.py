@@ -0,0 +1,320 @@
+"""
+Registry of the shared services behind the API routes.
+
+One ``ServiceRegistry`` is created by the application lifespan and stored on
+``app.state.services``. It owns one connection pool per remote vendor,
+the enabled vendor services built on them, the shared token cache, store,
+estimator and model catalog, and the job queue. Routes receive it through
+``get_services``.
+
+Vendor services are plugins (``app.services.plugins``): a vendor's module,
+and with it its SDK, is only imported once the vendor is first used or
+preloaded in the background after startup.
+"""
+
+import asyncio
+import importlib.util
+import logging
+from functools import partial
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+from app.config import Settings
+from app.models import ModelsResponse
+from app.services import ModelCatalogCache, TokenCountCache, TokenCountStore, VendorService
+from app.services.base import PoolOptions
+from app.services.chunking import Chunker
+from app.services.estimation import TokenEstimator
+from app.services.hedging import Hedger
+from app.services.jobs import JobManager
+from app.services.model_catalog import CatalogLoader
+from app.services.packing import PackingOptions
+from app.services.plugins import VENDOR_PLUGINS
+from app.services.scheduler import UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Shared services, caches and connection pools of the application."""
+
+    def __init__(self, settings: Settings):
+        """Build every shared service from the settings.
+
+        No connections are opened until ``start`` is called, and vendor
+        services are built on first use.
+
+        Args:
+            settings: Application settings
+
+        Raises:
+            ValueError: If ENABLED_VENDORS lists a vendor that cannot be used
+        """
+        self.settings = settings
+
+        self.token_cache: Optional[TokenCountCache] = None
+        if settings.TOKEN_CACHE_ENABLED:
+            self.token_cache = TokenCountCache(
+                max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+                max_bytes=settings.TOKEN_CACHE_MAX_BYTES,
+                ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS
+            )
+
+        self.token_store: Optional[TokenCountStore] = None
+        if settings.TOKEN_STORE_PATH:
+            self.token_store = TokenCountStore(
+                path=settings.TOKEN_STORE_PATH,
+                max_bytes=settings.TOKEN_STORE_MAX_BYTES,
+                flush_batch_size=settings.TOKEN_STORE_FLUSH_BATCH_SIZE,
+                flush_interval_seconds=settings.TOKEN_STORE_FLUSH_INTERVAL_SECONDS
+            )
+
+        self.chunker = Chunker(
+            min_chars=settings.CHUNK_MIN_CHARS,
+            max_chars=settings.CHUNK_MAX_CHARS,
+            mask_bits=settings.CHUNK_MASK_BITS
+        )
+        self.token_estimator = TokenEstimator(
+            path=settings.ESTIMATOR_STATE_PATH,
+            save_interval_seconds=settings.ESTIMATOR_SAVE_INTERVAL_SECONDS
+        )
+        self.model_catalog = ModelCatalogCache(
+            ttl_seconds=settings.MODEL_CATALOG_TTL_SECONDS,
+            max_stale_seconds=settings.MODEL_CATALOG_MAX_STALE_SECONDS
+        )
+
+        self._pool = self._pool_options()
+        self._shared_options = dict(
+            cache=self.token_cache,
+            store=self.token_store,
+            single_flight=settings.SINGLE_FLIGHT_ENABLED,
+            chunker=self.chunker,
+            estimator=self.token_estimator,
+            max_refinements=settings.ESTIMATE_MAX_REFINEMENTS,
+            packing=PackingOptions(
+                max_texts=settings.PACKED_MAX_TEXTS,
+                max_chars=settings.PACKED_MAX_CHARS,
+                verify_every=settings.PACKED_VERIFY_EVERY
+            )
+        )
+        self.enabled: List[str] = self._enabled_vendors()
+        # Services are built on first use; this only holds the loaded ones
+        self.vendors: Dict[str, VendorService] = {}
+        self.catalog_loaders: Dict[str, CatalogLoader] = {
+            vendor: partial(self._load_models, vendor) for vendor in self.enabled
+        }
+        self.jobs = JobManager(
+            self.vendor,
+            workers=settings.JOB_WORKERS,
+            max_queued=settings.JOB_MAX_QUEUED,
+            concurrency=settings.JOB_CONCURRENCY,
+            retention_seconds=settings.JOB_RETENTION_SECONDS,
+            max_retained=settings.JOB_MAX_RETAINED
+        )
+        self._startup_tasks: List[asyncio.Task] = []
+
+    def _enabled_vendors(self) -> List[str]:
+        """Resolve which vendors are enabled.
+
+        Vendors listed in ENABLED_VENDORS must be usable. Without the list,
+        every vendor that is installed and, if remote, has an API key is
+        enabled and the others are skipped with a warning.
+
+        Returns:
+            Names of the enabled vendors
+
+        Raises:
+            ValueError: If a listed vendor is unknown, not installed or has no API key
+        """
+        requested = self.settings.enabled_vendors_list
+        unknown = sorted(set(requested or ()) - VENDOR_PLUGINS.keys())
+        if unknown:
+            raise ValueError(f"Unknown vendor(s) in ENABLED_VENDORS: {', '.join(unknown)}")
+
+        enabled = []
+        for vendor, plugin in VENDOR_PLUGINS.items():
+            if requested is not None and vendor not in requested:
+                continue
+            problem = None
+            if not plugin.installed():
+                problem = f"the {plugin.requires} package is not installed"
+            elif plugin.remote and not getattr(self.settings, f"{plugin.settings_prefix}_API_KEY"):
+                problem = f"{plugin.settings_prefix}_API_KEY is not set"
+            if problem is None:
+                enabled.append(vendor)
+            elif requested is not None:
+                raise ValueError(f"Vendor {vendor} is enabled but {problem}")
+            else:
+                logger.warning("Vendor %s is disabled: %s", vendor, problem)
+        return enabled
+
+    def _build_vendor(self, vendor: str) -> VendorService:
+        """Import a vendor's module and build its service from the settings."""
+        settings = self.settings
+        plugin = VENDOR_PLUGINS[vendor]
+        prefix = plugin.settings_prefix
+        options = dict(self._shared_options)
+        if plugin.remote:
+            options.update(
+                api_key=getattr(settings, f"{prefix}_API_KEY"),
+                timeout=settings.UPSTREAM_TIMEOUT_SECONDS,
+                pool=self._pool,
+                base_url=getattr(settings, f"{prefix}_BASE_URL"),
+                scheduler=UpstreamScheduler(
+                    requests_per_second=getattr(settings, f"{prefix}_REQUESTS_PER_SECOND"),
+                    initial_concurrency=getattr(settings, f"{prefix}_BATCH_CONCURRENCY"),
+                    max_concurrency=getattr(settings, f"{prefix}_MAX_CONCURRENCY"),
+                    max_retries=settings.UPSTREAM_MAX_RETRIES,
+                    max_backoff_seconds=settings.UPSTREAM_MAX_BACKOFF_SECONDS
+                ),
+                hedger=self._new_hedger()
+            )
+        else:
+            options.update(batch_concurrency=getattr(settings, f"{prefix}_BATCH_CONCURRENCY"))
+        return plugin.load()(**options)
+
+    def _pool_options(self) -> PoolOptions:
+        """Connection pool tuning shared by the remote vendors (each gets its own pool)."""
+        settings = self.settings
+        http2 = settings.UPSTREAM_HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 requires the h2 package (pip install 'httpx[http2]'); using HTTP/1.1")
+            http2 = False
+
+        return PoolOptions(
+            max_connections=settings.UPSTREAM_POOL_SIZE,
+            max_keepalive=settings.UPSTREAM_POOL_KEEPALIVE,
+            keepalive_seconds=settings.UPSTREAM_KEEPALIVE_SECONDS,
+            connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS,
+            http2=http2
+        )
+
+    def _new_hedger(self) -> Optional[Hedger]:
+        """Create a vendor's request hedger, or None if hedging is disabled."""
+        settings = self.settings
+        if not settings.HEDGING_ENABLED:
+            return None
+        return Hedger(
+            percentile=settings.HEDGE_PERCENTILE,
+            max_fraction=settings.HEDGE_MAX_PERCENT / 100,
+            min_samples=settings.HEDGE_MIN_SAMPLES,
+            window=settings.HEDGE_WINDOW
+        )
+
+    async def _load_models(self, vendor: str) -> ModelsResponse:
+        """Fetch and normalize the model catalog of a vendor."""
+        service = await self.load_vendor(vendor)
+        models = await service.list_models()
+        return ModelsResponse(vendor=vendor, models=models)
+
+    def vendor(self, vendor: str) -> VendorService:
+        """Get the token counting service for a vendor, building it on first use.
+
+        Args:
+            vendor: Vendor name ("anthropic", "google" or "openai")
+
+        Returns:
+            Service instance for the vendor
+
+        Raises:
+            HTTPException: If vendor is invalid or not enabled
+        """
+        service = self.vendors.get(vendor)
+        if service is None:
+            if vendor not in self.enabled:
+                raise self.unavailable(vendor)
+            service = self.vendors[vendor] = self._build_vendor(vendor)
+        return service
+
+    @staticmethod
+    def unavailable(vendor: str) -> HTTPException:
+        """Build the error for a vendor that is not enabled.
+
+        Args:
+            vendor: Vendor name
+
+        Returns:
+            HTTPException with status 400 for unknown vendors, 404 for known but disabled ones
+        """
+        if vendor not in VENDOR_PLUGINS:
+            # This should never happen due to VendorType validation
+            return HTTPException(
+                status_code=400,
+                detail=f"Invalid vendor: {vendor}. Must be 'anthropic', 'google' or 'openai'."
+            )
+        return HTTPException(status_code=404, detail=f"Vendor {vendor} is not enabled on this server")
+
+    async def load_vendor(self, vendor: str) -> VendorService:
+        """Get a vendor's service, importing its module in a worker thread.
+
+        Unlike ``vendor``, a first call does not block the event loop while
+        the vendor's SDK is imported.
+
+        Args:
+            vendor: Vendor name ("anthropic", "google" or "openai")
+
+        Returns:
+            Service instance for the vendor
+
+        Raises:
+            HTTPException: If vendor is invalid or not enabled
+        """
+        if vendor not in self.vendors and vendor in self.enabled:
+            await asyncio.to_thread(VENDOR_PLUGINS[vendor].load)
+        return self.vendor(vendor)
+
+    def remote_vendors(self) -> Dict[str, VendorService]:
+        """Loaded services of the vendors reached over the network."""
+        return {vendor: service for vendor, service in self.vendors.items() if VENDOR_PLUGINS[vendor].remote}
+
+    async def start(self) -> None:
+        """Start the job workers, then load and warm the enabled vendors in the background.
+
+        Startup never waits on vendor SDK imports or vendor APIs. Without
+        connection pre-warming or catalog prefetching, vendors are loaded
+        when first used.
+        """
+        self.jobs.start()
+        settings = self.settings
+        if settings.UPSTREAM_PREWARM_CONNECTIONS > 0 or settings.MODEL_CATALOG_PREFETCH:
+            for vendor in self.enabled:
+                self._startup_tasks.append(asyncio.create_task(self._preload(vendor)))
+        if settings.MODEL_CATALOG_PREFETCH:
+            self._startup_tasks.append(asyncio.create_task(self.model_catalog.prefetch(self.catalog_loaders)))
+
+    async def _preload(self, vendor: str) -> None:
+        """Load a vendor off the event loop and pre-open its connections."""
+        try:
+            service = await self.load_vendor(vendor)
+        except Exception:
+            logger.exception("Failed to load vendor %s", vendor)
+            return
+        connections = self.settings.UPSTREAM_PREWARM_CONNECTIONS
+        if connections > 0:
+            await service.warm_connections(connections)
+
+    async def close(self) -> None:
+        """Stop background work, flush persistent state and close connection pools."""
+        for task in self._startup_tasks:
+            task.cancel()
+        await asyncio.gather(*self._startup_tasks, return_exceptions=True)
+        self._startup_tasks.clear()
+
+        await self.jobs.close()
+        await self.model_catalog.close()
+        for service in self.vendors.values():
+            await service.close()
+        if self.token_store is not None:
+            await self.token_store.close()
+        await self.token_estimator.close()
+
+
+async def get_services(connection: HTTPConnection) -> ServiceRegistry:
+    """FastAPI dependency returning the application's service registry.
+
+    Works for HTTP and WebSocket routes. Async so FastAPI resolves it inline
+    instead of in the thread pool.
+    """
+    return connection.app.state.services
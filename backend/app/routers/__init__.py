@@ -4,5 +4,9 @@ API routers for the application.
 
 from .models import router as models_router
 from .tokens import router as tokens_router
+from .convert import router as convert_router
+from .compare import router as compare_router
+from .jobs import router as jobs_router
+from .live import router as live_router
 
-__all__ = ["models_router", "tokens_router"]
+__all__ = ["models_router", "tokens_router", "convert_router", "compare_router", "jobs_router", "live_router"]
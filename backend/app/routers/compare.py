@@ -0,0 +1,92 @@
+"""
+Router for cross-vendor token count comparison.
+"""
+
+import asyncio
+import time
+from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.models import CompareCell, CompareRequest, CompareResponse, CompareResult, CompareTarget
+from app.registry import ServiceRegistry, get_services
+from app.disconnect import TimedCancellableRoute
+from app.services.base import CountOutcome
+
+router = APIRouter(prefix="/api/v1", tags=["compare"], route_class=TimedCancellableRoute)
+
+
+def _cell(outcome: CountOutcome) -> CompareCell:
+    """Convert a counting outcome into a response cell."""
+    latency_ms = round(outcome.latency_ms, 3)
+    if outcome.error is None:
+        return CompareCell(token_count=outcome.count, latency_ms=latency_ms)
+
+    if isinstance(outcome.error, HTTPException):
+        return CompareCell(
+            latency_ms=latency_ms,
+            status_code=outcome.error.status_code,
+            error=str(outcome.error.detail)
+        )
+    return CompareCell(
+        latency_ms=latency_ms,
+        status_code=500,
+        error=f"Unexpected error counting tokens: {str(outcome.error)}"
+    )
+
+
+async def _count_target(services: ServiceRegistry, target: CompareTarget, texts: Dict[str, str]) -> CompareResult:
+    """Count every text for one target, recording failures in its cells."""
+    start = time.perf_counter()
+    try:
+        service = services.vendor(target.vendor)
+        outcomes = await service.count_tokens_each(texts, target.model)
+        cells = {format_name: _cell(outcome) for format_name, outcome in outcomes.items()}
+    except Exception as e:
+        # A failure outside individual counts affects the whole row
+        cell = _cell(CountOutcome(error=e))
+        cells = {format_name: cell for format_name in texts}
+
+    return CompareResult(
+        vendor=target.vendor,
+        model=target.model,
+        cells=cells,
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
+
+
+@router.post(
+    "/compare",
+    response_model=CompareResponse,
+    summary="Compare token counts across vendors and models",
+    description=(
+        "Count the tokens of every text with every requested vendor and model concurrently. "
+        "Each cell reports its count or error and its latency; failures of some cells "
+        "don't fail the response."
+    )
+)
+async def compare(
+    request: CompareRequest,
+    services: ServiceRegistry = Depends(get_services)
+) -> CompareResponse:
+    """Count tokens for every (text, target) pair concurrently.
+
+    All targets are counted at once; within a target, upstream calls are
+    bounded by that vendor's batch concurrency and served from the cache
+    where possible.
+
+    Args:
+        request: CompareRequest containing texts and targets
+        services: Application service registry
+
+    Returns:
+        CompareResponse with one row of cells per target, in request order
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(_count_target(services, target, request.texts) for target in request.targets)
+    )
+
+    return CompareResponse(
+        results=list(results),
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
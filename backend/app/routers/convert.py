@@ -0,0 +1,94 @@
+"""
+Router for server-side format conversion endpoints.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Literal, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Path
+
+from app.models import ConvertRequest, ConvertResponse
+from app.metrics import label_request
+from app.registry import ServiceRegistry, get_services
+from app.disconnect import TimedCancellableRoute
+from app.services.conversion import convert_all
+
+router = APIRouter(prefix="/api/v1", tags=["convert"], route_class=TimedCancellableRoute)
+
+VendorType = Literal["anthropic", "google", "openai"]
+
+
+def _convert_timed(document: Any) -> Tuple[Dict[str, str], float]:
+    """Convert a document into every format and time the conversion."""
+    start = time.perf_counter()
+    texts = convert_all(document)
+    return texts, (time.perf_counter() - start) * 1000
+
+
+@router.post(
+    "/{vendor}/convert",
+    response_model=ConvertResponse,
+    summary="Convert JSON into every format and count tokens",
+    description=(
+        "Convert one JSON document into pretty JSON, compact JSON, YAML, TOON and XML "
+        "and count the tokens of each using the specified vendor and model."
+    )
+)
+async def convert_and_count(
+    request: ConvertRequest,
+    vendor: VendorType = Path(
+        ...,
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> ConvertResponse:
+    """Convert a JSON document into all formats and count their tokens.
+
+    Conversion runs in a worker thread so large documents don't block the
+    event loop.
+
+    Args:
+        request: ConvertRequest containing the document and model
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
+
+    Returns:
+        ConvertResponse with converted texts, token counts and timings
+
+    Raises:
+        HTTPException: If vendor is invalid, conversion fails or API call fails
+    """
+    try:
+        service = services.vendor(vendor)
+        label_request(request.model)
+
+        try:
+            texts, conversion_ms = await asyncio.to_thread(_convert_timed, request.document)
+        except (ValueError, TypeError, RecursionError) as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to convert document: {str(e)}"
+            )
+
+        token_counts, latencies_ms = await service.count_tokens_batch(
+            texts=texts,
+            model=request.model
+        )
+
+        return ConvertResponse(
+            vendor=vendor,
+            model=request.model,
+            texts=texts if request.include_texts else None,
+            token_counts=token_counts,
+            latencies_ms=latencies_ms,
+            conversion_ms=round(conversion_ms, 3)
+        )
+
+    except HTTPException:
+        # Re-raise HTTP exceptions from services
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error converting document: {str(e)}"
+        )
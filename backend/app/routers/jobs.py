@@ -0,0 +1,171 @@
+"""
+Router for asynchronous token counting jobs.
+"""
+
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.metrics import label_request
+from app.models import CountTokensJobRequest, JobQueueStats, JobResponse
+from app.registry import ServiceRegistry, get_services
+from app.timing import TimedRoute
+
+router = APIRouter(prefix="/api/v1", tags=["jobs"], route_class=TimedRoute)
+
+VendorType = Literal["anthropic", "google", "openai"]
+
+
+@router.get(
+    "/jobs",
+    response_model=JobQueueStats,
+    summary="Job queue statistics",
+    description="Report queue depth, running jobs and known jobs by status."
+)
+async def job_stats(services: ServiceRegistry = Depends(get_services)) -> JobQueueStats:
+    """Report job queue statistics.
+
+    Args:
+        services: Application service registry
+
+    Returns:
+        JobQueueStats with queue depth and job counts
+    """
+    return JobQueueStats(**services.jobs.stats())
+
+
+@router.post(
+    "/{vendor}/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    responses={503: {"description": "Job queue is full; retry after the Retry-After delay"}},
+    summary="Submit a token counting job",
+    description=(
+        "Queue a batch of texts to be counted in the background and return the job immediately. "
+        "Poll `GET /api/v1/jobs/{job_id}`, stream results from `GET /api/v1/jobs/{job_id}/stream`, "
+        "or cancel with `DELETE /api/v1/jobs/{job_id}`."
+    )
+)
+async def submit_job(
+    request: CountTokensJobRequest,
+    vendor: VendorType = Path(
+        ...,
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> JobResponse:
+    """Submit a token counting job.
+
+    Args:
+        request: CountTokensJobRequest containing texts, model and mode
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
+
+    Returns:
+        JobResponse of the queued job
+
+    Raises:
+        HTTPException: If the job has too many texts, the vendor is invalid or the queue is full
+    """
+    label_request(request.model)
+    if len(request.texts) > settings.JOB_MAX_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Job has {len(request.texts)} texts; at most {settings.JOB_MAX_TEXTS} are allowed"
+        )
+
+    jobs = services.jobs
+    job = jobs.submit(vendor, request.model, request.texts, mode=request.mode)
+    return job.to_response(queue_position=jobs.queue_position(job))
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Get a token counting job",
+    description="Report the status and progress of a job, and optionally the results counted so far."
+)
+async def get_job(
+    job_id: str = Path(..., description="Job ID returned on submission"),
+    results: bool = Query(False, description="Include the token counts and errors counted so far"),
+    services: ServiceRegistry = Depends(get_services)
+) -> JobResponse:
+    """Get the status of a job.
+
+    Args:
+        job_id: Job ID returned on submission
+        results: Whether to include the results counted so far
+        services: Application service registry
+
+    Returns:
+        JobResponse with status, progress and optionally results
+
+    Raises:
+        HTTPException: If the job does not exist or has expired
+    """
+    jobs = services.jobs
+    job = jobs.get(job_id)
+    return job.to_response(queue_position=jobs.queue_position(job), include_results=results)
+
+
+@router.get(
+    "/jobs/{job_id}/stream",
+    response_class=StreamingResponse,
+    summary="Stream the results of a token counting job",
+    description=(
+        "Stream one NDJSON line per text as it is counted, starting with the results already "
+        "available. The final line is `{\"job\": ...}` with the job's final status."
+    ),
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "NDJSON result lines"}}
+)
+async def stream_job(
+    job_id: str = Path(..., description="Job ID returned on submission"),
+    services: ServiceRegistry = Depends(get_services)
+) -> StreamingResponse:
+    """Stream the results of a job until it finishes.
+
+    Disconnecting stops the stream but not the job.
+
+    Args:
+        job_id: Job ID returned on submission
+        services: Application service registry
+
+    Returns:
+        StreamingResponse producing NDJSON result lines and a final job line
+
+    Raises:
+        HTTPException: If the job does not exist or has expired
+    """
+    jobs = services.jobs
+    job = jobs.get(job_id)
+    return StreamingResponse(jobs.stream(job), media_type="application/x-ndjson")
+
+
+@router.delete(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Cancel a token counting job",
+    description=(
+        "Cancel a queued or running job. Results counted before cancellation are kept. "
+        "Cancelling a finished job has no effect."
+    )
+)
+async def cancel_job(
+    job_id: str = Path(..., description="Job ID returned on submission"),
+    services: ServiceRegistry = Depends(get_services)
+) -> JobResponse:
+    """Cancel a job.
+
+    Args:
+        job_id: Job ID returned on submission
+        services: Application service registry
+
+    Returns:
+        JobResponse after cancellation; a running job reports "cancelled" once it stops
+
+    Raises:
+        HTTPException: If the job does not exist or has expired
+    """
+    job = services.jobs.cancel(job_id)
+    return job.to_response()
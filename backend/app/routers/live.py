@@ -0,0 +1,60 @@
+"""
+Router for live token counting over a WebSocket.
+"""
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models import BulkCountError, LiveRevision
+from app.registry import ServiceRegistry, get_services
+from app.services.live import LiveSession
+
+router = APIRouter(prefix="/api/v1", tags=["live"])
+
+
+async def _send_error(websocket: WebSocket, detail: str) -> None:
+    """Report a rejected message without closing the connection."""
+    error = BulkCountError(status_code=400, detail=detail)
+    await websocket.send_text('{"error": ' + error.model_dump_json() + "}")
+
+
+@router.websocket("/live")
+async def live_counts(websocket: WebSocket, services: ServiceRegistry = Depends(get_services)) -> None:
+    """Count document revisions as they are edited.
+
+    The client sends ``LiveRevision`` messages with the full texts of each
+    revision. The server pushes a ``LiveCount`` per format and target as
+    counts become available, then a ``LiveRevisionDone`` message. Revisions
+    are debounced, superseded revisions stop counting, and unchanged texts
+    are not counted again. Invalid messages are answered with
+    ``{"error": {...}}`` and the connection stays open.
+
+    Args:
+        websocket: Client connection
+        services: Application service registry
+    """
+    await websocket.accept()
+    session = LiveSession(
+        services.vendor,
+        websocket.send_text,
+        debounce_seconds=settings.LIVE_DEBOUNCE_MS / 1000,
+        max_delay_seconds=settings.LIVE_MAX_DELAY_MS / 1000,
+        max_targets=settings.LIVE_MAX_TARGETS,
+        max_formats=settings.LIVE_MAX_FORMATS
+    )
+    session.start()
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                session.submit(LiveRevision.model_validate_json(data))
+            except ValidationError as e:
+                await _send_error(websocket, f"Invalid revision: {e.errors(include_url=False)[0]['msg']}")
+            except ValueError as e:
+                await _send_error(websocket, str(e))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Cancels every upstream call still running for this client
+        await session.close()
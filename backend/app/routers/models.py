@@ -3,68 +3,70 @@ Router for model listing endpoints.
 """
 
 from typing import Literal
-from fastapi import APIRouter, HTTPException, Path
-from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response
 
 from app.config import settings
 from app.models import ModelsResponse
-from app.services import AnthropicService, GoogleService
+from app.registry import ServiceRegistry, get_services
+from app.disconnect import TimedCancellableRoute
+from app.encoding import json_bytes_response
 
-router = APIRouter(prefix="/api/v1", tags=["models"])
+router = APIRouter(prefix="/api/v1", tags=["models"], route_class=TimedCancellableRoute)
 
-VendorType = Literal["anthropic", "google"]
-
-
-@lru_cache()
-def get_anthropic_service() -> AnthropicService:
-    """Get cached Anthropic service instance."""
-    return AnthropicService(api_key=settings.ANTHROPIC_API_KEY)
-
-
-@lru_cache()
-def get_google_service() -> GoogleService:
-    """Get cached Google service instance."""
-    return GoogleService(api_key=settings.GOOGLE_API_KEY)
+VendorType = Literal["anthropic", "google", "openai"]
 
 
 @router.get(
     "/{vendor}/models",
     response_model=ModelsResponse,
+    responses={304: {"description": "Catalog unchanged since the ETag in If-None-Match"}},
     summary="List available models",
     description="Retrieve a list of available models from the specified vendor."
 )
 async def list_models(
+    request: Request,
     vendor: VendorType = Path(
         ...,
-        description="Vendor name (anthropic or google)"
-    )
-) -> ModelsResponse:
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> Response:
     """List available models for the specified vendor.
 
+    Catalogs are served from a stale-while-revalidate cache. The response
+    carries an ETag and Cache-Control header; a matching If-None-Match
+    yields 304 Not Modified.
+
     Args:
-        vendor: Vendor name ("anthropic" or "google")
+        request: Incoming request, checked for If-None-Match
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
 
     Returns:
-        ModelsResponse containing vendor name and list of models
+        The catalog's pre-encoded ModelsResponse, or 304 Not Modified
 
     Raises:
-        HTTPException: If vendor is invalid or API call fails
+        HTTPException: If vendor is invalid or not enabled, or API call fails
     """
     try:
-        if vendor == "anthropic":
-            service = get_anthropic_service()
-            models = await service.list_models()
-        elif vendor == "google":
-            service = get_google_service()
-            models = await service.list_models()
-        else:
-            # This should never happen due to VendorType validation
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid vendor: {vendor}. Must be 'anthropic' or 'google'."
-            )
+        loader = services.catalog_loaders.get(vendor)
+        if loader is None:
+            raise services.unavailable(vendor)
+
+        entry = await services.model_catalog.get(vendor, loader)
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": (
+                f"public, max-age={int(settings.MODEL_CATALOG_TTL_SECONDS)}, "
+                f"stale-while-revalidate={int(settings.MODEL_CATALOG_MAX_STALE_SECONDS)}"
+            ),
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if entry.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
 
-        return ModelsResponse(vendor=vendor, models=models)
+        return json_bytes_response(entry.body, headers=headers)
 
     except HTTPException:
         # Re-raise HTTP exceptions from services
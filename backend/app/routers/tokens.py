@@ -3,33 +3,50 @@ Router for token counting endpoints.
 """
 
 from typing import Literal
-from fastapi import APIRouter, HTTPException, Path
-from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 
 from app.config import settings
 from app.models import (
     CountTokensRequest,
     TokenCountResponse,
     CountTokensBatchRequest,
-    TokenCountBatchResponse
+    TokenCountBatchResponse,
+    SampledCountSummary,
+    CacheStatsResponse,
+    UpstreamStatsResponse
 )
-from app.services import AnthropicService, GoogleService
+from app.metrics import label_request
+from app.registry import ServiceRegistry, get_services
+from app.disconnect import TimedCancellableRoute
+from app.encoding import model_response
+from app.services.bulk import count_ndjson
+from app.services.sampling import SamplingOptions, count_sampled
 
-router = APIRouter(prefix="/api/v1", tags=["tokens"])
+router = APIRouter(prefix="/api/v1", tags=["tokens"], route_class=TimedCancellableRoute)
 
-VendorType = Literal["anthropic", "google"]
+VendorType = Literal["anthropic", "google", "openai"]
 
 
-@lru_cache()
-def get_anthropic_service() -> AnthropicService:
-    """Get cached Anthropic service instance."""
-    return AnthropicService(api_key=settings.ANTHROPIC_API_KEY)
+class BodyStreamingResponse(StreamingResponse):
+    """StreamingResponse whose content may still be reading the request body.
 
+    Starlette's StreamingResponse watches for client disconnects by reading
+    ``receive`` on older ASGI servers, which would swallow body chunks the
+    content is still consuming. This variant leaves ``receive`` to the
+    request stream, which raises ClientDisconnect itself.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
 
-@lru_cache()
-def get_google_service() -> GoogleService:
-    """Get cached Google service instance."""
-    return GoogleService(api_key=settings.GOOGLE_API_KEY)
+        if self.background is not None:
+            await self.background()
 
 
 @router.post(
@@ -42,46 +59,63 @@ async def count_tokens(
     request: CountTokensRequest,
     vendor: VendorType = Path(
         ...,
-        description="Vendor name (anthropic or google)"
-    )
-) -> TokenCountResponse:
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> Response:
     """Count tokens in text using the specified vendor and model.
 
     Args:
         request: CountTokensRequest containing text and model
-        vendor: Vendor name ("anthropic" or "google")
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
 
     Returns:
-        TokenCountResponse with vendor, model, and token count
+        JSON-encoded TokenCountResponse with vendor, model, and token count
 
     Raises:
         HTTPException: If vendor is invalid or API call fails
     """
     try:
-        if vendor == "anthropic":
-            service = get_anthropic_service()
-            token_count = await service.count_tokens(
-                text=request.text,
-                model=request.model
-            )
-        elif vendor == "google":
-            service = get_google_service()
-            token_count = await service.count_tokens(
+        service = services.vendor(vendor)
+        label_request(request.model)
+
+        if request.mode == "estimate":
+            estimate = service.estimate_tokens(text=request.text, model=request.model)
+            if request.refine:
+                service.refine_in_background({"text": request.text}, model=request.model)
+            return model_response(TokenCountResponse(
+                vendor=vendor,
+                model=request.model,
+                token_count=estimate.tokens,
+                exact=False,
+                error_bound=estimate.error_bound
+            ))
+
+        if request.mode == "chunked":
+            result = await service.count_tokens_chunked(
                 text=request.text,
                 model=request.model
             )
-        else:
-            # This should never happen due to VendorType validation
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid vendor: {vendor}. Must be 'anthropic' or 'google'."
-            )
+            return model_response(TokenCountResponse(
+                vendor=vendor,
+                model=request.model,
+                token_count=result.total,
+                exact=result.exact,
+                chunks=result.chunks,
+                reused_chunks=result.reused_chunks
+            ))
+
+        token_count = await service.count_tokens(
+            text=request.text,
+            model=request.model
+        )
 
-        return TokenCountResponse(
+        return model_response(TokenCountResponse(
             vendor=vendor,
             model=request.model,
             token_count=token_count
-        )
+        ))
 
     except HTTPException:
         # Re-raise HTTP exceptions from services
@@ -103,46 +137,114 @@ async def count_tokens_batch(
     request: CountTokensBatchRequest,
     vendor: VendorType = Path(
         ...,
-        description="Vendor name (anthropic or google)"
-    )
-) -> TokenCountBatchResponse:
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> Response:
     """Count tokens in multiple texts using the specified vendor and model.
 
     Args:
         request: CountTokensBatchRequest containing texts dictionary and model
-        vendor: Vendor name ("anthropic" or "google")
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
 
     Returns:
-        TokenCountBatchResponse with vendor, model, and token counts dictionary
+        JSON-encoded TokenCountBatchResponse with vendor, model, and token counts dictionary
 
     Raises:
         HTTPException: If vendor is invalid or API call fails
     """
     try:
-        if vendor == "anthropic":
-            service = get_anthropic_service()
-            token_counts = await service.count_tokens_batch(
+        service = services.vendor(vendor)
+        label_request(request.model)
+
+        if request.mode == "estimate":
+            estimates = service.estimate_tokens_batch(texts=request.texts, model=request.model)
+            if request.refine:
+                service.refine_in_background(request.texts, model=request.model)
+            return model_response(TokenCountBatchResponse(
+                vendor=vendor,
+                model=request.model,
+                token_counts={name: estimate.tokens for name, estimate in estimates.items()},
+                exact={name: False for name in estimates},
+                error_bounds={name: estimate.error_bound for name, estimate in estimates.items()}
+            ))
+
+        if request.mode == "chunked":
+            results = await service.count_tokens_batch_chunked(
                 texts=request.texts,
                 model=request.model
             )
-        elif vendor == "google":
-            service = get_google_service()
-            token_counts = await service.count_tokens_batch(
+            return model_response(TokenCountBatchResponse(
+                vendor=vendor,
+                model=request.model,
+                token_counts={name: result.total for name, result in results.items()},
+                latencies_ms={name: round(result.latency_ms, 3) for name, result in results.items()},
+                exact={name: result.exact for name, result in results.items()}
+            ))
+
+        if request.mode == "packed":
+            results = await service.count_tokens_batch_packed(
                 texts=request.texts,
                 model=request.model
             )
-        else:
-            # This should never happen due to VendorType validation
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid vendor: {vendor}. Must be 'anthropic' or 'google'."
+            return model_response(TokenCountBatchResponse(
+                vendor=vendor,
+                model=request.model,
+                token_counts={name: result.count for name, result in results.items()},
+                latencies_ms={name: round(result.latency_ms, 3) for name, result in results.items()},
+                exact={name: result.exact for name, result in results.items()},
+                error_bounds={name: result.error_bound for name, result in results.items() if not result.exact}
+            ))
+
+        if request.mode == "sampled":
+            batch = await count_sampled(
+                service,
+                texts=request.texts,
+                model=request.model,
+                target_error=request.target_error,
+                options=SamplingOptions(
+                    min_records=settings.SAMPLED_MIN_RECORDS,
+                    strata=settings.SAMPLED_STRATA,
+                    cluster_size=settings.SAMPLED_CLUSTER_SIZE,
+                    max_records=settings.SAMPLED_MAX_RECORDS
+                )
             )
+            results = batch.counts
+            return model_response(TokenCountBatchResponse(
+                vendor=vendor,
+                model=request.model,
+                token_counts={name: result.count for name, result in results.items()},
+                latencies_ms={name: round(result.latency_ms, 3) for name, result in results.items()},
+                exact={name: result.exact for name, result in results.items()},
+                error_bounds={name: result.error_bound for name, result in results.items() if not result.exact},
+                confidence_intervals={
+                    name: [result.low, result.high] for name, result in results.items() if not result.exact
+                },
+                sample=SampledCountSummary(
+                    records=batch.records,
+                    sampled_records=batch.sampled_records,
+                    strata=batch.strata,
+                    rounds=batch.rounds,
+                    upstream_texts=batch.upstream_texts,
+                    target_error=batch.target_error,
+                    achieved_error=round(batch.achieved_error, 6),
+                    target_met=batch.target_met
+                ) if batch.sampled else None
+            ))
+
+        token_counts, latencies_ms = await service.count_tokens_batch(
+            texts=request.texts,
+            model=request.model
+        )
 
-        return TokenCountBatchResponse(
+        return model_response(TokenCountBatchResponse(
             vendor=vendor,
             model=request.model,
-            token_counts=token_counts
-        )
+            token_counts=token_counts,
+            latencies_ms=latencies_ms,
+            exact={name: True for name in token_counts}
+        ))
 
     except HTTPException:
         # Re-raise HTTP exceptions from services
@@ -152,3 +254,105 @@ async def count_tokens_batch(
             status_code=500,
             detail=f"Unexpected error counting tokens: {str(e)}"
         )
+
+
+@router.post(
+    "/{vendor}/counttokens/stream",
+    response_class=BodyStreamingResponse,
+    summary="Count tokens in a stream of NDJSON records",
+    description=(
+        "Upload NDJSON where each line is a batch counting request (`texts` and `model`). "
+        "Records are counted with bounded concurrency and results are streamed back as NDJSON "
+        "in completion order, each tagged with its input line number. The final line is a "
+        "`summary` with per-format totals, mean and percentiles."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {
+                    "schema": {"$ref": "#/components/schemas/CountTokensBatchRequest"}
+                }
+            }
+        }
+    },
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "NDJSON result lines"}}
+)
+async def count_tokens_stream(
+    request: Request,
+    vendor: VendorType = Path(
+        ...,
+        description="Vendor name (anthropic, google or openai)"
+    ),
+    services: ServiceRegistry = Depends(get_services)
+) -> BodyStreamingResponse:
+    """Count tokens for an NDJSON stream of batch requests.
+
+    Per-record failures (invalid JSON, invalid model, upstream errors) are
+    reported on that record's result line and don't stop the stream.
+
+    Args:
+        request: Raw request whose body is NDJSON
+        vendor: Vendor name ("anthropic", "google" or "openai")
+        services: Application service registry
+
+    Returns:
+        BodyStreamingResponse producing NDJSON result lines and a summary line
+
+    Raises:
+        HTTPException: If vendor is invalid
+    """
+    service = services.vendor(vendor)
+    return BodyStreamingResponse(
+        count_ndjson(
+            service,
+            request.stream(),
+            concurrency=settings.BULK_CONCURRENCY,
+            max_line_bytes=settings.BULK_MAX_LINE_BYTES,
+            max_formats=settings.BULK_MAX_FORMATS
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get(
+    "/cache/stats",
+    response_model=CacheStatsResponse,
+    summary="Token count cache statistics",
+    description="Report size, limits and hit/miss counters of the token count cache and persistent store."
+)
+async def cache_stats(services: ServiceRegistry = Depends(get_services)) -> CacheStatsResponse:
+    """Report token count cache and store statistics.
+
+    Args:
+        services: Application service registry
+
+    Returns:
+        CacheStatsResponse with cache counters, or a disabled marker
+    """
+    cache = services.token_cache
+    store = services.token_store
+    store_stats = await store.stats() if store is not None else None
+    if cache is None:
+        return CacheStatsResponse(enabled=False, store=store_stats)
+    return CacheStatsResponse(enabled=True, store=store_stats, **cache.stats())
+
+
+@router.get(
+    "/upstream/stats",
+    response_model=UpstreamStatsResponse,
+    summary="Upstream scheduling and hedging statistics",
+    description="Report per-vendor scheduler state and, when hedging is enabled, hedge rate and hedge win rate."
+)
+async def upstream_stats(services: ServiceRegistry = Depends(get_services)) -> UpstreamStatsResponse:
+    """Report upstream scheduler and hedging statistics.
+
+    Args:
+        services: Application service registry
+
+    Returns:
+        UpstreamStatsResponse keyed by remote vendor, for the vendors used so far
+    """
+    return UpstreamStatsResponse(vendors={
+        vendor: service.upstream_stats() for vendor, service in services.remote_vendors().items()
+    })
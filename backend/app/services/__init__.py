@@ -1,8 +1,33 @@
 """
 Service layer for interacting with external APIs.
+
+Vendor services are imported on first access, so importing this package
+does not load any vendor SDK.
 """
 
-from .anthropic_service import AnthropicService
-from .google_service import GoogleService
+from .base import VendorService
+from .token_cache import TokenCountCache
+from .token_store import TokenCountStore
+from .model_catalog import ModelCatalogCache
+from .plugins import VENDOR_PLUGINS
+
+_VENDOR_CLASSES = {plugin.class_name: plugin for plugin in VENDOR_PLUGINS.values()}
+
+
+def __getattr__(name: str):
+    """Import vendor service classes lazily."""
+    plugin = _VENDOR_CLASSES.get(name)
+    if plugin is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return plugin.load()
+
 
-__all__ = ["AnthropicService", "GoogleService"]
+__all__ = [
+    "VendorService",
+    "TokenCountCache",
+    "TokenCountStore",
+    "ModelCatalogCache",
+    "AnthropicService",
+    "GoogleService",
+    "OpenAIService",
+]
@@ -2,30 +2,83 @@
 Service for interacting with Anthropic API.
 """
 
-from typing import List, Dict
-from anthropic import Anthropic, APIError
+from typing import Any, Dict, List, Optional, Union
+from anthropic import (
+    DEFAULT_CONNECTION_LIMITS,
+    APIError,
+    AsyncAnthropic,
+    DefaultAsyncHttpxClient,
+    RateLimitError,
+    Timeout
+)
 from fastapi import HTTPException
 
 from app.models import ModelInfo
+from app.services.base import PoolOptions, VendorService
+from app.services.scheduler import parse_retry_after, rate_limited
 
 
-class AnthropicService:
+class AnthropicService(VendorService):
     """Service for Anthropic API operations."""
 
-    def __init__(self, api_key: str):
-        """Initialize Anthropic client.
+    vendor = "anthropic"
+    supports_packing = True
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: float = 30.0,
+        pool: Optional[PoolOptions] = None,
+        base_url: Optional[str] = None,
+        **options
+    ):
+        """Initialize async Anthropic client.
 
         Args:
             api_key: Anthropic API key
+            timeout: Per-request timeout in seconds for upstream calls
+            pool: Connection pool tuning (SDK defaults if omitted)
+            base_url: API base URL override (e.g. a proxy or simulator)
+            **options: Shared counting options passed to VendorService
+                (concurrency, cache, store, single-flight, scheduler, ...)
         """
+        super().__init__(**options)
         try:
-            self.client = Anthropic(api_key=api_key)
+            if pool is not None:
+                # The SDK may bundle its own httpx, so build the pool from its classes
+                self._http_client = DefaultAsyncHttpxClient(
+                    http2=pool.http2,
+                    limits=type(DEFAULT_CONNECTION_LIMITS)(
+                        max_connections=pool.max_connections,
+                        max_keepalive_connections=pool.max_keepalive,
+                        keepalive_expiry=pool.keepalive_seconds
+                    ),
+                    timeout=Timeout(timeout, connect=pool.connect_timeout)
+                )
+            # Retries are left to the upstream scheduler, which sees every 429
+            self.client = AsyncAnthropic(
+                api_key=api_key,
+                timeout=timeout,
+                max_retries=0,
+                base_url=base_url,
+                http_client=self._http_client
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to initialize Anthropic client: {str(e)}"
             )
 
+    @property
+    def warm_url(self) -> Optional[str]:
+        """Anthropic API origin."""
+        return str(self.client.base_url)
+
+    async def close(self) -> None:
+        """Cancel background work and close the Anthropic client."""
+        await super().close()
+        await self.client.close()
+
     async def list_models(self) -> List[ModelInfo]:
         """List available Anthropic models.
 
@@ -36,7 +89,7 @@ class AnthropicService:
             HTTPException: If API call fails
         """
         try:
-            response = self.client.models.list()
+            response = await self.client.models.list()
 
             models = []
             for model in response.data:
@@ -59,12 +112,13 @@ class AnthropicService:
                 detail=f"Failed to list Anthropic models: {str(e)}"
             )
 
-    async def count_tokens(self, text: str, model: str) -> int:
-        """Count tokens in text using specified model.
+    async def _count(self, text: str, model: str, format_name: Optional[str] = None) -> int:
+        """Count tokens for a single non-empty text using specified model.
 
         Args:
             text: Text content to count tokens for
             model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
 
         Returns:
             Number of tokens
@@ -72,21 +126,55 @@ class AnthropicService:
         Raises:
             HTTPException: If API call fails
         """
-        # Handle empty text
-        if not text or not text.strip():
-            return 0
+        return await self._count_content(text, model, format_name)
+
+    async def _count_packed(self, texts: List[str], model: str) -> int:
+        """Count several texts as the text blocks of one user message.
+
+        Args:
+            texts: Texts to count together
+            model: Model ID to use for counting
+
+        Returns:
+            Number of tokens of the whole request
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        return await self._count_content([{"type": "text", "text": text} for text in texts], model)
 
+    async def _count_content(
+        self,
+        content: Union[str, List[Dict[str, Any]]],
+        model: str,
+        format_name: Optional[str] = None
+    ) -> int:
+        """Count the tokens of one user message.
+
+        Args:
+            content: Message content, a string or a list of content blocks
+            model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
+
+        Returns:
+            Number of input tokens
+
+        Raises:
+            HTTPException: If API call fails
+        """
         try:
-            response = self.client.messages.count_tokens(
+            response = await self.client.messages.count_tokens(
                 model=model,
                 messages=[{
                     "role": "user",
-                    "content": text
+                    "content": content
                 }]
             )
 
             return response.input_tokens
 
+        except RateLimitError as e:
+            raise rate_limited("Anthropic API rate limit exceeded", parse_retry_after(e.response.headers))
         except APIError as e:
             # Handle specific API errors
             if "model" in str(e).lower():
@@ -94,62 +182,22 @@ class AnthropicService:
                     status_code=400,
                     detail=f"Invalid model: {model}"
                 )
+            if format_name is not None:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Anthropic API error for format '{format_name}': {str(e)}"
+                )
             raise HTTPException(
                 status_code=500,
                 detail=f"Anthropic API error: {str(e)}"
             )
         except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to count tokens: {str(e)}"
-            )
-
-    async def count_tokens_batch(self, texts: Dict[str, str], model: str) -> Dict[str, int]:
-        """Count tokens for multiple texts using specified model.
-
-        Args:
-            texts: Dictionary mapping format names to text content
-            model: Model ID to use for counting
-
-        Returns:
-            Dictionary mapping format names to token counts
-
-        Raises:
-            HTTPException: If API call fails
-        """
-        results = {}
-
-        for format_name, text in texts.items():
-            # Handle empty text
-            if not text or not text.strip():
-                results[format_name] = 0
-                continue
-
-            try:
-                response = self.client.messages.count_tokens(
-                    model=model,
-                    messages=[{
-                        "role": "user",
-                        "content": text
-                    }]
-                )
-                results[format_name] = response.input_tokens
-
-            except APIError as e:
-                # Handle specific API errors
-                if "model" in str(e).lower():
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid model: {model}"
-                    )
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Anthropic API error for format '{format_name}': {str(e)}"
-                )
-            except Exception as e:
+            if format_name is not None:
                 raise HTTPException(
                     status_code=500,
                     detail=f"Failed to count tokens for format '{format_name}': {str(e)}"
                 )
-
-        return results
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to count tokens: {str(e)}"
+            )
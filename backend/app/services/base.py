@@ -0,0 +1,815 @@
+"""
+Shared base class for vendor token counting services.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException
+
+from app import metrics, timing
+from app.models import ModelInfo
+from app.services.chunking import ChunkedCount, Chunker
+from app.services.estimation import TokenEstimate, TokenEstimator
+from app.services.hedging import Hedger
+from app.services.packing import PACKING_PROBES, PackedCount, PackingOptions, apportion, plan_packs
+from app.services.scheduler import BULK, UpstreamScheduler, upstream_priority
+from app.services.token_cache import CacheKey, TokenCountCache
+from app.services.token_store import TokenCountStore
+from app.services.single_flight import SingleFlight, cancel_abandoned
+
+logger = logging.getLogger(__name__)
+
+# An uncounted text of a packed batch: (cache key, (format name, text))
+PackItem = Tuple[CacheKey, Tuple[str, str]]
+
+
+class VendorService:
+    """Base class for vendor API services.
+
+    Subclasses implement ``list_models`` and ``_count``, and ``_count_packed``
+    if they support packed counting. Single and batch counting, including the
+    token count cache and store lookups, single-flight coalescing of identical
+    upstream calls, upstream scheduling and the concurrent batch fan-out, are
+    shared here.
+    """
+
+    vendor: str = ""
+
+    # Whether counts of chunks split at safe boundaries sum to the unchunked count
+    exact_chunk_sums: bool = False
+
+    # Whether several texts can be counted in one upstream request (``_count_packed``)
+    supports_packing: bool = False
+
+    # API origin requested to pre-open pooled connections, for remote vendors
+    warm_url: Optional[str] = None
+
+    # Pooled HTTP client the vendor SDK sends requests on, if the service built one
+    _http_client: Optional[Any] = None
+
+    def __init__(
+        self,
+        batch_concurrency: int = 16,
+        cache: Optional[TokenCountCache] = None,
+        store: Optional[TokenCountStore] = None,
+        single_flight: bool = True,
+        chunker: Optional[Chunker] = None,
+        estimator: Optional[TokenEstimator] = None,
+        max_refinements: int = 64,
+        scheduler: Optional[UpstreamScheduler] = None,
+        hedger: Optional[Hedger] = None,
+        packing: Optional[PackingOptions] = None
+    ):
+        """Initialize shared service state.
+
+        Args:
+            batch_concurrency: Maximum number of upstream calls in flight at
+                once for this vendor when no scheduler is given
+            cache: Optional in-process token count cache consulted first
+            store: Optional persistent token count store consulted on cache misses
+            single_flight: Whether concurrent identical counts share one upstream call
+            chunker: Chunker used by chunked counting (defaults to Chunker())
+            estimator: Token estimator serving estimates and fitted from every
+                upstream count (defaults to an in-memory TokenEstimator)
+            max_refinements: Maximum number of background exact counts
+                started by estimate requests that may be pending at once
+            scheduler: Scheduler every upstream count goes through (defaults
+                to a fixed concurrency limit of ``batch_concurrency``)
+            hedger: Optional hedger duplicating upstream counts slower than
+                the model's recent p95; hedges share the primary's scheduler slot
+            packing: Limits and verification rate of packed counting
+                (defaults to PackingOptions())
+        """
+        self._scheduler = scheduler or UpstreamScheduler(
+            initial_concurrency=batch_concurrency,
+            max_concurrency=batch_concurrency
+        )
+        self._cache = cache
+        self._store = store
+        self.single_flight = SingleFlight() if single_flight else None
+        self._chunker = chunker or Chunker()
+        self._boundary_corrections: Dict[str, asyncio.Task] = {}
+        self._estimator = estimator or TokenEstimator()
+        self._max_refinements = max_refinements
+        self._refinements: Set[asyncio.Task] = set()
+        self._hedger = hedger
+        self._packing = packing or PackingOptions()
+        self._packing_framings: Dict[str, asyncio.Task] = {}
+        self._packed_requests = 0
+
+    def _key(self, model: str, text: str) -> CacheKey:
+        """Build the content-addressed key identifying a count."""
+        return TokenCountCache.key(self.vendor, model, text)
+
+    async def _lookup(self, keys: List[CacheKey]) -> Dict[CacheKey, int]:
+        """Find previously counted texts in the cache, then the store.
+
+        Store hits are copied into the in-process cache.
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            Dictionary of the keys that were found to their token counts
+        """
+        found: Dict[CacheKey, int] = {}
+        missing = keys
+        if self._cache is not None:
+            missing = []
+            for key in keys:
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(key)
+                else:
+                    found[key] = cached
+
+        if missing and self._store is not None:
+            stored = await self._store.get_many(missing)
+            if self._cache is not None:
+                for key, count in stored.items():
+                    self._cache.put(key, count)
+            found.update(stored)
+
+        return found
+
+    def _remember(self, key: CacheKey, count: int) -> None:
+        """Record a fresh upstream count in the cache and store."""
+        if self._cache is not None:
+            self._cache.put(key, count)
+        if self._store is not None:
+            self._store.put(key, count)
+
+    async def _count_shared(
+        self,
+        key: CacheKey,
+        text: str,
+        model: str,
+        format_name: Optional[str] = None
+    ) -> int:
+        """Count a text upstream, sharing the call with identical concurrent requests.
+
+        Args:
+            key: Content-addressed key of the count
+            text: Text content to count tokens for
+            model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
+
+        Returns:
+            Number of tokens
+
+        Raises:
+            HTTPException: If API call fails (429 if still rate limited after retries)
+        """
+        async def count_and_remember() -> int:
+            count = await self._scheduler.run(lambda: self._count_upstream(text, model, format_name))
+            self._remember(key, count)
+            self._estimator.observe(self.vendor, model, text, count, format_name)
+            return count
+
+        if self.single_flight is None:
+            return await count_and_remember()
+        return await self.single_flight.do(key, count_and_remember, cancel_when_abandoned=cancel_abandoned.get())
+
+    async def _count_upstream(self, text: str, model: str, format_name: Optional[str] = None) -> int:
+        """Count a text upstream, hedged if a hedger is configured, and record metrics."""
+        if self._hedger is None:
+            call = lambda: self._count(text, model, format_name)
+        else:
+            call = lambda: self._hedger.run(model, lambda: self._count(text, model, format_name))
+        return await self._observe_upstream(call, model, format_name or model, [text])
+
+    async def _count_packed_upstream(self, texts: List[str], model: str) -> int:
+        """Count several texts in one upstream request and record metrics.
+
+        Packed requests are not hedged: their latency grows with the pack,
+        so they would distort the per-model latency the hedger learns.
+        """
+        metrics.PACKED_REQUESTS.labels(self.vendor).inc()
+        metrics.PACKED_TEXTS.labels(self.vendor).inc(len(texts))
+        return await self._observe_upstream(
+            lambda: self._count_packed(texts, model), model, f"packed x{len(texts)}", texts
+        )
+
+    async def _observe_upstream(
+        self,
+        call: Callable[[], Awaitable[int]],
+        model: str,
+        description: str,
+        texts: Sequence[str]
+    ) -> int:
+        """Run one upstream count and record its metrics and Server-Timing entry."""
+        vendor = self.vendor
+        in_flight = metrics.UPSTREAM_IN_FLIGHT.labels(vendor)
+        in_flight.inc()
+        start = time.perf_counter()
+        cancelled = False
+        try:
+            count = await call()
+        except HTTPException as e:
+            metrics.UPSTREAM_ERRORS.labels(vendor, str(e.status_code)).inc()
+            raise
+        except asyncio.CancelledError:
+            # Abandoned, e.g. the client disconnected; kept out of the latency histogram
+            cancelled = True
+            metrics.UPSTREAM_CANCELLED.labels(vendor).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            if not cancelled:
+                metrics.UPSTREAM_DURATION.labels(vendor, metrics.model_label(model)).observe(elapsed)
+            timing.record_upstream(elapsed, f"{vendor} {description}")
+
+        metrics.TEXT_BYTES.labels(vendor).inc(sum(len(text.encode("utf-8", "surrogatepass")) for text in texts))
+        metrics.TOKENS.labels(vendor).inc(count)
+        return count
+
+    def upstream_stats(self) -> Dict[str, Any]:
+        """Report scheduler state and, if hedging is enabled, hedge counters."""
+        return {
+            "scheduler": self._scheduler.stats(),
+            "hedging": self._hedger.stats() if self._hedger is not None else None,
+        }
+
+    async def warm_connections(self, connections: int) -> int:
+        """Pre-open pooled connections to the vendor API.
+
+        Sends concurrent HEAD requests to the API origin so the TLS
+        handshakes happen before the first real request. Any response,
+        including an error status, leaves a reusable connection behind.
+
+        Args:
+            connections: Number of connections to open
+
+        Returns:
+            Number of connections opened
+        """
+        if self._http_client is None or not self.warm_url or connections <= 0:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._http_client.head(self.warm_url) for _ in range(connections)),
+            return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning("Failed to pre-open %d %s connection(s): %s", len(failures), self.vendor, failures[0])
+        return len(results) - len(failures)
+
+    async def close(self) -> None:
+        """Cancel background refinements and calibrations and close the HTTP client."""
+        tasks = [*self._refinements, *self._boundary_corrections.values(), *self._packing_framings.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+    async def list_models(self) -> List[ModelInfo]:
+        """List available models for this vendor."""
+        raise NotImplementedError
+
+    async def _count(self, text: str, model: str, format_name: Optional[str] = None) -> int:
+        """Count tokens for a single non-empty text upstream.
+
+        Args:
+            text: Text content to count tokens for
+            model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
+
+        Returns:
+            Number of tokens
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        raise NotImplementedError
+
+    async def _count_packed(self, texts: List[str], model: str) -> int:
+        """Count several non-empty texts in one upstream request.
+
+        Each text is sent as its own content block of one message, so the
+        result is the sum of the texts' tokens plus one request's framing.
+
+        Args:
+            texts: Texts to count together
+            model: Model ID to use for counting
+
+        Returns:
+            Number of tokens of the whole request
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        raise NotImplementedError
+
+    async def count_tokens(self, text: str, model: str) -> int:
+        """Count tokens in text using specified model.
+
+        Args:
+            text: Text content to count tokens for
+            model: Model ID to use for counting
+
+        Returns:
+            Number of tokens
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        # Handle empty text
+        if not text or not text.strip():
+            return 0
+
+        key = self._key(model, text)
+        found = await self._lookup([key])
+        if key in found:
+            return found[key]
+
+        return await self._count_shared(key, text, model)
+
+    async def count_tokens_each(self, texts: Dict[str, str], model: str) -> Dict[str, "CountOutcome"]:
+        """Count tokens for multiple texts concurrently, capturing per-text errors.
+
+        Counts found in the cache or store are served locally and only
+        misses go upstream. Upstream calls run concurrently, admitted by the
+        vendor's upstream scheduler. Failures are recorded per text instead of
+        being raised.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID to use for counting
+
+        Returns:
+            Dictionary mapping format names to their CountOutcome
+        """
+        keys = {
+            format_name: self._key(model, text)
+            for format_name, text in texts.items()
+            if text and text.strip()
+        }
+        known = await self._lookup(list(set(keys.values())))
+
+        async def count_one(format_name: str, text: str) -> CountOutcome:
+            # Handle empty text
+            if format_name not in keys:
+                return CountOutcome(count=0)
+
+            key = keys[format_name]
+            if key in known:
+                return CountOutcome(count=known[key], cached=True)
+
+            start = time.perf_counter()
+            try:
+                count = await self._count_shared(key, text, model, format_name)
+            except Exception as e:
+                return CountOutcome(latency_ms=(time.perf_counter() - start) * 1000, error=e)
+            return CountOutcome(count=count, latency_ms=(time.perf_counter() - start) * 1000)
+
+        format_names = list(texts)
+        outcomes = await asyncio.gather(*(count_one(name, texts[name]) for name in format_names))
+        return dict(zip(format_names, outcomes))
+
+    async def count_tokens_batch(
+        self,
+        texts: Dict[str, str],
+        model: str
+    ) -> Tuple[Dict[str, int], Dict[str, float]]:
+        """Count tokens for multiple texts concurrently using specified model.
+
+        See ``count_tokens_each``. If any text fails, an invalid-model (400)
+        error takes precedence over other failures.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID to use for counting
+
+        Returns:
+            Tuple of (format name to token count, format name to upstream
+            latency in milliseconds; 0 for empty or already known texts)
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        outcomes = await self.count_tokens_each(texts, model)
+
+        errors = [outcome.error for outcome in outcomes.values() if outcome.error is not None]
+        if errors:
+            raise select_batch_error(errors)
+
+        token_counts = {}
+        latencies_ms = {}
+        for format_name, outcome in outcomes.items():
+            token_counts[format_name] = outcome.count
+            latencies_ms[format_name] = round(outcome.latency_ms, 3)
+
+        return token_counts, latencies_ms
+
+    async def count_tokens_chunked(self, text: str, model: str) -> ChunkedCount:
+        """Count tokens in text by counting content-defined chunks.
+
+        Texts up to the chunker's maximum chunk size are counted exactly in
+        one call. Larger texts are split at tokenization-safe boundaries and
+        the chunks are counted concurrently; each chunk is cached by its
+        hash, so after an edit only changed chunks go upstream. Unless the
+        vendor's chunk sums are exact, a calibrated per-boundary correction
+        is subtracted and the total is marked as an estimate.
+
+        Args:
+            text: Text content to count tokens for
+            model: Model ID to use for counting
+
+        Returns:
+            ChunkedCount with the total and whether it is exact
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        start = time.perf_counter()
+        chunks, safe = self._chunker.split(text)
+        if len(chunks) == 1:
+            token_count = await self.count_tokens(text, model)
+            return ChunkedCount(total=token_count, exact=True, latency_ms=(time.perf_counter() - start) * 1000)
+
+        outcomes = await self.count_tokens_each(
+            {f"chunk {index}": chunk for index, chunk in enumerate(chunks)},
+            model
+        )
+        errors = [outcome.error for outcome in outcomes.values() if outcome.error is not None]
+        if errors:
+            raise select_batch_error(errors)
+
+        exact = safe and self.exact_chunk_sums
+        correction = 0.0 if exact else await self._boundary_correction(model)
+        boundaries = sum(1 for chunk in chunks if chunk.strip()) - 1
+        total = sum(outcome.count for outcome in outcomes.values()) - correction * max(boundaries, 0)
+
+        return ChunkedCount(
+            total=max(round(total), 0),
+            exact=exact,
+            chunks=len(chunks),
+            reused_chunks=sum(1 for outcome in outcomes.values() if outcome.cached),
+            correction=correction,
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
+
+    async def count_tokens_batch_chunked(self, texts: Dict[str, str], model: str) -> Dict[str, ChunkedCount]:
+        """Count tokens for multiple texts concurrently in chunked mode.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID to use for counting
+
+        Returns:
+            Dictionary mapping format names to their ChunkedCount
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        format_names = list(texts)
+        results = await asyncio.gather(
+            *(self.count_tokens_chunked(texts[name], model) for name in format_names),
+            return_exceptions=True
+        )
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise select_batch_error(errors)
+        return dict(zip(format_names, results))
+
+    async def count_tokens_batch_packed(self, texts: Dict[str, str], model: str) -> Dict[str, PackedCount]:
+        """Count tokens for multiple texts with as few upstream requests as possible.
+
+        Texts found in the cache or store are served locally. The others are
+        packed into as few requests as the packing limits allow. A pack of one
+        text is counted exactly as usual. For larger packs, the exact total
+        the texts would have unpacked is the packed count plus one framing
+        baseline per extra text; it is apportioned over the texts by their
+        calibrated estimates, so those counts are inexact and not cached.
+        Vendors without packing support count every text exactly.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID to use for counting
+
+        Returns:
+            Dictionary mapping format names to their PackedCount
+
+        Raises:
+            HTTPException: If API call fails
+        """
+        if not self.supports_packing:
+            outcomes = await self.count_tokens_each(texts, model)
+            errors = [outcome.error for outcome in outcomes.values() if outcome.error is not None]
+            if errors:
+                raise select_batch_error(errors)
+            return {
+                format_name: PackedCount(
+                    count=outcome.count,
+                    exact=True,
+                    latency_ms=outcome.latency_ms,
+                    cached=outcome.cached
+                )
+                for format_name, outcome in outcomes.items()
+            }
+
+        keys = {
+            format_name: self._key(model, text)
+            for format_name, text in texts.items()
+            if text and text.strip()
+        }
+        known = await self._lookup(list(set(keys.values())))
+
+        # Uncounted texts by key (identical texts are counted once), with a format name for estimates
+        pending: Dict[CacheKey, Tuple[str, str]] = {}
+        for format_name, key in keys.items():
+            if key not in known and key not in pending:
+                pending[key] = (format_name, texts[format_name])
+
+        packs = plan_packs(list(pending.items()), self._packing.max_texts, self._packing.max_chars)
+        results = await asyncio.gather(*(self._count_pack(pack, model) for pack in packs), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise select_batch_error(errors)
+        counted: Dict[CacheKey, PackedCount] = {}
+        for result in results:
+            counted.update(result)
+
+        packed_counts = {}
+        for format_name in texts:
+            key = keys.get(format_name)
+            if key is None:
+                # Handle empty text
+                packed_counts[format_name] = PackedCount(count=0, exact=True)
+            elif key in known:
+                packed_counts[format_name] = PackedCount(count=known[key], exact=True, cached=True)
+            else:
+                packed_counts[format_name] = counted[key]
+        return packed_counts
+
+    async def _count_pack(self, pack: List[PackItem], model: str) -> Dict[CacheKey, PackedCount]:
+        """Count one pack of uncounted texts and split its total over them."""
+        if len(pack) == 1:
+            key, (format_name, text) = pack[0]
+            start = time.perf_counter()
+            count = await self._count_shared(key, text, model, format_name)
+            return {key: PackedCount(count=count, exact=True, latency_ms=(time.perf_counter() - start) * 1000)}
+
+        framing = await self._packing_framing(model)
+        start = time.perf_counter()
+        pack_texts = [text for _, (_, text) in pack]
+        total = await self._scheduler.run(lambda: self._count_packed_upstream(pack_texts, model))
+        latency_ms = (time.perf_counter() - start) * 1000
+        self._verify_packing_sometimes(pack, total, framing, model)
+
+        estimates = [
+            self._estimator.estimate(self.vendor, model, text, format_name)
+            for _, (format_name, text) in pack
+        ]
+        unpacked_total = max(round(total + framing * (len(pack) - 1)), len(pack))
+        shares = apportion(unpacked_total, [estimate.tokens for estimate in estimates])
+        counts = {}
+        for (key, _), share, estimate in zip(pack, shares, estimates):
+            # The exact total bounds each share: every other text has at least one token
+            largest_error = max(share - 1, unpacked_total - (len(pack) - 1) - share)
+            counts[key] = PackedCount(
+                count=share,
+                exact=False,
+                error_bound=min(estimate.error_bound, largest_error),
+                latency_ms=latency_ms
+            )
+        return counts
+
+    async def _packing_framing(self, model: str) -> float:
+        """Tokens of per-request framing in a packed count, calibrated once per model.
+
+        Failed calibrations are retried on the next call; a failed
+        verification drops the calibration so it is measured again.
+        """
+        task = self._packing_framings.get(model)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.get_running_loop().create_task(self._calibrate_packing(model))
+            self._packing_framings[model] = task
+        return await asyncio.shield(task)
+
+    async def _calibrate_packing(self, model: str) -> float:
+        """Measure per-request framing by counting the probes alone and packed.
+
+        Alone, the probes carry one framing each; packed, they share one.
+        """
+        probes = list(PACKING_PROBES)
+        singles, _ = await self.count_tokens_batch(
+            {f"probe {index}": probe for index, probe in enumerate(probes)},
+            model
+        )
+        packed = await self._scheduler.run(lambda: self._count_packed_upstream(probes, model))
+        return (sum(singles.values()) - packed) / (len(probes) - 1)
+
+    def _verify_packing_sometimes(
+        self,
+        pack: List[PackItem],
+        total: int,
+        framing: float,
+        model: str
+    ) -> None:
+        """Recount one in ``verify_every`` packs unpacked in the background.
+
+        The unpacked counts must exceed the packed total by one framing per
+        extra text. If they are off by a token per text or more, the model's
+        framing is recalibrated. The exact counts are cached either way, so
+        the verified texts are exact from then on. Verifications share the
+        budget of background refinements and run as bulk work.
+        """
+        verify_every = self._packing.verify_every
+        if verify_every <= 0:
+            return
+        self._packed_requests += 1
+        if self._packed_requests % verify_every != 0 or len(self._refinements) >= self._max_refinements:
+            return
+
+        async def verify() -> None:
+            upstream_priority.set(BULK)
+            counts, _ = await self.count_tokens_batch({format_name: text for _, (format_name, text) in pack}, model)
+            observed = (sum(counts.values()) - total) / (len(pack) - 1)
+            if abs(observed - framing) < 1:
+                metrics.PACKED_VERIFICATIONS.labels(self.vendor, "ok").inc()
+                return
+            metrics.PACKED_VERIFICATIONS.labels(self.vendor, "drift").inc()
+            logger.warning(
+                "Packed %s framing for %s was %.2f tokens but measured %.2f; recalibrating",
+                self.vendor, model, framing, observed
+            )
+            if self._packing_framings.get(model) is not None and self._packing_framings[model].done():
+                del self._packing_framings[model]
+
+        task = asyncio.get_running_loop().create_task(verify())
+        self._refinements.add(task)
+        task.add_done_callback(self._refinements.discard)
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    def estimate_tokens(self, text: str, model: str, format_name: Optional[str] = None) -> TokenEstimate:
+        """Estimate tokens in text without calling the vendor.
+
+        Args:
+            text: Text content to estimate
+            model: Model ID the estimate is for
+            format_name: Format of the text (e.g. "yaml"), if known
+
+        Returns:
+            TokenEstimate with the count and an approximate 95% error bound
+        """
+        return self._estimator.estimate(self.vendor, model, text, format_name)
+
+    def estimate_tokens_batch(self, texts: Dict[str, str], model: str) -> Dict[str, TokenEstimate]:
+        """Estimate tokens for multiple texts without calling the vendor.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID the estimates are for
+
+        Returns:
+            Dictionary mapping format names to their TokenEstimate
+        """
+        return {
+            format_name: self._estimator.estimate(self.vendor, model, text, format_name)
+            for format_name, text in texts.items()
+        }
+
+    def refine_in_background(self, texts: Dict[str, str], model: str) -> bool:
+        """Count texts exactly in the background to improve estimate calibration.
+
+        Already known texts are not recounted and the counts are scheduled
+        as bulk work. Failures are ignored.
+
+        Args:
+            texts: Dictionary mapping format names to text content
+            model: Model ID to count with
+
+        Returns:
+            Whether the refinement was started; False if too many are pending
+        """
+        if len(self._refinements) >= self._max_refinements:
+            return False
+
+        async def refine() -> None:
+            upstream_priority.set(BULK)
+            await self.count_tokens_each(texts, model)
+
+        task = asyncio.get_running_loop().create_task(refine())
+        self._refinements.add(task)
+        task.add_done_callback(self._refinements.discard)
+        return True
+
+    async def _boundary_correction(self, model: str) -> float:
+        """Tokens to subtract per chunk boundary, calibrated once per model.
+
+        Failed calibrations are retried on the next call.
+        """
+        task = self._boundary_corrections.get(model)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.get_running_loop().create_task(self._calibrate_boundary(model))
+            self._boundary_corrections[model] = task
+        return await asyncio.shield(task)
+
+    async def _calibrate_boundary(self, model: str) -> float:
+        """Measure the per-boundary overcount of summed chunk counts.
+
+        Each probe is counted whole and as two halves split at a safe
+        boundary; the median difference captures per-request framing and any
+        merges lost at the cut.
+        """
+        texts: Dict[str, str] = {}
+        for index, (head, tail) in enumerate(CALIBRATION_PROBES):
+            texts[f"head {index}"] = head
+            texts[f"tail {index}"] = tail
+            texts[f"whole {index}"] = head + tail
+
+        counts, _ = await self.count_tokens_batch(texts, model)
+        differences = sorted(
+            counts[f"head {index}"] + counts[f"tail {index}"] - counts[f"whole {index}"]
+            for index in range(len(CALIBRATION_PROBES))
+        )
+        return float(differences[len(differences) // 2])
+
+
+# Probe texts split at a safe boundary, one per document style
+CALIBRATION_PROBES = (
+    ('{\n  "id": 1,\n  "name": "Alice",\n', '  "role": "admin",\n  "active": true\n}'),
+    ("users:\n  - id: 1\n    name: Alice\n", "  - id: 2\n    name: Bob\n"),
+    ("<root>\n    <id>1</id>\n    <name>Alice</name>\n", "    <role>admin</role>\n</root>"),
+)
+
+
+class PoolOptions:
+    """Connection pool tuning of a vendor's HTTP client."""
+
+    __slots__ = ("max_connections", "max_keepalive", "keepalive_seconds", "connect_timeout", "http2")
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_seconds: float = 30.0,
+        connect_timeout: float = 5.0,
+        http2: bool = False
+    ):
+        """Create pool options.
+
+        Args:
+            max_connections: Maximum number of open connections
+            max_keepalive: Maximum number of idle connections kept open
+            keepalive_seconds: How long an idle connection is kept open
+            connect_timeout: Timeout for establishing a connection, in seconds
+            http2: Whether to negotiate HTTP/2 (requires the h2 package)
+        """
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_seconds = keepalive_seconds
+        self.connect_timeout = connect_timeout
+        self.http2 = http2
+
+
+class CountOutcome:
+    """Result of counting one text: a token count or the error raised."""
+
+    __slots__ = ("count", "latency_ms", "error", "cached")
+
+    def __init__(
+        self,
+        count: Optional[int] = None,
+        latency_ms: float = 0.0,
+        error: Optional[Exception] = None,
+        cached: bool = False
+    ):
+        """Create an outcome.
+
+        Args:
+            count: Token count, if counting succeeded
+            latency_ms: Upstream latency in milliseconds; 0 for empty or known texts
+            error: Exception raised while counting, if any
+            cached: Whether the count was served from the cache or store
+        """
+        self.count = count
+        self.latency_ms = latency_ms
+        self.error = error
+        self.cached = cached
+
+
+def select_batch_error(errors: List[Exception]) -> Exception:
+    """Pick the error a batch request should surface.
+
+    Invalid-model (400) errors win over all other failures, otherwise the
+    first error in format order is returned.
+
+    Args:
+        errors: Non-empty list of errors raised by per-format calls
+
+    Returns:
+        The error to raise
+    """
+    for error in errors:
+        if isinstance(error, HTTPException) and error.status_code == 400:
+            return error
+    return errors[0]
@@ -0,0 +1,319 @@
+"""
+Offline byte-pair-encoding tokenizer for OpenAI encodings.
+
+A pure-Python implementation of the ``cl100k_base`` and ``o200k_base``
+encodings used by OpenAI models. Rank tables are vendored under
+``app/services/tokenizers`` in a compact binary form (gzip-compressed,
+length-prefixed token bytes in rank order) and loaded lazily on first use.
+
+Text is split into pieces with the encoding's pre-tokenization pattern and
+each piece is merged by rank. Merge results for repeated pieces are cached,
+which makes real documents (with their heavily repeated keys, punctuation
+and whitespace runs) cheap to count.
+
+Regenerate a rank table from an upstream ``.tiktoken`` file with::
+
+    python -m app.services.bpe <name>.tiktoken app/services/tokenizers/<name>.bpe.gz
+"""
+
+import base64
+import gzip
+import heapq
+import os
+import sys
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import regex
+
+TOKENIZER_DIR = os.path.join(os.path.dirname(__file__), "tokenizers")
+
+_CONTRACTIONS = r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)"""
+
+PATTERNS = {
+    "cl100k_base": (
+        _CONTRACTIONS
+        + r"""|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+    ),
+    "o200k_base": "|".join([
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+""" + _CONTRACTIONS + "?",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*""" + _CONTRACTIONS + "?",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]),
+}
+
+ENCODING_NAMES = tuple(PATTERNS)
+
+_NO_RANK = sys.maxsize
+
+# Pieces longer than this are merged with a heap instead of linear scans
+_HEAP_MERGE_THRESHOLD = 64
+
+# Pieces longer than this are rare and not worth holding in the merge cache
+_MAX_CACHED_PIECE = 256
+
+
+def load_rank_table(path: str) -> Dict[bytes, int]:
+    """Load a compact rank table.
+
+    The file is a gzip stream of ``<2-byte big-endian length><token bytes>``
+    records; a token's rank is its position in the stream.
+
+    Args:
+        path: Path of the ``.bpe.gz`` file
+
+    Returns:
+        Dictionary mapping token bytes to rank
+    """
+    with gzip.open(path, "rb") as handle:
+        data = handle.read()
+
+    ranks: Dict[bytes, int] = {}
+    offset = 0
+    rank = 0
+    size = len(data)
+    while offset < size:
+        length = (data[offset] << 8) | data[offset + 1]
+        offset += 2
+        ranks[data[offset:offset + length]] = rank
+        offset += length
+        rank += 1
+    return ranks
+
+
+def write_rank_table(tiktoken_path: str, output_path: str) -> int:
+    """Convert an upstream ``.tiktoken`` file into a compact rank table.
+
+    Args:
+        tiktoken_path: Path of a ``<base64 token> <rank>`` per-line file
+        output_path: Path of the ``.bpe.gz`` file to write
+
+    Returns:
+        Number of tokens written
+    """
+    entries: List[Tuple[int, bytes]] = []
+    with open(tiktoken_path, "rb") as handle:
+        for line in handle:
+            if line.strip():
+                token, rank = line.split()
+                entries.append((int(rank), base64.b64decode(token)))
+    entries.sort()
+
+    if [rank for rank, _ in entries] != list(range(len(entries))):
+        raise ValueError("Ranks must be contiguous from 0")
+
+    chunks = []
+    for _, token in entries:
+        chunks.append(len(token).to_bytes(2, "big"))
+        chunks.append(token)
+
+    # mtime=0 keeps the output byte-for-byte reproducible
+    with open(output_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as handle:
+        handle.write(b"".join(chunks))
+    return len(entries)
+
+
+class BPEEncoding:
+    """A byte-pair encoding with a bounded merge cache."""
+
+    def __init__(self, name: str, ranks: Dict[bytes, int], pattern: str, cache_size: int = 65536):
+        """Create an encoding.
+
+        Args:
+            name: Encoding name (e.g. "o200k_base")
+            ranks: Mapping of token bytes to rank
+            pattern: Pre-tokenization regular expression
+            cache_size: Maximum number of cached piece merges
+        """
+        self.name = name
+        self._ranks = ranks
+        self._pattern = regex.compile(pattern)
+        self._cache_size = cache_size
+        self._cache: Dict[bytes, Tuple[int, ...]] = {}
+        # Counts of large texts run in worker threads; lookups are atomic,
+        # but eviction iterates the cache and so must not race an insert
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def n_vocab(self) -> int:
+        """Number of ordinary tokens in the vocabulary."""
+        return len(self._ranks)
+
+    def _merge(self, piece: bytes) -> Tuple[int, ...]:
+        """Merge one pre-tokenized piece into token ranks.
+
+        Repeatedly merges the lowest-ranked adjacent pair, leftmost first.
+        """
+        if len(piece) > _HEAP_MERGE_THRESHOLD:
+            return self._merge_heap(piece)
+
+        ranks = self._ranks
+        # Parts are piece[starts[k]:starts[k + 1]]; pair_ranks[k] is the rank of parts k and k + 1 joined
+        starts = list(range(len(piece) + 1))
+        pair_ranks = [ranks.get(piece[i:i + 2], _NO_RANK) for i in range(len(piece) - 1)]
+
+        while pair_ranks:
+            best = min(pair_ranks)
+            if best == _NO_RANK:
+                break
+            i = pair_ranks.index(best)
+            del starts[i + 1]
+            del pair_ranks[i]
+            if i > 0:
+                pair_ranks[i - 1] = ranks.get(piece[starts[i - 1]:starts[i + 1]], _NO_RANK)
+            if i < len(pair_ranks):
+                pair_ranks[i] = ranks.get(piece[starts[i]:starts[i + 2]], _NO_RANK)
+
+        return tuple(ranks[piece[starts[k]:starts[k + 1]]] for k in range(len(starts) - 1))
+
+    def _merge_heap(self, piece: bytes) -> Tuple[int, ...]:
+        """Merge a long piece in O(n log n) using a heap over a linked list of parts.
+
+        Produces the same merges as ``_merge``: heap entries order by rank,
+        then by position, so ties resolve leftmost first.
+        """
+        ranks = self._ranks
+        size = len(piece)
+        # Parts are linked by start offset: part i spans piece[i:nxt[i]]
+        nxt = list(range(1, size + 1))
+        prv = list(range(-1, size - 1))
+        alive = [True] * size
+        heap = []
+        for i in range(size - 1):
+            rank = ranks.get(piece[i:i + 2])
+            if rank is not None:
+                heap.append((rank, i, i + 2))
+        heapq.heapify(heap)
+
+        while heap:
+            rank, i, end = heapq.heappop(heap)
+            j = nxt[i]
+            # Skip entries made stale by earlier merges
+            if not alive[i] or j >= size or nxt[j] != end:
+                continue
+
+            nxt[i] = end
+            alive[j] = False
+            if end < size:
+                prv[end] = i
+                pair_rank = ranks.get(piece[i:nxt[end]])
+                if pair_rank is not None:
+                    heapq.heappush(heap, (pair_rank, i, nxt[end]))
+            before = prv[i]
+            if before >= 0:
+                pair_rank = ranks.get(piece[before:end])
+                if pair_rank is not None:
+                    heapq.heappush(heap, (pair_rank, before, end))
+
+        tokens = []
+        i = 0
+        while i < size:
+            tokens.append(ranks[piece[i:nxt[i]]])
+            i = nxt[i]
+        return tuple(tokens)
+
+    def _encode_piece(self, piece: bytes) -> Tuple[int, ...]:
+        """Encode a piece, consulting the merge cache."""
+        rank = self._ranks.get(piece)
+        if rank is not None:
+            return (rank,)
+
+        cached = self._cache.get(piece)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        self.cache_misses += 1
+        tokens = self._merge(piece)
+        if len(piece) > _MAX_CACHED_PIECE:
+            return tokens
+        with self._cache_lock:
+            if len(self._cache) >= self._cache_size:
+                # Evict the oldest entry; dicts preserve insertion order
+                self._cache.pop(next(iter(self._cache)), None)
+            self._cache[piece] = tokens
+        return tokens
+
+    def encode(self, text: str) -> List[int]:
+        """Encode text into token ranks, treating special tokens as plain text.
+
+        Args:
+            text: Text to encode
+
+        Returns:
+            List of token ranks
+        """
+        tokens: List[int] = []
+        for piece in self._pattern.findall(text):
+            tokens.extend(self._encode_piece(piece.encode("utf-8")))
+        return tokens
+
+    def count(self, text: str) -> int:
+        """Count the tokens in a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens
+        """
+        ranks = self._ranks
+        total = 0
+        for piece in self._pattern.findall(text):
+            encoded = piece.encode("utf-8")
+            total += 1 if encoded in ranks else len(self._encode_piece(encoded))
+        return total
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """Count the tokens in several texts.
+
+        Args:
+            texts: Texts to count
+
+        Returns:
+            Token counts in input order
+        """
+        return [self.count(text) for text in texts]
+
+
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(name: str) -> BPEEncoding:
+    """Load a vendored encoding; cached for the life of the process."""
+    ranks = load_rank_table(os.path.join(TOKENIZER_DIR, f"{name}.bpe.gz"))
+    return BPEEncoding(name, ranks, PATTERNS[name])
+
+
+def get_encoding(name: str) -> BPEEncoding:
+    """Get a vendored encoding by name, loading it on first use.
+
+    Args:
+        name: One of ``ENCODING_NAMES``
+
+    Returns:
+        The shared BPEEncoding instance
+
+    Raises:
+        KeyError: If the encoding is unknown
+    """
+    if name not in PATTERNS:
+        raise KeyError(f"Unknown encoding: {name}")
+    # Serialize first loads so concurrent threads don't each parse the table
+    with _load_lock:
+        return _load_encoding(name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m app.services.bpe <input.tiktoken> <output.bpe.gz>", file=sys.stderr)
+        sys.exit(2)
+    print(f"wrote {write_rank_table(sys.argv[1], sys.argv[2])} tokens to {sys.argv[2]}")
@@ -0,0 +1,286 @@
+"""
+Streaming bulk token counting over NDJSON.
+
+Records are read from the request body one line at a time, counted with
+bounded concurrency and emitted as NDJSON lines as soon as each completes.
+Only the records in flight and a fixed-size histogram per format, for a
+bounded number of distinct formats, are held in memory, so memory stays
+flat however large the upload is.
+"""
+
+import asyncio
+import math
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.models import (
+    BulkCountError,
+    BulkCountResult,
+    BulkCountSummary,
+    BulkFormatSummary,
+    CountTokensBatchRequest,
+)
+from app.services.base import VendorService
+from app.services.scheduler import BULK, upstream_priority
+
+# Counts below this are tracked exactly; larger counts share log-spaced buckets
+_EXACT_LIMIT = 128
+# Relative width of a log-spaced bucket (percentile error is at most half of this)
+_BUCKET_GROWTH = 1.01
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class TokenHistogram:
+    """Streaming summary of token counts with bounded memory.
+
+    Totals, minimum and maximum are exact. Percentiles come from a
+    histogram that is exact below 128 tokens and log-spaced (1% wide
+    buckets) above, so its size grows with the logarithm of the largest
+    count rather than with the number of records.
+    """
+
+    def __init__(self):
+        """Create an empty histogram."""
+        self.records = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self._buckets: Dict[int, int] = {}
+
+    @staticmethod
+    def _bucket(value: int) -> int:
+        """Bucket index of a count; negative indexes are log-spaced buckets."""
+        if value < _EXACT_LIMIT:
+            return value
+        return -int(math.log(value) / _LOG_GROWTH)
+
+    @staticmethod
+    def _representative(bucket: int) -> float:
+        """Value reported for a bucket: its exact count or geometric midpoint."""
+        if bucket >= 0:
+            return float(bucket)
+        return _BUCKET_GROWTH ** (-bucket + 0.5)
+
+    def add(self, value: int) -> None:
+        """Record one count."""
+        self.records += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = self._bucket(value)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile, clamped to the observed range.
+
+        Args:
+            p: Percentile between 0 and 100
+
+        Returns:
+            Estimated count at the percentile, or 0 if nothing was recorded
+        """
+        if not self.records:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.records))
+        seen = 0
+        # Exact buckets sort ascending by index, log buckets by descending (negative) index
+        for bucket in sorted(self._buckets, key=lambda b: (b < 0, -b if b < 0 else b)):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                value = self._representative(bucket)
+                return round(min(max(value, self.min), self.max), 1)
+        return float(self.max)
+
+    def summary(self) -> BulkFormatSummary:
+        """Summarize the recorded counts."""
+        return BulkFormatSummary(
+            records=self.records,
+            total=self.total,
+            mean=round(self.total / self.records, 3) if self.records else 0.0,
+            min=self.min or 0,
+            max=self.max or 0,
+            percentiles={f"p{p}": self.percentile(p) for p in PERCENTILES}
+        )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a byte stream into numbered lines.
+
+    Lines longer than ``max_line_bytes`` are yielded as ``None`` and the
+    rest of the line is skipped without being buffered.
+
+    Args:
+        chunks: Request body chunks
+        max_line_bytes: Maximum size of a single line
+
+    Yields:
+        Tuples of (1-based line number, line bytes or None if too long)
+    """
+    buffer = bytearray()
+    number = 0
+    skipping = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+
+            number += 1
+            if skipping:
+                skipping = False
+                yield number, None
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield number, None
+                else:
+                    yield number, bytes(buffer)
+                buffer.clear()
+            start = end + 1
+
+    if skipping:
+        yield number + 1, None
+    elif buffer.strip():
+        yield number + 1, bytes(buffer)
+
+
+def _error(line: int, status_code: int, detail: str) -> BulkCountResult:
+    """Build the result line of a failed record."""
+    return BulkCountResult(line=line, error=BulkCountError(status_code=status_code, detail=detail))
+
+
+async def _count_record(
+    service: VendorService,
+    line: int,
+    data: Optional[bytes],
+    max_line_bytes: int,
+    formats: Set[str],
+    max_formats: int
+) -> BulkCountResult:
+    """Parse and count one NDJSON record, capturing failures in the result.
+
+    The record's format names are added to ``formats``; a record that would
+    take the stream past ``max_formats`` distinct names is rejected before
+    it is counted.
+    """
+    # Runs in its own task, so this only lowers the priority of this record's calls
+    upstream_priority.set(BULK)
+    if data is None:
+        return _error(line, 413, f"Record exceeds {max_line_bytes} bytes")
+
+    try:
+        record = CountTokensBatchRequest.model_validate_json(data)
+    except ValidationError as e:
+        return _error(line, 400, f"Invalid record: {e.errors(include_url=False)[0]['msg']}")
+
+    new_formats = record.texts.keys() - formats
+    if len(formats) + len(new_formats) > max_formats:
+        return _error(line, 400, f"At most {max_formats} distinct format names are allowed per stream")
+    formats.update(new_formats)
+
+    try:
+        token_counts, latencies_ms = await service.count_tokens_batch(texts=record.texts, model=record.model)
+    except HTTPException as e:
+        return _error(line, e.status_code, str(e.detail))
+    except Exception as e:
+        return _error(line, 500, f"Unexpected error counting tokens: {str(e)}")
+
+    return BulkCountResult(line=line, model=record.model, token_counts=token_counts, latencies_ms=latencies_ms)
+
+
+async def count_ndjson(
+    service: VendorService,
+    chunks: AsyncIterator[bytes],
+    concurrency: int = 32,
+    max_line_bytes: int = 16 * 1024 * 1024,
+    max_formats: int = 64
+) -> AsyncIterator[str]:
+    """Count NDJSON ``CountTokensBatchRequest`` records and stream results.
+
+    At most ``concurrency`` records are in flight; the body is only read
+    further once a slot frees up, so slow upstreams apply backpressure to
+    the upload. Results are emitted in completion order and carry their
+    input line number, followed by one ``{"summary": ...}`` line.
+
+    Args:
+        service: Vendor service to count with
+        chunks: Request body chunks
+        concurrency: Maximum number of records counted at once
+        max_line_bytes: Maximum size of a single record
+        max_formats: Maximum number of distinct format names in the stream;
+            records adding names beyond it fail with a 400
+
+    Yields:
+        NDJSON lines (each ending in a newline)
+    """
+    start = time.perf_counter()
+    histograms: Dict[str, TokenHistogram] = {}
+    formats: Set[str] = set()
+    records = 0
+    failed = 0
+
+    lines = iter_lines(chunks, max_line_bytes).__aiter__()
+    pending: Set[asyncio.Task] = set()
+    next_line: Optional[asyncio.Task] = None
+    exhausted = False
+
+    try:
+        while True:
+            if next_line is None and not exhausted and len(pending) < concurrency:
+                next_line = asyncio.ensure_future(lines.__anext__())
+
+            waiting = pending | {next_line} if next_line is not None else pending
+            if not waiting:
+                break
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if next_line is not None and next_line in done:
+                try:
+                    line, data = next_line.result()
+                except StopAsyncIteration:
+                    exhausted = True
+                else:
+                    if data is None or data.strip():
+                        pending.add(asyncio.ensure_future(
+                            _count_record(service, line, data, max_line_bytes, formats, max_formats)
+                        ))
+                next_line = None
+
+            for task in done & pending:
+                pending.discard(task)
+                result = task.result()
+                records += 1
+                if result.error is not None:
+                    failed += 1
+                else:
+                    for format_name, count in result.token_counts.items():
+                        histograms.setdefault(format_name, TokenHistogram()).add(count)
+                yield result.model_dump_json(exclude_defaults=True) + "\n"
+
+        summary = BulkCountSummary(
+            records=records,
+            failed=failed,
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+            formats={format_name: histogram.summary() for format_name, histogram in histograms.items()}
+        )
+        yield '{"summary": ' + summary.model_dump_json() + "}\n"
+
+    finally:
+        # Stop outstanding work if the client goes away mid-stream
+        outstanding = list(pending) + ([next_line] if next_line is not None else [])
+        for task in outstanding:
+            task.cancel()
+        await asyncio.gather(*outstanding, return_exceptions=True)
+        await lines.aclose()
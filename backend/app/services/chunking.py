@@ -0,0 +1,152 @@
+"""
+Content-defined chunking of large texts for chunked token counting.
+
+Boundaries are only placed where byte-pair tokenizers cannot merge across
+them: at the start of a line holding non-whitespace content, or between a
+letter or digit and a following punctuation character. A line holding only
+whitespace is never a boundary, because the pre-tokenizers join it to the
+line breaks around it, and neither is a line starting with ``/`` after a
+line ending in punctuation, which o200k_base joins across the break. Among
+those candidates, a boundary is taken where a hash of the preceding
+characters matches a mask, so boundaries depend on local content rather
+than on offsets. Editing one part of a document then
+changes only the chunks around the edit; all other chunks keep their hash
+and their cached count.
+"""
+
+import zlib
+from typing import List, Optional, Tuple
+
+import regex
+
+# A line start that begins a new piece: the line has non-whitespace content
+# before its line break, and does not begin with "/" after punctuation, since
+# o200k_base joins punctuation, line breaks and slashes into one piece
+_LINE_START = r"(?=[^\S\r\n]*\S)(?:(?!/)|(?<![^\s\p{L}\p{N}][\r\n/]*))"
+
+# Positions where the cl100k_base/o200k_base pre-tokenizers always start a new piece
+SAFE_BOUNDARY = regex.compile(r"(?<=\n)" + _LINE_START + r"|(?<=[\p{L}\p{N}])(?=[^\s\p{L}\p{N}\p{M}'])")
+
+# Checked at line starts found with str.find
+_SAFE_LINE_START = regex.compile(_LINE_START)
+
+# Number of characters before a candidate that decide whether it is a boundary
+_WINDOW = 64
+
+
+class Chunker:
+    """Split text into content-defined chunks at tokenization-safe boundaries."""
+
+    def __init__(self, min_chars: int = 4096, max_chars: int = 65536, mask_bits: int = 8):
+        """Configure chunk sizes.
+
+        Args:
+            min_chars: Minimum chunk size; no boundary is placed earlier
+            max_chars: Maximum chunk size; texts up to this size are not split
+            mask_bits: About one in ``2 ** mask_bits`` safe positions past the
+                minimum becomes a boundary
+        """
+        if not 0 < min_chars <= max_chars:
+            raise ValueError("Chunk sizes must satisfy 0 < min_chars <= max_chars")
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._mask = (1 << mask_bits) - 1
+
+    def _is_anchor(self, text: str, position: int) -> bool:
+        """Whether the content before a safe position selects it as a boundary."""
+        window = text[max(0, position - _WINDOW):position]
+        return zlib.crc32(window.encode("utf-8", "surrogatepass")) & self._mask == 0
+
+    def _line_anchor(self, text: str, begin: int, end: int) -> Optional[int]:
+        """Find the first anchor at a line start in ``[begin, end)``.
+
+        Line starts are found with ``str.find``, which is much faster than
+        scanning every safe position and covers all multi-line formats.
+        """
+        newline = text.find("\n", begin - 1, end - 1)
+        while newline >= 0:
+            position = newline + 1
+            if _SAFE_LINE_START.match(text, position) and self._is_anchor(text, position):
+                return position
+            newline = text.find("\n", position, end - 1)
+        return None
+
+    def _anchor(self, text: str, begin: int, end: int) -> Optional[int]:
+        """Find the first anchor among all safe positions in ``[begin, end)``.
+
+        Falls back to the last safe position if none is an anchor.
+        """
+        last_safe = None
+        for match in SAFE_BOUNDARY.finditer(text, begin, end):
+            position = match.start()
+            if self._is_anchor(text, position):
+                return position
+            last_safe = position
+        return last_safe
+
+    def split(self, text: str) -> Tuple[List[str], bool]:
+        """Split text into chunks.
+
+        Anchors at line starts are preferred; texts without usable line
+        breaks (e.g. compact JSON) fall back to every safe position. If no
+        anchor exists within ``max_chars`` of a chunk start, the chunk is
+        cut at the last safe position, or at ``max_chars`` if there is none.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            Tuple of (chunks that concatenate back to the text, whether every
+            cut is at a tokenization-safe position)
+        """
+        chunks: List[str] = []
+        safe = True
+        start = 0
+        size = len(text)
+
+        while size - start > self.max_chars:
+            end = start + self.max_chars
+            cut = self._line_anchor(text, start + self.min_chars, end)
+            if cut is None:
+                cut = self._anchor(text, start + self.min_chars, end)
+            if cut is None:
+                cut = end
+                safe = False
+
+            chunks.append(text[start:cut])
+            start = cut
+
+        chunks.append(text[start:])
+        return chunks, safe
+
+
+class ChunkedCount:
+    """Total of a chunked count and how it was obtained."""
+
+    __slots__ = ("total", "exact", "chunks", "reused_chunks", "correction", "latency_ms")
+
+    def __init__(
+        self,
+        total: int,
+        exact: bool,
+        chunks: int = 1,
+        reused_chunks: int = 0,
+        correction: float = 0.0,
+        latency_ms: float = 0.0
+    ):
+        """Create a result.
+
+        Args:
+            total: Token count of the whole text
+            exact: Whether the total equals an unchunked count
+            chunks: Number of chunks counted
+            reused_chunks: Number of chunks served from the cache or store
+            correction: Tokens subtracted per boundary
+            latency_ms: Wall-clock time to count all chunks, in milliseconds
+        """
+        self.total = total
+        self.exact = exact
+        self.chunks = chunks
+        self.reused_chunks = reused_chunks
+        self.correction = correction
+        self.latency_ms = latency_ms
@@ -0,0 +1,666 @@
+"""
+Server-side conversion of a JSON document into the compared formats.
+
+Produces the same five variants the frontend builds in the browser:
+
+- ``json``: pretty-printed JSON (``JSON.stringify(value, null, 2)``)
+- ``jsonCompact``: compact JSON (``JSON.stringify(value)``)
+- ``yaml``: YAML block style (``js-yaml`` dump with indent 2, no line wrapping)
+- ``toon``: Token-Oriented Object Notation (``@toon-format/toon`` encode defaults)
+- ``xml``: XML under a ``<root>`` element (``js2xmlparser`` without declaration)
+
+Each serializer is a single-pass generator over the parsed document that
+yields string fragments, so no intermediate copy of the document is built.
+Numbers are rendered the way JavaScript prints them so that token counts
+match the browser output.
+"""
+
+import math
+import re
+from decimal import Decimal
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+FORMAT_NAMES = ("json", "jsonCompact", "yaml", "toon", "xml")
+
+# Largest integer JavaScript numbers hold exactly (Number.MAX_SAFE_INTEGER)
+_MAX_SAFE_INTEGER = 2 ** 53 - 1
+
+
+# ---------------------------------------------------------------------------
+# Numbers
+# ---------------------------------------------------------------------------
+
+def _float_parts(value: float) -> Tuple[str, str, int]:
+    """Split a finite non-zero float into (sign, digits, point position).
+
+    The value equals ``sign 0.<digits> * 10**point`` with ``digits`` being the
+    shortest round-trip representation.
+    """
+    sign, digits, exponent = Decimal(repr(value)).as_tuple()
+    significant = "".join(str(digit) for digit in digits).lstrip("0")
+    return ("-" if sign else ""), significant.rstrip("0"), len(significant) + exponent
+
+
+def _js_double(value: int) -> float:
+    """The double JavaScript parses an integer literal to; infinite past the double range."""
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def js_number(value: Any) -> str:
+    """Format a number the way JavaScript's ``String(number)`` does.
+
+    Integers beyond ``Number.MAX_SAFE_INTEGER`` are doubles in JavaScript,
+    so they are rounded and formatted as one (``123456789012345680000``).
+
+    Args:
+        value: int or float
+
+    Returns:
+        Number text; non-finite values become ``null`` as in JSON.stringify
+    """
+    if isinstance(value, int):
+        if abs(value) <= _MAX_SAFE_INTEGER:
+            return str(value)
+        value = _js_double(value)
+    text = repr(value)
+    if "e" not in text and "n" not in text:
+        # Python and JavaScript agree on plain notation for 1e-4 <= |x| < 1e16
+        if value == 0:
+            return "0"
+        return text[:-2] if text.endswith(".0") else text
+    if math.isnan(value) or math.isinf(value):
+        return "null"
+
+    sign, digits, point = _float_parts(value)
+    count = len(digits)
+    if count <= point <= 21:
+        return sign + digits + "0" * (point - count)
+    if 0 < point <= 21:
+        return sign + digits[:point] + "." + digits[point:]
+    if -6 < point <= 0:
+        return sign + "0." + "0" * -point + digits
+
+    exponent = point - 1
+    exponent_text = ("+" if exponent >= 0 else "-") + str(abs(exponent))
+    if count == 1:
+        return sign + digits + "e" + exponent_text
+    return sign + digits[0] + "." + digits[1:] + "e" + exponent_text
+
+
+def _plain_number(value: Any) -> str:
+    """Format a number in plain decimal notation without an exponent."""
+    if isinstance(value, int):
+        if abs(value) <= _MAX_SAFE_INTEGER:
+            return str(value)
+        value = _js_double(value)
+    text = repr(value)
+    if "e" not in text and "n" not in text:
+        return "0" if value == 0 else (text[:-2] if text.endswith(".0") else text)
+    if math.isnan(value) or math.isinf(value):
+        return "null"
+
+    sign, digits, point = _float_parts(value)
+    count = len(digits)
+    if point >= count:
+        return sign + digits + "0" * (point - count)
+    if point > 0:
+        return sign + digits[:point] + "." + digits[point:]
+    return sign + "0." + "0" * -point + digits
+
+
+def _is_primitive(value: Any) -> bool:
+    """Return True for JSON scalars (null, booleans, numbers, strings)."""
+    return value is None or isinstance(value, (bool, int, float, str))
+
+
+# ---------------------------------------------------------------------------
+# JSON
+# ---------------------------------------------------------------------------
+
+def _json_scalar(value: Any) -> str:
+    """Serialize a JSON scalar."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return encode_basestring(value)
+    return js_number(value)
+
+
+def iter_json(value: Any, indent: int = 2) -> Iterator[str]:
+    """Serialize a value as JSON, matching ``JSON.stringify(value, null, indent)``.
+
+    Args:
+        value: Parsed JSON value
+        indent: Spaces per level; 0 produces compact output
+
+    Yields:
+        JSON text fragments
+    """
+    if isinstance(value, (dict, list)):
+        yield from _iter_json_container(value, indent)
+    else:
+        yield _json_scalar(value)
+
+
+_END = object()
+
+# Object keys repeat heavily in real documents, so their encodings are memoized
+_json_key = lru_cache(maxsize=4096)(encode_basestring)
+
+
+def _json_flat(container: Any, indent: int, depth: int) -> Optional[str]:
+    """Serialize a container holding only scalars in one step, else None."""
+    values = container.values() if isinstance(container, dict) else container
+    for child in values:
+        if isinstance(child, (dict, list)):
+            return None
+
+    if indent:
+        separator = ",\n" + " " * (indent * depth)
+        opening = "\n" + " " * (indent * depth)
+        closing = "\n" + " " * (indent * (depth - 1))
+        colon = ": "
+    else:
+        separator, opening, closing, colon = ",", "", "", ":"
+
+    if isinstance(container, dict):
+        body = separator.join(_json_key(key) + colon + _json_scalar(child) for key, child in container.items())
+        return "{" + opening + body + closing + "}"
+    body = separator.join(_json_scalar(child) for child in container)
+    return "[" + opening + body + closing + "]"
+
+
+def _iter_json_container(root: Any, indent: int) -> Iterator[str]:
+    """Serialize a dict or list iteratively."""
+    # Explicit stack of (is_dict, items, depth, first) so deep documents don't recurse
+    pretty = indent > 0
+    colon = ": " if pretty else ":"
+    stack: List[Tuple[bool, Iterator[Any], int, bool]] = []
+
+    def open_container(container: Any, depth: int) -> str:
+        is_dict = isinstance(container, dict)
+        items = iter(container.items()) if is_dict else iter(container)
+        stack.append((is_dict, items, depth, True))
+        return "{" if is_dict else "["
+
+    if not root:
+        yield "{}" if isinstance(root, dict) else "[]"
+        return
+
+    yield open_container(root, 1)
+    while stack:
+        is_dict, items, depth, first = stack[-1]
+        item = next(items, _END)
+        if item is _END:
+            stack.pop()
+            if pretty:
+                yield "\n" + " " * (indent * (depth - 1))
+            yield "}" if is_dict else "]"
+            continue
+
+        stack[-1] = (is_dict, items, depth, False)
+        prefix = "" if first else ","
+        if pretty:
+            prefix += "\n" + " " * (indent * depth)
+        if is_dict:
+            key, child = item
+            prefix += _json_key(key) + colon
+        else:
+            child = item
+
+        if isinstance(child, (dict, list)) and child:
+            flat = _json_flat(child, indent, depth + 1)
+            yield prefix + (flat if flat is not None else open_container(child, depth + 1))
+        elif isinstance(child, dict):
+            yield prefix + "{}"
+        elif isinstance(child, list):
+            yield prefix + "[]"
+        else:
+            yield prefix + _json_scalar(child)
+
+
+def iter_json_compact(value: Any) -> Iterator[str]:
+    """Serialize a value as compact JSON, matching ``JSON.stringify(value)``."""
+    return iter_json(value, indent=0)
+
+
+# ---------------------------------------------------------------------------
+# YAML
+# ---------------------------------------------------------------------------
+
+_YAML_RESERVED = re.compile(
+    r"^(?:~|null|Null|NULL|true|True|TRUE|false|False|FALSE"
+    r"|[-+]?(?:\.inf|\.Inf|\.INF)|\.nan|\.NaN|\.NAN"
+    r"|[-+]?[0-9][0-9_]*(?:\.[0-9_]*)?(?:[eE][-+]?[0-9]+)?"
+    r"|[-+]?\.[0-9_]+(?:[eE][-+]?[0-9]+)?"
+    r"|[-+]?0b[0-1_]+|[-+]?0o?[0-7_]+|[-+]?0x[0-9a-fA-F_]+"
+    r"|[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}"
+    r"(?:(?:[Tt]|[ \t]+)[0-9]{1,2}:[0-9]{2}:[0-9]{2}(?:\.[0-9]*)?(?:[ \t]*(?:Z|[-+][0-9]{1,2}(?::[0-9]{2})?))?)?"
+    r"|<<)$"
+)
+_YAML_INDICATORS = frozenset("-?:,[]{}#&*!|>'\"%@`")
+_YAML_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+_YAML_PRINTABLE = re.compile(r"^[\x09\x0a\x0d\x20-\x7e\x85\xa0-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]*$")
+_YAML_ESCAPES = {
+    "\x00": "\\0", "\x07": "\\a", "\x08": "\\b", "\t": "\\t", "\n": "\\n",
+    "\x0b": "\\v", "\x0c": "\\f", "\r": "\\r", "\x1b": "\\e", "\"": "\\\"",
+    "\\": "\\\\", "\x85": "\\N", "\xa0": "\\_", "\u2028": "\\L", "\u2029": "\\P",
+}
+
+
+def _yaml_plain_safe(text: str) -> bool:
+    """Return True if a string can be written as a plain YAML scalar."""
+    if not text or text != text.strip() or _YAML_RESERVED.match(text):
+        return False
+    first = text[0]
+    if first in _YAML_INDICATORS:
+        return False
+    if ": " in text or " #" in text or text.endswith(":"):
+        return False
+    return not _YAML_CONTROL.search(text)
+
+
+def _yaml_double_quoted(text: str) -> str:
+    """Write a string as a double-quoted YAML scalar with escapes."""
+    parts = []
+    for ch in text:
+        escaped = _YAML_ESCAPES.get(ch)
+        if escaped is not None:
+            parts.append(escaped)
+        elif ch < " " or ch == "\x7f":
+            parts.append("\\x%02X" % ord(ch))
+        else:
+            parts.append(ch)
+    return '"' + "".join(parts) + '"'
+
+
+def _yaml_block_literal(text: str, indent: str) -> str:
+    """Write a multi-line string as a literal block scalar."""
+    if not text.endswith("\n"):
+        chomp = "-"
+    elif text.endswith("\n\n"):
+        chomp = "+"
+    else:
+        chomp = ""
+    indicator = "2" if text.startswith(" ") else ""
+    body = text[:-1] if text.endswith("\n") else text
+    block_indent = indent + "  "
+    lines = "\n".join(block_indent + line if line else "" for line in body.split("\n"))
+    return "|" + indicator + chomp + "\n" + lines
+
+
+def _yaml_string(text: str, indent: str) -> str:
+    """Choose a YAML scalar style for a string, as js-yaml does."""
+    if _yaml_plain_safe(text):
+        return text
+    if "\r" in text or not _YAML_PRINTABLE.match(text):
+        return _yaml_double_quoted(text)
+    if "\n" in text:
+        return _yaml_block_literal(text, indent)
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _yaml_scalar(value: Any, indent: str) -> str:
+    """Serialize a YAML scalar."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return _yaml_string(value, indent)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ".nan"
+        if math.isinf(value):
+            return ".inf" if value > 0 else "-.inf"
+    return js_number(value)
+
+
+@lru_cache(maxsize=4096)
+def _yaml_key(key: str) -> str:
+    """Serialize a mapping key."""
+    return _yaml_string(key, "") if "\n" not in key else _yaml_double_quoted(key)
+
+
+def iter_yaml(value: Any) -> Iterator[str]:
+    """Serialize a value as block-style YAML, matching js-yaml's ``dump``.
+
+    Args:
+        value: Parsed JSON value
+
+    Yields:
+        YAML text fragments (lines including their trailing newline)
+    """
+    if isinstance(value, dict) and value:
+        yield from _iter_yaml_mapping(value, 0, first_prefix="")
+    elif isinstance(value, list) and value:
+        yield from _iter_yaml_sequence(value, 0, first_prefix="")
+    elif isinstance(value, dict):
+        yield "{}\n"
+    elif isinstance(value, list):
+        yield "[]\n"
+    else:
+        yield _yaml_scalar(value, "") + "\n"
+
+
+def _iter_yaml_mapping(mapping: Dict[str, Any], depth: int, first_prefix: str) -> Iterator[str]:
+    """Serialize a non-empty mapping; the first line gets ``first_prefix``."""
+    indent = "  " * depth
+    first = True
+    for key, child in mapping.items():
+        line_start = first_prefix if first else indent
+        first = False
+        key_text = _yaml_key(key)
+        if isinstance(child, dict) and child:
+            yield line_start + key_text + ":\n"
+            yield from _iter_yaml_mapping(child, depth + 1, first_prefix="  " * (depth + 1))
+        elif isinstance(child, list) and child:
+            yield line_start + key_text + ":\n"
+            yield from _iter_yaml_sequence(child, depth + 1, first_prefix="  " * (depth + 1))
+        elif isinstance(child, dict):
+            yield line_start + key_text + ": {}\n"
+        elif isinstance(child, list):
+            yield line_start + key_text + ": []\n"
+        else:
+            yield line_start + key_text + ": " + _yaml_scalar(child, indent) + "\n"
+
+
+def _iter_yaml_sequence(sequence: List[Any], depth: int, first_prefix: str) -> Iterator[str]:
+    """Serialize a non-empty sequence; the first line gets ``first_prefix``."""
+    indent = "  " * depth
+    first = True
+    for child in sequence:
+        line_start = (first_prefix if first else indent) + "- "
+        first = False
+        if isinstance(child, dict) and child:
+            yield from _iter_yaml_mapping(child, depth + 1, first_prefix=line_start)
+        elif isinstance(child, list) and child:
+            yield from _iter_yaml_sequence(child, depth + 1, first_prefix=line_start)
+        elif isinstance(child, dict):
+            yield line_start + "{}\n"
+        elif isinstance(child, list):
+            yield line_start + "[]\n"
+        else:
+            yield line_start + _yaml_scalar(child, indent) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# TOON
+# ---------------------------------------------------------------------------
+
+_TOON_KEY = re.compile(r"^[A-Za-z_][\w.]*$")
+_TOON_NUMERIC = re.compile(r"^-?\d+(?:\.\d+)?(?:e[+-]?\d+)?$", re.IGNORECASE)
+_TOON_LEADING_ZERO = re.compile(r"^0\d+$")
+_TOON_UNSAFE = re.compile(r"[:\"\\\[\]{}\n\r\t,]|[\x00-\x1f]")
+_TOON_ESCAPES = {"\\": "\\\\", "\"": "\\\"", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _toon_string(text: str) -> str:
+    """Quote a string value if TOON requires it."""
+    if (
+        text
+        and text == text.strip()
+        and text not in ("true", "false", "null")
+        and not _TOON_NUMERIC.match(text)
+        and not _TOON_LEADING_ZERO.match(text)
+        and not _TOON_UNSAFE.search(text)
+        and not text.startswith("-")
+    ):
+        return text
+    return '"' + "".join(_TOON_ESCAPES.get(ch, ch) for ch in text) + '"'
+
+
+@lru_cache(maxsize=4096)
+def _toon_key(key: str) -> str:
+    """Quote an object key if TOON requires it."""
+    if _TOON_KEY.match(key):
+        return key
+    return '"' + "".join(_TOON_ESCAPES.get(ch, ch) for ch in key) + '"'
+
+
+def _toon_primitive(value: Any) -> str:
+    """Serialize a TOON primitive."""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return _toon_string(value)
+    return _plain_number(value)
+
+
+def _toon_tabular_fields(items: List[Any]) -> List[str]:
+    """Return the shared field list if the array can use tabular form."""
+    first = items[0]
+    if not isinstance(first, dict) or not first:
+        return []
+    fields = list(first)
+    field_set = set(fields)
+    for item in items:
+        if not isinstance(item, dict) or len(item) != len(fields) or set(item) != field_set:
+            return []
+        if not all(_is_primitive(child) for child in item.values()):
+            return []
+    return fields
+
+
+def is_toon_tabular(items: List[Any]) -> bool:
+    """Return True if TOON writes the array in tabular form (one row per object)."""
+    return bool(items) and bool(_toon_tabular_fields(items))
+
+
+def _iter_toon_array(prefix: str, items: List[Any], depth: int) -> Iterator[str]:
+    """Serialize an array whose header starts with ``prefix`` (key or list marker)."""
+    indent = "  " * depth
+    length = len(items)
+    if not items:
+        yield prefix + "[0]:"
+        return
+
+    if all(_is_primitive(item) for item in items):
+        yield prefix + f"[{length}]: " + ",".join(_toon_primitive(item) for item in items)
+        return
+
+    fields = _toon_tabular_fields(items)
+    if fields:
+        yield prefix + f"[{length}]{{" + ",".join(_toon_key(field) for field in fields) + "}:"
+        row_indent = indent + "  "
+        for item in items:
+            yield row_indent + ",".join(_toon_primitive(item[field]) for field in fields)
+        return
+
+    yield prefix + f"[{length}]:"
+    for item in items:
+        yield from _iter_toon_list_item(item, depth + 1)
+
+
+def _iter_toon_list_item(item: Any, depth: int) -> Iterator[str]:
+    """Serialize one ``- `` entry of an expanded array."""
+    indent = "  " * depth
+    if _is_primitive(item):
+        yield indent + "- " + _toon_primitive(item)
+    elif isinstance(item, list):
+        yield from _iter_toon_array(indent + "- ", item, depth)
+    elif not item:
+        yield indent + "-"
+    else:
+        entries = iter(item.items())
+        key, child = next(entries)
+        # Fields sit one level below the hyphen, so their content goes two below
+        yield from _iter_toon_field(indent + "- ", key, child, depth + 2)
+        for key, child in entries:
+            yield from _iter_toon_field(indent + "  ", key, child, depth + 2)
+
+
+def _iter_toon_field(line_start: str, key: str, child: Any, depth: int) -> Iterator[str]:
+    """Serialize one object field; nested content is indented below ``depth``."""
+    key_text = _toon_key(key)
+    if _is_primitive(child):
+        yield line_start + key_text + ": " + _toon_primitive(child)
+    elif isinstance(child, list):
+        yield from _iter_toon_array(line_start + key_text, child, depth - 1)
+    else:
+        yield line_start + key_text + ":"
+        yield from _iter_toon_object(child, depth)
+
+
+def _iter_toon_object(obj: Dict[str, Any], depth: int) -> Iterator[str]:
+    """Serialize the fields of an object at ``depth``."""
+    indent = "  " * depth
+    for key, child in obj.items():
+        yield from _iter_toon_field(indent, key, child, depth + 1)
+
+
+def iter_toon(value: Any) -> Iterator[str]:
+    """Serialize a value as TOON, matching ``@toon-format/toon`` ``encode``.
+
+    Args:
+        value: Parsed JSON value
+
+    Yields:
+        TOON text fragments, separated by newlines
+    """
+    if _is_primitive(value):
+        lines = iter([_toon_primitive(value)])
+    elif isinstance(value, list):
+        lines = _iter_toon_array("", value, 0)
+    else:
+        lines = _iter_toon_object(value, 0)
+
+    first = True
+    for line in lines:
+        yield line if first else "\n" + line
+        first = False
+
+
+# ---------------------------------------------------------------------------
+# XML
+# ---------------------------------------------------------------------------
+
+_XML_INVALID_NAME_CHARS = re.compile(r"[^\w.\-:]")
+_XML_INDENT = "    "
+
+
+def _xml_text(text: str) -> str:
+    """Escape character data."""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+@lru_cache(maxsize=4096)
+def _xml_name(name: str) -> str:
+    """Make a key usable as an element name."""
+    name = _XML_INVALID_NAME_CHARS.sub("_", name) or "_"
+    if not (name[0].isalpha() or name[0] == "_"):
+        name = "_" + name
+    return name
+
+
+def _xml_scalar(value: Any) -> str:
+    """Serialize a scalar as element text."""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return _xml_text(value)
+    return js_number(value)
+
+
+def _iter_xml_element(name: str, value: Any, depth: int) -> Iterator[str]:
+    """Serialize ``value`` as one or more ``name`` elements."""
+    indent = _XML_INDENT * depth
+    if isinstance(value, list):
+        for item in value:
+            yield from _iter_xml_element(name, item, depth)
+        return
+
+    tag = _xml_name(name)
+    if value is None or (isinstance(value, dict) and not value):
+        yield "\n" + indent + f"<{tag}/>"
+    elif isinstance(value, dict):
+        yield "\n" + indent + f"<{tag}>"
+        for key, child in value.items():
+            yield from _iter_xml_element(key, child, depth + 1)
+        yield "\n" + indent + f"</{tag}>"
+    else:
+        yield "\n" + indent + f"<{tag}>" + _xml_scalar(value) + f"</{tag}>"
+
+
+def iter_xml(value: Any, root: str = "root") -> Iterator[str]:
+    """Serialize a value as XML, matching ``js2xmlparser.parse(root, value)``.
+
+    Arrays become repeated elements named after their key. No XML
+    declaration is emitted.
+
+    Args:
+        value: Parsed JSON value
+        root: Name of the root element
+
+    Yields:
+        XML text fragments
+    """
+    if isinstance(value, dict) and value:
+        yield f"<{root}>"
+        for key, child in value.items():
+            yield from _iter_xml_element(key, child, 1)
+        yield f"\n</{root}>"
+    elif isinstance(value, list) and value:
+        yield f"<{root}>"
+        for item in value:
+            yield from _iter_xml_element(root, item, 1)
+        yield f"\n</{root}>"
+    elif value is None or isinstance(value, (dict, list)):
+        yield f"<{root}/>"
+    else:
+        yield f"<{root}>" + _xml_scalar(value) + f"</{root}>"
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+SERIALIZERS: Dict[str, Callable[[Any], Iterator[str]]] = {
+    "json": iter_json,
+    "jsonCompact": iter_json_compact,
+    "yaml": iter_yaml,
+    "toon": iter_toon,
+    "xml": iter_xml,
+}
+
+
+def convert(value: Any, format_name: str) -> str:
+    """Serialize a parsed JSON value into one format.
+
+    Args:
+        value: Parsed JSON value
+        format_name: One of ``FORMAT_NAMES``
+
+    Returns:
+        Serialized text
+    """
+    return "".join(SERIALIZERS[format_name](value))
+
+
+def convert_all(value: Any) -> Dict[str, str]:
+    """Serialize a parsed JSON value into every format.
+
+    Args:
+        value: Parsed JSON value
+
+    Returns:
+        Dictionary mapping format names to serialized text
+    """
+    return {format_name: convert(value, format_name) for format_name in FORMAT_NAMES}
@@ -0,0 +1,317 @@
+"""
+Calibrated token count estimation.
+
+Estimates come from per-(vendor, model, format) linear models of tokens per
+byte over cheap text features: character classes and structural
+punctuation, each as a fraction of the UTF-8 size. Models are fitted
+online with recursive least squares from every exact count the services
+obtain upstream, track their own relative error, and can be persisted to a
+JSON file so calibration survives restarts.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from app.services.conversion import FORMAT_NAMES
+
+logger = logging.getLogger(__name__)
+
+_DIGITS = "0123456789"
+_STRUCTURAL = "{}[]:,<>/=-|"
+
+# Prior before any observation: about four bytes per token
+_PRIOR_WEIGHTS = (0.25, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+_PRIOR_VARIANCE = 10.0
+# Tokenizers don't drift, so old samples are never forgotten (this also avoids covariance windup)
+_FORGETTING = 1.0
+
+# Relative error reported until a model has seen enough samples
+_COLD_RELATIVE_ERROR = 0.5
+_WARM_SAMPLES = 8
+# Multiplier of the root-mean-square relative error (about a 95% bound)
+_BOUND_SIGMAS = 2.0
+
+# Key used for the pooled model of a vendor and model across all formats
+POOLED_FORMAT = "*"
+DEFAULT_FORMAT = "text"
+
+_STATE_VERSION = 1
+
+
+def _format_key(format_name: Optional[str]) -> str:
+    """Model key of a format; unknown names (e.g. chunk labels) share the default."""
+    return format_name if format_name in FORMAT_NAMES else DEFAULT_FORMAT
+
+
+def extract_features(text: str) -> Tuple[int, List[float]]:
+    """Compute the UTF-8 size and normalized features of a text.
+
+    Args:
+        text: Non-empty text
+
+    Returns:
+        Tuple of (size in bytes, feature vector of per-byte fractions)
+    """
+    size = len(text.encode("utf-8", "surrogatepass"))
+    scale = 1.0 / size
+    return size, [
+        1.0,
+        (size - len(text)) * scale,
+        text.count(" ") * scale,
+        text.count("\n") * scale,
+        sum(map(text.count, _DIGITS)) * scale,
+        sum(map(text.count, _STRUCTURAL)) * scale,
+        text.count('"') * scale,
+    ]
+
+
+class TokenEstimate:
+    """An estimated token count with its error bound."""
+
+    __slots__ = ("tokens", "error_bound", "samples")
+
+    def __init__(self, tokens: int, error_bound: int, samples: int):
+        """Create an estimate.
+
+        Args:
+            tokens: Estimated number of tokens
+            error_bound: Approximate 95% bound on the absolute error, in tokens
+            samples: Number of exact counts the model was fitted on
+        """
+        self.tokens = tokens
+        self.error_bound = error_bound
+        self.samples = samples
+
+
+class _Model:
+    """Recursive least squares fit of tokens per byte."""
+
+    __slots__ = ("weights", "covariance", "samples", "squared_error")
+
+    def __init__(self):
+        """Start from the prior."""
+        size = len(_PRIOR_WEIGHTS)
+        self.weights = list(_PRIOR_WEIGHTS)
+        self.covariance = [[_PRIOR_VARIANCE if i == j else 0.0 for j in range(size)] for i in range(size)]
+        self.samples = 0
+        self.squared_error = _COLD_RELATIVE_ERROR ** 2
+
+    def predict(self, features: List[float]) -> float:
+        """Predicted tokens per byte."""
+        return sum(w * x for w, x in zip(self.weights, features))
+
+    def relative_error(self) -> float:
+        """Root-mean-square relative error, pessimistic while cold."""
+        if self.samples < _WARM_SAMPLES:
+            return _COLD_RELATIVE_ERROR
+        return math.sqrt(self.squared_error)
+
+    def update(self, features: List[float], target: float) -> None:
+        """Fold one observation of tokens per byte into the fit."""
+        predicted = self.predict(features)
+        # Track the error of predictions made before seeing the sample
+        alpha = max(1.0 / (self.samples + 1), 0.02)
+        relative = (predicted - target) / target if target else 0.0
+        self.squared_error += alpha * (relative * relative - self.squared_error)
+        self.samples += 1
+
+        p = self.covariance
+        px = [sum(row[j] * features[j] for j in range(len(features))) for row in p]
+        denominator = _FORGETTING + sum(x * v for x, v in zip(features, px))
+        gain = [v / denominator for v in px]
+        error = target - predicted
+        self.weights = [w + g * error for w, g in zip(self.weights, gain)]
+        # P = (P - k (P x)^T) / lambda; P is symmetric so x^T P == (P x)^T
+        self.covariance = [
+            [(p[i][j] - gain[i] * px[j]) / _FORGETTING for j in range(len(px))]
+            for i in range(len(px))
+        ]
+
+    def to_dict(self) -> Dict:
+        """Serialize the model state."""
+        return {
+            "weights": self.weights,
+            "covariance": self.covariance,
+            "samples": self.samples,
+            "squared_error": self.squared_error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "_Model":
+        """Restore a serialized model state."""
+        model = cls()
+        if len(data["weights"]) != len(model.weights):
+            raise ValueError("Feature count mismatch")
+        model.weights = [float(w) for w in data["weights"]]
+        model.covariance = [[float(v) for v in row] for row in data["covariance"]]
+        model.samples = int(data["samples"])
+        model.squared_error = float(data["squared_error"])
+        return model
+
+
+class TokenEstimator:
+    """Per-(vendor, model, format) token count estimators with optional persistence."""
+
+    def __init__(self, path: Optional[str] = None, save_interval_seconds: float = 60.0, max_models: int = 4096):
+        """Create an estimator, loading saved calibration if available.
+
+        Args:
+            path: JSON file holding calibration state, or None to keep it in memory
+            save_interval_seconds: How often changed state is written to ``path``
+            max_models: Maximum number of fitted models; later keys use pooled
+                or prior models only
+        """
+        self.path = path
+        self.save_interval_seconds = save_interval_seconds
+        self.max_models = max_models
+        self._models: Dict[Tuple[str, str, str], _Model] = {}
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self.observations = 0
+        if path:
+            self._load()
+
+    def _load(self) -> None:
+        """Load saved calibration; unreadable state is logged and ignored."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            if data.get("version") != _STATE_VERSION:
+                return
+            for vendor, model, format_name, state in data["models"]:
+                self._models[(vendor, model, format_name)] = _Model.from_dict(state)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable estimator state %s: %s", self.path, e)
+            self._models.clear()
+
+    def _snapshot(self) -> str:
+        """Serialize all models."""
+        return json.dumps({
+            "version": _STATE_VERSION,
+            "models": [
+                [vendor, model, format_name, state.to_dict()]
+                for (vendor, model, format_name), state in self._models.items()
+            ],
+        })
+
+    @staticmethod
+    def _write(path: str, payload: str) -> None:
+        """Atomically replace the state file.
+
+        Every writer (uvicorn worker or overlapping save) uses its own
+        temporary file, so concurrent saves never interleave their contents.
+        """
+        handle = tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=os.path.dirname(path) or ".",
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            delete=False
+        )
+        try:
+            with handle:
+                handle.write(payload)
+            os.replace(handle.name, path)
+        except BaseException:
+            os.unlink(handle.name)
+            raise
+
+    def _model_for(self, vendor: str, model: str, format_name: str) -> Optional[_Model]:
+        """Best available model: format-specific once warm, else pooled."""
+        specific = self._models.get((vendor, model, format_name))
+        if specific is not None and specific.samples >= _WARM_SAMPLES:
+            return specific
+        pooled = self._models.get((vendor, model, POOLED_FORMAT))
+        if pooled is not None and (specific is None or pooled.samples > specific.samples):
+            return pooled
+        return specific
+
+    def estimate(self, vendor: str, model: str, text: str, format_name: Optional[str] = None) -> TokenEstimate:
+        """Estimate the token count of a text.
+
+        Args:
+            vendor: Vendor name
+            model: Model ID
+            text: Text to estimate
+            format_name: Format of the text (e.g. "yaml"), if known
+
+        Returns:
+            TokenEstimate with the count and error bound
+        """
+        if not text or not text.strip():
+            return TokenEstimate(tokens=0, error_bound=0, samples=0)
+
+        size, features = extract_features(text)
+        fitted = self._model_for(vendor, model, _format_key(format_name))
+        if fitted is None:
+            fitted = _Model()
+
+        tokens = max(1, round(fitted.predict(features) * size))
+        error_bound = max(1, math.ceil(_BOUND_SIGMAS * fitted.relative_error() * tokens))
+        return TokenEstimate(tokens=tokens, error_bound=error_bound, samples=fitted.samples)
+
+    def observe(self, vendor: str, model: str, text: str, token_count: int, format_name: Optional[str] = None) -> None:
+        """Fit the models of a vendor and model to one exact count.
+
+        Args:
+            vendor: Vendor name
+            model: Model ID
+            text: Text that was counted
+            token_count: Exact token count
+            format_name: Format of the text, if known
+        """
+        if not text or not text.strip() or token_count <= 0:
+            return
+
+        size, features = extract_features(text)
+        target = token_count / size
+        for key in ((vendor, model, _format_key(format_name)), (vendor, model, POOLED_FORMAT)):
+            fitted = self._models.get(key)
+            if fitted is None:
+                if len(self._models) >= self.max_models:
+                    continue
+                fitted = self._models[key] = _Model()
+            fitted.update(features, target)
+
+        self.observations += 1
+        self._dirty = True
+        if self.path and self._save_task is None:
+            try:
+                self._save_task = asyncio.get_running_loop().create_task(self._save_loop())
+            except RuntimeError:
+                # No running loop (e.g. synchronous callers); saved on close
+                pass
+
+    async def _save_loop(self) -> None:
+        """Periodically write changed calibration state."""
+        while True:
+            await asyncio.sleep(self.save_interval_seconds)
+            await self.save()
+
+    async def save(self) -> None:
+        """Write calibration state if it changed since the last save."""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        payload = self._snapshot()
+        try:
+            await asyncio.to_thread(self._write, self.path, payload)
+        except OSError as e:
+            self._dirty = True
+            logger.warning("Failed to save estimator state to %s: %s", self.path, e)
+
+    async def close(self) -> None:
+        """Stop periodic saving and write any pending state."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            await asyncio.gather(self._save_task, return_exceptions=True)
+            self._save_task = None
+        await self.save()
@@ -2,31 +2,78 @@
 Service for interacting with Google Gemini API.
 """
 
-from typing import List, Dict
+from typing import List, Optional, Union
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 from fastapi import HTTPException
 
 from app.models import ModelInfo
+from app.services.base import PoolOptions, VendorService
+from app.services.scheduler import parse_retry_after, rate_limited
 
 
-class GoogleService:
+class GoogleService(VendorService):
     """Service for Google Gemini API operations."""
 
-    def __init__(self, api_key: str):
+    vendor = "google"
+    supports_packing = True
+    warm_url = "https://generativelanguage.googleapis.com/"
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: float = 30.0,
+        pool: Optional[PoolOptions] = None,
+        base_url: Optional[str] = None,
+        **options
+    ):
         """Initialize Google GenAI client.
 
+        All calls go through the client's async surface (``client.aio``) so
+        upstream round trips never block the event loop.
+
         Args:
             api_key: Google API key
+            timeout: Per-request timeout in seconds for upstream calls
+            pool: Connection pool tuning of async requests (SDK defaults if omitted)
+            base_url: API base URL override (e.g. a proxy or simulator)
+            **options: Shared counting options passed to VendorService
+                (concurrency, cache, store, single-flight, scheduler, ...)
         """
+        super().__init__(**options)
+        if base_url:
+            self.warm_url = base_url
         try:
-            self.client = genai.Client(api_key=api_key)
+            if pool is not None:
+                self._http_client = httpx.AsyncClient(
+                    http2=pool.http2,
+                    limits=httpx.Limits(
+                        max_connections=pool.max_connections,
+                        max_keepalive_connections=pool.max_keepalive,
+                        keepalive_expiry=pool.keepalive_seconds
+                    ),
+                    timeout=httpx.Timeout(timeout, connect=pool.connect_timeout)
+                )
+            self.client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    timeout=int(timeout * 1000),
+                    base_url=base_url,
+                    httpx_async_client=self._http_client
+                )
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to initialize Google client: {str(e)}"
             )
 
+    async def close(self) -> None:
+        """Cancel background work and close the Google client."""
+        await super().close()
+        await self.client.aio.aclose()
+
     async def list_models(self) -> List[ModelInfo]:
         """List available Google models with generateContent capability.
 
@@ -37,10 +84,10 @@ class GoogleService:
             HTTPException: If API call fails
         """
         try:
-            response = self.client.models.list()
+            response = await self.client.aio.models.list()
 
             models = []
-            for model in response:
+            async for model in response:
                 # Check for supported actions/methods (try different attribute names)
                 supported = False
                 if hasattr(model, 'supported_generation_methods'):
@@ -80,12 +127,13 @@ class GoogleService:
                 detail=f"Failed to list Google models: {str(e)}"
             )
 
-    async def count_tokens(self, text: str, model: str) -> int:
-        """Count tokens in text using specified model.
+    async def _count(self, text: str, model: str, format_name: Optional[str] = None) -> int:
+        """Count tokens for a single non-empty text using specified model.
 
         Args:
             text: Text content to count tokens for
             model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
 
         Returns:
             Number of tokens
@@ -93,88 +141,79 @@ class GoogleService:
         Raises:
             HTTPException: If API call fails
         """
-        # Handle empty text
-        if not text or not text.strip():
-            return 0
+        return await self._count_contents(text, model, format_name)
 
-        try:
-            # Ensure model has 'models/' prefix if not present
-            if not model.startswith('models/'):
-                model = f'models/{model}'
+    async def _count_packed(self, texts: List[str], model: str) -> int:
+        """Count several texts as the parts of one user content.
 
-            response = self.client.models.count_tokens(
-                model=model,
-                contents=text
-            )
+        Args:
+            texts: Texts to count together
+            model: Model ID to use for counting
 
-            return response.total_tokens
+        Returns:
+            Number of tokens of the whole request
 
-        except Exception as e:
-            # Handle specific errors
-            error_message = str(e).lower()
-            if "model" in error_message or "not found" in error_message:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid model: {model}"
-                )
-            if "api key" in error_message or "authentication" in error_message:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Google API authentication error"
-                )
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to count tokens: {str(e)}"
-            )
+        Raises:
+            HTTPException: If API call fails
+        """
+        contents = types.Content(role="user", parts=[types.Part(text=text) for text in texts])
+        return await self._count_contents(contents, model)
 
-    async def count_tokens_batch(self, texts: Dict[str, str], model: str) -> Dict[str, int]:
-        """Count tokens for multiple texts using specified model.
+    async def _count_contents(
+        self,
+        contents: Union[str, types.Content],
+        model: str,
+        format_name: Optional[str] = None
+    ) -> int:
+        """Count the tokens of request contents.
 
         Args:
-            texts: Dictionary mapping format names to text content
+            contents: A text or a content of several parts
             model: Model ID to use for counting
+            format_name: Batch format name, used in error messages
 
         Returns:
-            Dictionary mapping format names to token counts
+            Number of tokens
 
         Raises:
             HTTPException: If API call fails
         """
-        results = {}
-
         # Ensure model has 'models/' prefix if not present
         if not model.startswith('models/'):
             model = f'models/{model}'
 
-        for format_name, text in texts.items():
-            # Handle empty text
-            if not text or not text.strip():
-                results[format_name] = 0
-                continue
+        try:
+            response = await self.client.aio.models.count_tokens(
+                model=model,
+                contents=contents
+            )
+
+            return response.total_tokens
 
-            try:
-                response = self.client.models.count_tokens(
-                    model=model,
-                    contents=text
+        except Exception as e:
+            if isinstance(e, errors.APIError) and e.code == 429:
+                raise rate_limited(
+                    "Google API rate limit exceeded",
+                    parse_retry_after(getattr(e.response, "headers", None))
+                )
+            # Handle specific errors
+            error_message = str(e).lower()
+            if "model" in error_message or "not found" in error_message:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid model: {model}"
+                )
+            if "api key" in error_message or "authentication" in error_message:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Google API authentication error"
                 )
-                results[format_name] = response.total_tokens
-
-            except Exception as e:
-                # Handle specific errors
-                error_message = str(e).lower()
-                if "model" in error_message or "not found" in error_message:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid model: {model}"
-                    )
-                if "api key" in error_message or "authentication" in error_message:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Google API authentication error"
-                    )
+            if format_name is not None:
                 raise HTTPException(
                     status_code=500,
                     detail=f"Failed to count tokens for format '{format_name}': {str(e)}"
                 )
-
-        return results
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to count tokens: {str(e)}"
+            )
@@ -0,0 +1,153 @@
+"""
+Hedged upstream requests.
+
+A call that has not answered by the rolling p95 latency of its model is
+duplicated, and whichever copy answers first wins; the other is cancelled.
+Hedges are limited to a fraction of calls by a budget that accrues with
+every call, so a slow vendor can't make hedging double the load.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Recompute a model's hedge delay after this many new samples
+_RECOMPUTE_EVERY = 16
+# Calls whose unused hedge allowance can be banked for a burst of slow calls
+_BUDGET_CALLS = 200
+
+
+class _LatencyWindow:
+    """Recent latencies of one model with a cached percentile."""
+
+    __slots__ = ("samples", "delay", "pending")
+
+    def __init__(self, size: int):
+        """Create an empty window holding up to ``size`` samples."""
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.delay: Optional[float] = None
+        self.pending = 0
+
+
+class Hedger:
+    """Per-model latency tracking and hedged execution of upstream calls."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_fraction: float = 0.05,
+        min_samples: int = 20,
+        window: int = 256
+    ):
+        """Configure hedging.
+
+        Args:
+            percentile: Latency percentile after which a call is hedged
+            max_fraction: Maximum fraction of calls that may be hedged
+            min_samples: Samples a model needs before its calls are hedged
+            window: Number of recent latencies kept per model
+        """
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.window = window
+        self._windows: Dict[str, _LatencyWindow] = {}
+        # Each call adds max_fraction of a hedge; a hedge spends a whole one
+        self._budget = 1.0
+        self._max_budget = max(1.0, _BUDGET_CALLS * max_fraction)
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _window(self, key: str) -> _LatencyWindow:
+        """Latency window of a model, created on first use."""
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _LatencyWindow(self.window)
+        return window
+
+    def _record(self, window: _LatencyWindow, seconds: float) -> None:
+        """Add a latency sample and refresh the hedge delay periodically."""
+        window.samples.append(seconds)
+        window.pending += 1
+        if len(window.samples) >= self.min_samples and (window.delay is None or window.pending >= _RECOMPUTE_EVERY):
+            ordered = sorted(window.samples)
+            rank = max(1, math.ceil(self.percentile / 100 * len(ordered)))
+            window.delay = ordered[rank - 1]
+            window.pending = 0
+
+    def delay(self, key: str) -> Optional[float]:
+        """Current hedge delay of a model in seconds, or None while it has too few samples."""
+        window = self._windows.get(key)
+        return window.delay if window is not None else None
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a call, hedging it if it is slower than the model's percentile.
+
+        Args:
+            key: Latency class of the call (e.g. the model ID)
+            fn: Zero-argument coroutine function performing the call; it is
+                invoked a second time for the hedge
+
+        Returns:
+            Result of the first copy to succeed
+
+        Raises:
+            Exception: The primary call's error if no copy succeeded
+        """
+        window = self._window(key)
+        self.calls += 1
+        self._budget = min(self._max_budget, self._budget + self.max_fraction)
+
+        start = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        tasks = [primary]
+        try:
+            if window.delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=window.delay)
+                if not done and self._budget >= 1.0:
+                    self._budget -= 1.0
+                    self.hedged += 1
+                    tasks.append(asyncio.ensure_future(fn()))
+
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the primary when both finish together
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    # Every copy failed; surface the primary's error
+                    return primary.result()
+        finally:
+            # Sample the primary's latency from the start of the call, as a
+            # lower bound if a hedge beat it or the call was cancelled, so
+            # slow calls keep the percentile up; failed calls are not samples
+            if not primary.done() or (not primary.cancelled() and primary.exception() is None):
+                self._record(window, time.monotonic() - start)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report hedge rate, hedge win rate and current per-model delays."""
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "max_fraction": self.max_fraction,
+            "delays_ms": {
+                key: round(window.delay * 1000, 3)
+                for key, window in self._windows.items()
+                if window.delay is not None
+            },
+        }
@@ -0,0 +1,368 @@
+"""
+Asynchronous token counting jobs.
+
+Large batches are submitted as jobs instead of being counted within one
+HTTP request. ``JobManager`` queues submitted jobs and a fixed pool of
+workers counts them through the regular vendor services at bulk upstream
+priority, so interactive requests keep precedence at the vendor
+scheduler. Each job records per-text results as they complete; clients
+poll the job, stream its results, or cancel it. Finished jobs are kept
+for a retention period and then forgotten.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.models import BulkCountError, JobResponse, JobTextResult
+from app.services.base import VendorService
+from app.services.scheduler import BULK, upstream_priority
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    """One submitted batch and its progress."""
+
+    def __init__(self, vendor: str, model: str, mode: str, texts: Dict[str, str]):
+        """Create a queued job.
+
+        Args:
+            vendor: Vendor to count with
+            model: Model ID to count with
+            mode: "exact" or "chunked"
+            texts: Dictionary mapping names to text content
+        """
+        self.id = uuid.uuid4().hex
+        self.vendor = vendor
+        self.model = model
+        self.mode = mode
+        self.texts: Optional[Dict[str, str]] = texts
+        self.total = len(texts)
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Results in completion order, so streams can resume from an offset
+        self.results: List[JobTextResult] = []
+        self.failed = 0
+        self.task: Optional[asyncio.Task] = None
+        # Set and replaced on every update
+        self.changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has reached a final status."""
+        return self.status in FINISHED
+
+    def notify(self) -> None:
+        """Wake everything waiting for progress on this job."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def record(self, result: JobTextResult) -> None:
+        """Record the outcome of one text."""
+        self.results.append(result)
+        if result.error is not None:
+            self.failed += 1
+        self.notify()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        """Move the job to a final status and release its input."""
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self.texts = None
+        self.task = None
+        self.notify()
+
+    def to_response(self, queue_position: Optional[int] = None, include_results: bool = False) -> JobResponse:
+        """Describe the job.
+
+        Args:
+            queue_position: Jobs queued ahead of this one, if it is queued
+            include_results: Whether to include the counts and errors so far
+
+        Returns:
+            JobResponse with status, progress and optionally results
+        """
+        end = self.finished_at or time.time()
+        response = JobResponse(
+            id=self.id,
+            vendor=self.vendor,
+            model=self.model,
+            mode=self.mode,
+            status=self.status,
+            total=self.total,
+            completed=len(self.results),
+            failed=self.failed,
+            queue_position=queue_position,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            elapsed_ms=round((end - (self.started_at or end)) * 1000, 3),
+            error=self.error
+        )
+        if include_results:
+            response.token_counts = {
+                result.name: result.token_count for result in self.results if result.error is None
+            }
+            response.errors = {
+                result.name: result.error for result in self.results if result.error is not None
+            }
+        return response
+
+
+class JobManager:
+    """Bounded queue and worker pool for token counting jobs."""
+
+    def __init__(
+        self,
+        vendor: Callable[[str], VendorService],
+        workers: int = 4,
+        max_queued: int = 1000,
+        concurrency: int = 16,
+        retention_seconds: float = 3600.0,
+        max_retained: int = 1000
+    ):
+        """Configure the job manager.
+
+        Args:
+            vendor: Resolves a vendor name to its service
+            workers: Number of jobs counted at once
+            max_queued: Maximum number of jobs waiting for a worker
+            concurrency: Maximum number of texts of one job counted at once
+            retention_seconds: How long finished jobs stay available
+            max_retained: Maximum number of finished jobs kept
+        """
+        self._vendor = vendor
+        self.workers = workers
+        self.max_queued = max_queued
+        self.concurrency = concurrency
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue()
+        self._queued = 0
+        self._running = 0
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the worker pool."""
+        for index in range(self.workers):
+            self._workers.append(asyncio.create_task(self._work(), name=f"job-worker-{index}"))
+
+    async def close(self) -> None:
+        """Stop the workers, cancelling running jobs."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None] + self._workers
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+
+    def submit(self, vendor: str, model: str, texts: Dict[str, str], mode: str = "exact") -> Job:
+        """Queue a job.
+
+        Args:
+            vendor: Vendor name ("anthropic", "google" or "openai")
+            model: Model ID to count with
+            texts: Dictionary mapping names to text content
+            mode: "exact" or "chunked"
+
+        Returns:
+            The queued job
+
+        Raises:
+            HTTPException: If the vendor is invalid or the queue is full
+        """
+        self._vendor(vendor)
+        if self._queued >= self.max_queued:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Job queue is full ({self.max_queued} jobs waiting); retry later",
+                headers={"Retry-After": "5"}
+            )
+
+        self._prune()
+        job = Job(vendor, model, mode, texts)
+        self._jobs[job.id] = job
+        self._queued += 1
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """Look up a job.
+
+        Args:
+            job_id: Job ID returned on submission
+
+        Returns:
+            The job
+
+        Raises:
+            HTTPException: If no such job exists (or it has expired)
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued or running job; finished jobs are left unchanged.
+
+        Args:
+            job_id: Job ID returned on submission
+
+        Returns:
+            The job
+
+        Raises:
+            HTTPException: If no such job exists
+        """
+        job = self.get(job_id)
+        if job.status == QUEUED:
+            # The worker that dequeues it skips it
+            self._queued -= 1
+            job.finish(CANCELLED)
+        elif job.status == RUNNING and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def queue_position(self, job: Job) -> Optional[int]:
+        """Number of queued jobs ahead of a queued job, or None if it is not queued."""
+        if job.status != QUEUED:
+            return None
+        position = 0
+        for other in self._jobs.values():
+            if other is job:
+                return position
+            if other.status == QUEUED:
+                position += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, running jobs and retained jobs by status."""
+        self._prune()
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queued,
+            "running": self._running,
+            "max_queued": self.max_queued,
+            "retained": len(self._jobs),
+            "by_status": by_status,
+        }
+
+    async def stream(self, job: Job) -> AsyncIterator[str]:
+        """Stream a job's results as NDJSON until it finishes.
+
+        Results already available are sent first, then each new result as it
+        completes; the final line is ``{"job": ...}`` with the final status.
+
+        Args:
+            job: Job to follow
+
+        Yields:
+            NDJSON lines (each ending in a newline)
+        """
+        sent = 0
+        while True:
+            # Take the event before sending, so updates made while a line is sent are not missed
+            changed = job.changed
+            while sent < len(job.results):
+                yield job.results[sent].model_dump_json(exclude_none=True) + "\n"
+                sent += 1
+            if job.finished:
+                yield '{"job": ' + job.to_response().model_dump_json() + "}\n"
+                return
+            await changed.wait()
+
+    def _prune(self) -> None:
+        """Forget finished jobs past their retention or beyond the retained limit."""
+        cutoff = time.time() - self.retention_seconds
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_retained
+        for index, job in enumerate(finished):
+            if index < excess or job.finished_at < cutoff:
+                del self._jobs[job.id]
+
+    async def _work(self) -> None:
+        """Worker loop: count queued jobs one at a time."""
+        # Inherited by every count this worker starts
+        upstream_priority.set(BULK)
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+
+            self._queued -= 1
+            self._running += 1
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.notify()
+            job.task = asyncio.create_task(self._run(job))
+            try:
+                # Wait without propagating the job's own cancellation into the worker
+                await asyncio.wait({job.task})
+                if job.task.cancelled():
+                    job.finish(CANCELLED)
+                elif job.task.exception() is not None:
+                    error = job.task.exception()
+                    logger.error("Job %s failed: %s", job.id, error)
+                    job.finish(FAILED, f"Unexpected error: {error}")
+                else:
+                    job.finish(COMPLETED)
+            finally:
+                self._running -= 1
+
+    async def _run(self, job: Job) -> None:
+        """Count every text of a job with at most ``concurrency`` in flight."""
+        service = self._vendor(job.vendor)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def count_one(name: str, text: str) -> None:
+            try:
+                if job.mode == "chunked":
+                    count = (await service.count_tokens_chunked(text=text, model=job.model)).total
+                else:
+                    count = await service.count_tokens(text=text, model=job.model)
+            except HTTPException as e:
+                job.record(JobTextResult(name=name, error=BulkCountError(status_code=e.status_code, detail=str(e.detail))))
+            except Exception as e:
+                job.record(JobTextResult(
+                    name=name,
+                    error=BulkCountError(status_code=500, detail=f"Unexpected error counting tokens: {str(e)}")
+                ))
+            else:
+                job.record(JobTextResult(name=name, token_count=count))
+            finally:
+                semaphore.release()
+
+        pending = set()
+        try:
+            for name, text in job.texts.items():
+                await semaphore.acquire()
+                task = asyncio.create_task(count_one(name, text))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
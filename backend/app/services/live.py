@@ -0,0 +1,253 @@
+"""
+Live token counting for interactive editors.
+
+A ``LiveSession`` serves one WebSocket connection. The client sends full
+document revisions; the session counts every format for every target and
+pushes each count back as soon as it is known. Work is kept proportional to
+what actually changed:
+
+- Revisions are debounced: counting starts once no newer revision has
+  arrived for the debounce period (or the maximum delay has passed).
+- A newer revision supersedes the one being counted. Upstream calls for
+  texts the newer revision changed are cancelled at once; calls for texts
+  it kept are left running and their results reused.
+- A format whose text is unchanged since its last count is not counted
+  again; its previous count is pushed back as unchanged.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app import metrics
+from app.models import BulkCountError, CompareTarget, LiveCount, LiveRevision, LiveRevisionDone
+from app.services.base import VendorService
+from app.services.single_flight import cancel_abandoned
+
+# (vendor, model, format)
+SlotKey = Tuple[str, str, str]
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    """Mark a task's exception as retrieved so abandoned tasks don't log it."""
+    if not task.cancelled():
+        task.exception()
+
+
+class _Slot:
+    """Last count and in-flight count of one format for one target."""
+
+    __slots__ = ("text", "count", "task", "task_text")
+
+    def __init__(self):
+        """Start with nothing counted."""
+        self.text: Optional[str] = None
+        self.count: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.task_text: Optional[str] = None
+
+
+class LiveSession:
+    """Debounced, superseding token counting for one live connection."""
+
+    def __init__(
+        self,
+        vendor: Callable[[str], VendorService],
+        send: Callable[[str], Awaitable[None]],
+        debounce_seconds: float = 0.15,
+        max_delay_seconds: float = 1.0,
+        max_targets: int = 4,
+        max_formats: int = 16
+    ):
+        """Create a session.
+
+        Args:
+            vendor: Resolves a vendor name to its service
+            send: Sends one JSON message to the client
+            debounce_seconds: Quiet period after the latest revision before counting starts
+            max_delay_seconds: Longest a revision waits for the quiet period
+            max_targets: Maximum number of targets per revision
+            max_formats: Maximum number of formats per revision
+        """
+        self._vendor = vendor
+        self._send = send
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_targets = max_targets
+        self.max_formats = max_formats
+        self._slots: Dict[SlotKey, _Slot] = {}
+        self._targets: List[CompareTarget] = []
+        self._latest: Optional[int] = None
+        self._pending: Optional[LiveRevision] = None
+        self._arrived = asyncio.Event()
+        self._revision_task: Optional[asyncio.Task] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start counting submitted revisions.
+
+        Counts of the session may cancel their shared upstream calls once
+        superseded, unless another request still waits on them.
+        """
+        token = cancel_abandoned.set(True)
+        try:
+            self._runner = asyncio.create_task(self._run())
+        finally:
+            cancel_abandoned.reset(token)
+
+    async def close(self) -> None:
+        """Stop counting and cancel all upstream calls of the session."""
+        tasks = [task for task in (self._runner, self._revision_task) if task is not None]
+        tasks += [slot.task for slot in self._slots.values() if slot.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, revision: LiveRevision) -> None:
+        """Accept a revision, superseding any revision not yet fully counted.
+
+        Args:
+            revision: The client's latest revision
+
+        Raises:
+            ValueError: If the revision is out of order, has no targets,
+                targets a vendor that is not enabled, or exceeds the limits
+        """
+        if self._latest is not None and revision.revision <= self._latest:
+            raise ValueError(f"Revision {revision.revision} is not newer than revision {self._latest}")
+        targets = revision.targets if revision.targets is not None else self._targets
+        if not targets:
+            raise ValueError("The first revision must include targets")
+        if len(targets) > self.max_targets:
+            raise ValueError(f"At most {self.max_targets} targets are allowed")
+        if len(revision.texts) > self.max_formats:
+            raise ValueError(f"At most {self.max_formats} formats are allowed")
+        for target in targets:
+            try:
+                self._vendor(target.vendor)
+            except HTTPException as e:
+                # Rejected here, since a failure in the revision task would reach no one
+                raise ValueError(str(e.detail))
+
+        self._latest = revision.revision
+        self._targets = targets
+        if self._pending is not None:
+            metrics.LIVE_REVISIONS.labels("superseded").inc()
+        if self._revision_task is not None and not self._revision_task.done():
+            self._revision_task.cancel()
+            metrics.LIVE_REVISIONS.labels("superseded").inc()
+        self._pending = revision
+        self._cancel_changed(revision, targets)
+        self._arrived.set()
+
+    def _cancel_changed(self, revision: LiveRevision, targets: List[CompareTarget]) -> None:
+        """Cancel in-flight counts whose text the new revision changed or dropped."""
+        wanted: Dict[SlotKey, str] = {
+            (target.vendor, target.model, format_name): text
+            for target in targets
+            for format_name, text in revision.texts.items()
+        }
+        for key in list(self._slots):
+            slot = self._slots[key]
+            if slot.task is not None and not slot.task.done() and wanted.get(key) != slot.task_text:
+                slot.task.cancel()
+                slot.task = None
+                metrics.LIVE_COUNTS.labels("cancelled").inc()
+            if key not in wanted and slot.task is None:
+                del self._slots[key]
+
+    async def _run(self) -> None:
+        """Debounce submitted revisions and count the latest one."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            deadline = loop.time() + self.max_delay_seconds
+            # Trailing-edge debounce, bounded so continuous typing still gets counts
+            while True:
+                self._arrived.clear()
+                timeout = min(self.debounce_seconds, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            revision, self._pending = self._pending, None
+            if revision is None:
+                continue
+            self._revision_task = asyncio.create_task(self._count_revision(revision, self._targets))
+            self._revision_task.add_done_callback(_retrieve)
+
+    async def _count_revision(self, revision: LiveRevision, targets: List[CompareTarget]) -> None:
+        """Count one revision, pushing each count and then a done message."""
+        start = time.perf_counter()
+        waits = []
+        unchanged: List[Tuple[CompareTarget, str, int]] = []
+        counted = 0
+
+        for target in targets:
+            service = self._vendor(target.vendor)
+            for format_name, text in revision.texts.items():
+                key = (target.vendor, target.model, format_name)
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._slots[key] = _Slot()
+                if slot.count is not None and slot.text == text:
+                    unchanged.append((target, format_name, slot.count))
+                    continue
+                if slot.task is None or slot.task.done() or slot.task_text != text:
+                    slot.task = asyncio.create_task(self._count(slot, service, target.model, text))
+                    slot.task.add_done_callback(_retrieve)
+                    slot.task_text = text
+                    counted += 1
+                waits.append(self._settle(revision.revision, target, format_name, slot.task))
+
+        metrics.LIVE_COUNTS.labels("counted").inc(counted)
+        metrics.LIVE_COUNTS.labels("unchanged").inc(len(unchanged))
+        for target, format_name, count in unchanged:
+            await self._emit(LiveCount(
+                revision=revision.revision,
+                vendor=target.vendor,
+                model=target.model,
+                format=format_name,
+                token_count=count,
+                changed=False
+            ))
+        await asyncio.gather(*waits)
+
+        metrics.LIVE_REVISIONS.labels("counted").inc()
+        await self._emit(LiveRevisionDone(
+            revision=revision.revision,
+            counted=counted,
+            unchanged=len(unchanged),
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 3)
+        ))
+
+    @staticmethod
+    async def _count(slot: _Slot, service: VendorService, model: str, text: str) -> int:
+        """Count one text and remember it as the slot's latest count."""
+        count = await service.count_tokens(text=text, model=model)
+        slot.text = text
+        slot.count = count
+        return count
+
+    async def _settle(self, revision: int, target: CompareTarget, format_name: str, task: asyncio.Task) -> None:
+        """Wait for one count and push its result or error."""
+        message = LiveCount(revision=revision, vendor=target.vendor, model=target.model, format=format_name, changed=True)
+        try:
+            # Shielded: a superseding revision may reuse the count
+            message.token_count = await asyncio.shield(task)
+        except HTTPException as e:
+            message.error = BulkCountError(status_code=e.status_code, detail=str(e.detail))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            message.error = BulkCountError(status_code=500, detail=f"Unexpected error counting tokens: {str(e)}")
+        await self._emit(message)
+
+    async def _emit(self, message) -> None:
+        """Send a message model as JSON, omitting unset optional fields."""
+        await self._send(message.model_dump_json(exclude_none=True))
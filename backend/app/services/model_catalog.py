@@ -0,0 +1,130 @@
+"""
+Stale-while-revalidate cache for vendor model catalogs.
+
+Model catalogs change rarely, so the normalized ``ModelsResponse`` for each
+vendor is cached. Fresh entries are served directly; stale entries are
+served immediately while a background task refreshes them.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.models import ModelsResponse
+
+logger = logging.getLogger(__name__)
+
+CatalogLoader = Callable[[], Awaitable[ModelsResponse]]
+
+
+class CatalogEntry:
+    """A cached model catalog with its ETag and fetch time."""
+
+    def __init__(self, response: ModelsResponse, fetched_at: float):
+        """Create an entry, encoding it once for every response and its ETag.
+
+        Args:
+            response: Normalized models response
+            fetched_at: Monotonic time the catalog was fetched
+        """
+        self.response = response
+        self.fetched_at = fetched_at
+        self.body = response.model_dump_json().encode("utf-8")
+        digest = hashlib.sha256(self.body).hexdigest()
+        self.etag = f'"{digest[:32]}"'
+
+    def age(self) -> float:
+        """Seconds since the catalog was fetched."""
+        return time.monotonic() - self.fetched_at
+
+
+class ModelCatalogCache:
+    """Per-vendor model catalog cache with background refresh."""
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_stale_seconds: float = 7 * 86400.0):
+        """Initialize an empty catalog cache.
+
+        Args:
+            ttl_seconds: Age after which a catalog is refreshed in the background
+            max_stale_seconds: Age after which a stale catalog is no longer
+                served and callers wait for a fresh fetch
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._refreshes: Dict[str, asyncio.Task] = {}
+
+    def peek(self, vendor: str) -> Optional[CatalogEntry]:
+        """Return the cached entry for a vendor without refreshing it."""
+        return self._entries.get(vendor)
+
+    async def get(self, vendor: str, loader: CatalogLoader) -> CatalogEntry:
+        """Return the catalog for a vendor, refreshing it as needed.
+
+        Args:
+            vendor: Vendor name
+            loader: Coroutine function fetching a fresh ModelsResponse
+
+        Returns:
+            Cached or freshly loaded catalog entry
+
+        Raises:
+            HTTPException: If no usable catalog is cached and the fetch fails
+        """
+        entry = self._entries.get(vendor)
+        if entry is not None:
+            age = entry.age()
+            if age < self.ttl_seconds:
+                return entry
+            if age < self.max_stale_seconds:
+                self._refresh(vendor, loader)
+                return entry
+
+        return await asyncio.shield(self._refresh(vendor, loader))
+
+    def _refresh(self, vendor: str, loader: CatalogLoader) -> asyncio.Task:
+        """Start a refresh for a vendor unless one is already running."""
+        task = self._refreshes.get(vendor)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._load(vendor, loader))
+            self._refreshes[vendor] = task
+            task.add_done_callback(self._log_failure)
+        return task
+
+    async def _load(self, vendor: str, loader: CatalogLoader) -> CatalogEntry:
+        """Fetch a catalog and store it."""
+        response = await loader()
+        entry = CatalogEntry(response, time.monotonic())
+        self._entries[vendor] = entry
+        return entry
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        """Log background refresh failures; stale data keeps being served."""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.warning("Model catalog refresh failed: %s", error)
+
+    async def prefetch(self, loaders: Dict[str, CatalogLoader]) -> None:
+        """Load the catalogs of several vendors concurrently.
+
+        Failures are logged and otherwise ignored.
+
+        Args:
+            loaders: Mapping of vendor name to catalog loader
+        """
+        await asyncio.gather(
+            *(self._refresh(vendor, loader) for vendor, loader in loaders.items()),
+            return_exceptions=True
+        )
+
+    async def close(self) -> None:
+        """Cancel any running refreshes."""
+        for task in self._refreshes.values():
+            task.cancel()
+        await asyncio.gather(*self._refreshes.values(), return_exceptions=True)
+        self._refreshes.clear()
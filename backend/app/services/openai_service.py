@@ -0,0 +1,148 @@
+"""
+Service for counting OpenAI tokens with the local BPE engine.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+
+from app.models import ModelInfo
+from app.services.base import VendorService
+from app.services.bpe import ENCODING_NAMES, BPEEncoding, get_encoding
+
+# Model ID -> (display name, encoding, release date)
+OPENAI_MODELS = {
+    "gpt-5": ("GPT-5", "o200k_base", "2025-08-07T00:00:00Z"),
+    "gpt-4.1": ("GPT-4.1", "o200k_base", "2025-04-14T00:00:00Z"),
+    "o4-mini": ("o4-mini", "o200k_base", "2025-04-16T00:00:00Z"),
+    "o3": ("o3", "o200k_base", "2025-04-16T00:00:00Z"),
+    "o1": ("o1", "o200k_base", "2024-12-17T00:00:00Z"),
+    "gpt-4o": ("GPT-4o", "o200k_base", "2024-05-13T00:00:00Z"),
+    "gpt-4o-mini": ("GPT-4o mini", "o200k_base", "2024-07-18T00:00:00Z"),
+    "gpt-4-turbo": ("GPT-4 Turbo", "cl100k_base", "2024-04-09T00:00:00Z"),
+    "gpt-4": ("GPT-4", "cl100k_base", "2023-03-14T00:00:00Z"),
+    "gpt-3.5-turbo": ("GPT-3.5 Turbo", "cl100k_base", "2023-03-01T00:00:00Z"),
+    "text-embedding-3-large": ("Text Embedding 3 Large", "cl100k_base", "2024-01-25T00:00:00Z"),
+    "text-embedding-3-small": ("Text Embedding 3 Small", "cl100k_base", "2024-01-25T00:00:00Z"),
+}
+
+# Texts above this size are encoded in a worker thread to keep the event loop responsive
+OFFLOAD_THRESHOLD_CHARS = 32 * 1024
+
+
+def resolve_encoding(model: str) -> Optional[str]:
+    """Find the encoding used by a model.
+
+    Accepts known model IDs, dated snapshots of them (longest prefix wins)
+    and encoding names.
+
+    Args:
+        model: Model ID or encoding name
+
+    Returns:
+        Encoding name, or None if the model is unknown
+    """
+    if model in ENCODING_NAMES:
+        return model
+    if model in OPENAI_MODELS:
+        return OPENAI_MODELS[model][1]
+
+    matches = [model_id for model_id in OPENAI_MODELS if model.startswith(model_id + "-")]
+    if matches:
+        return OPENAI_MODELS[max(matches, key=len)][1]
+    return None
+
+
+class OpenAIService(VendorService):
+    """Service for OpenAI token counting.
+
+    Counts are computed locally with the vendored BPE encodings, so no API
+    key or network access is needed.
+    """
+
+    vendor = "openai"
+
+    # Chunks split where the pre-tokenizer starts a new piece encode independently
+    exact_chunk_sums = True
+
+    def __init__(self, **options):
+        """Initialize the local OpenAI token counting service.
+
+        Args:
+            **options: Shared counting options passed to VendorService
+                (concurrency, cache, store, single-flight, scheduler, ...)
+        """
+        super().__init__(**options)
+
+    async def list_models(self) -> List[ModelInfo]:
+        """List OpenAI models supported by the local encodings.
+
+        Returns:
+            List of ModelInfo objects
+        """
+        return [
+            ModelInfo(id=model_id, display_name=display_name, created_at=created_at)
+            for model_id, (display_name, _, created_at) in OPENAI_MODELS.items()
+        ]
+
+    def _encoding_for(self, model: str) -> BPEEncoding:
+        """Return the encoding for a model or raise a 400."""
+        name = resolve_encoding(model)
+        if name is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid model: {model}"
+            )
+        return get_encoding(name)
+
+    async def _count(self, text: str, model: str, format_name: Optional[str] = None) -> int:
+        """Count tokens for a single non-empty text using specified model.
+
+        Args:
+            text: Text content to count tokens for
+            model: Model ID or encoding name
+            format_name: Batch format name, used in error messages
+
+        Returns:
+            Number of tokens
+
+        Raises:
+            HTTPException: If the model is unknown or counting fails
+        """
+        try:
+            encoding = self._encoding_for(model)
+            if len(text) > OFFLOAD_THRESHOLD_CHARS:
+                return await asyncio.to_thread(encoding.count, text)
+            return encoding.count(text)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            if format_name is not None:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to count tokens for format '{format_name}': {str(e)}"
+                )
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to count tokens: {str(e)}"
+            )
+
+    def count_local(self, texts: List[str], model: str) -> Tuple[List[int], str]:
+        """Count several texts synchronously with the local engine.
+
+        Intended for callers that need reference counts without going
+        through the cache and request machinery.
+
+        Args:
+            texts: Texts to count
+            model: Model ID or encoding name
+
+        Returns:
+            Tuple of (token counts in input order, encoding name)
+
+        Raises:
+            HTTPException: If the model is unknown
+        """
+        encoding = self._encoding_for(model)
+        return encoding.count_batch(texts), encoding.name
@@ -0,0 +1,138 @@
+"""
+Packed counting of several texts in one upstream request.
+
+A packed request sends every text as its own content block of one message,
+so blocks are tokenized independently and the request's framing (role and
+message markers) is paid once instead of once per text. Counted alone, each
+text would carry that framing, so the sum of the unpacked counts is::
+
+    packed total + (texts - 1) * framing
+
+The framing is measured once per model by counting probe texts both ways
+and is rechecked from time to time against real batches counted unpacked.
+
+One total cannot be split into per-text counts exactly. A batch with a
+single uncounted text is counted exactly as usual; otherwise the exact
+batch total is apportioned over the texts in proportion to their
+calibrated estimates, and those counts are reported as inexact.
+"""
+
+from typing import List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class PackingOptions:
+    """Limits and verification rate of packed counting."""
+
+    __slots__ = ("max_texts", "max_chars", "verify_every")
+
+    def __init__(self, max_texts: int = 64, max_chars: int = 400_000, verify_every: int = 20):
+        """Create packing options.
+
+        Args:
+            max_texts: Maximum number of texts in one packed request
+            max_chars: Maximum total characters in one packed request
+            verify_every: Recount one in this many packed requests unpacked
+                in the background to check the framing; 0 disables it
+        """
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        self.verify_every = verify_every
+
+
+class PackedCount:
+    """Count of one text of a packed batch and how it was obtained."""
+
+    __slots__ = ("count", "exact", "error_bound", "latency_ms", "cached")
+
+    def __init__(
+        self,
+        count: int,
+        exact: bool,
+        error_bound: int = 0,
+        latency_ms: float = 0.0,
+        cached: bool = False
+    ):
+        """Create a result.
+
+        Args:
+            count: Token count of the text as if counted alone
+            exact: Whether the count equals an unpacked count
+            error_bound: Approximate 95% error bound of an apportioned count
+            latency_ms: Latency of the upstream request the text was counted in
+            cached: Whether the count was served from the cache or store
+        """
+        self.count = count
+        self.exact = exact
+        self.error_bound = error_bound
+        self.latency_ms = latency_ms
+        self.cached = cached
+
+
+def plan_packs(items: Sequence[Tuple[T, str]], max_texts: int, max_chars: int) -> List[List[Tuple[T, str]]]:
+    """Group texts into packed requests, in order, within the size limits.
+
+    A text longer than ``max_chars`` gets a request of its own.
+
+    Args:
+        items: (key, text) pairs to pack
+        max_texts: Maximum number of texts per request
+        max_chars: Maximum total characters per request
+
+    Returns:
+        List of packs, each a list of (key, text) pairs
+    """
+    packs: List[List[Tuple[T, str]]] = []
+    current: List[Tuple[T, str]] = []
+    chars = 0
+    for key, text in items:
+        if current and (len(current) >= max_texts or chars + len(text) > max_chars):
+            packs.append(current)
+            current, chars = [], 0
+        current.append((key, text))
+        chars += len(text)
+    if current:
+        packs.append(current)
+    return packs
+
+
+def apportion(total: int, weights: Sequence[int]) -> List[int]:
+    """Split an integer total in proportion to weights, preserving the sum.
+
+    Uses largest-remainder rounding; every share is at least 1 when the
+    total allows it, since every packed text is non-empty.
+
+    Args:
+        total: Integer total to split
+        weights: Positive weights, one per share
+
+    Returns:
+        Integer shares summing to ``total``
+    """
+    if not weights:
+        return []
+    weight_sum = sum(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    shares = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda index: exact[index] - shares[index], reverse=True)
+    for index in by_remainder[:total - sum(shares)]:
+        shares[index] += 1
+
+    # Move single tokens from the largest shares to any empty ones
+    for index in range(len(shares)):
+        if shares[index] == 0:
+            donor = max(range(len(shares)), key=shares.__getitem__)
+            if shares[donor] > 1:
+                shares[donor] -= 1
+                shares[index] = 1
+    return shares
+
+
+# Probe texts counted alone and packed to measure per-request framing
+PACKING_PROBES = (
+    '{\n  "id": 1,\n  "name": "Alice",\n  "role": "admin"\n}',
+    "users:\n  - id: 2\n    name: Bob\n    role: viewer\n",
+    "<user>\n  <id>3</id>\n  <name>Carol</name>\n</user>",
+    "id,name,role\n4,Dave,editor\n5,Eve,owner\n",
+)
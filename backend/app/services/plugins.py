@@ -0,0 +1,65 @@
+"""
+Vendor backends as lazily imported plugins.
+
+Each vendor service lives in its own module, and the remote ones pull in a
+heavy SDK. ``VENDOR_PLUGINS`` records where each service is and what it
+needs, so a vendor's module is only imported when the vendor is enabled
+and first used. A deployment serving one vendor never imports the others.
+"""
+
+import importlib
+import importlib.util
+from dataclasses import dataclass
+from typing import Dict, Optional, Type
+
+from app.services.base import VendorService
+
+
+@dataclass(frozen=True)
+class VendorPlugin:
+    """Location and requirements of one vendor service."""
+
+    module: str
+    class_name: str
+    # Prefix of the vendor's settings, e.g. "ANTHROPIC" for ANTHROPIC_API_KEY
+    settings_prefix: str
+    # Remote vendors need an API key and get a connection pool and scheduler
+    remote: bool = True
+    # Top-level package the module needs beyond the base requirements
+    requires: Optional[str] = None
+
+    def installed(self) -> bool:
+        """Whether the vendor's SDK can be imported, without importing it."""
+        if self.requires is None:
+            return True
+        try:
+            return importlib.util.find_spec(self.requires) is not None
+        except ModuleNotFoundError:
+            # The parent of a dotted name (e.g. "google") is missing
+            return False
+
+    def load(self) -> Type[VendorService]:
+        """Import the vendor's module and return its service class."""
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+VENDOR_PLUGINS: Dict[str, VendorPlugin] = {
+    "anthropic": VendorPlugin(
+        module="app.services.anthropic_service",
+        class_name="AnthropicService",
+        settings_prefix="ANTHROPIC",
+        requires="anthropic"
+    ),
+    "google": VendorPlugin(
+        module="app.services.google_service",
+        class_name="GoogleService",
+        settings_prefix="GOOGLE",
+        requires="google.genai"
+    ),
+    "openai": VendorPlugin(
+        module="app.services.openai_service",
+        class_name="OpenAIService",
+        settings_prefix="OPENAI",
+        remote=False
+    ),
+}
@@ -0,0 +1,585 @@
+"""
+Sampled counting of documents made of one large array of records.
+
+A document whose bulk is an array of objects (at the top level or under
+object keys) is not counted whole. The records are split into contiguous
+strata, clusters of records are drawn at random within each stratum, and
+every format is rendered for a cluster as the document with the array
+replaced by::
+
+    base records + cluster records
+
+The base records (the first record, plus one that keeps TOON out of
+tabular form when the full array is not tabular) give every sample the
+layout of the full document, and the document holding only them is
+counted once. A cluster's count minus that base count is the cost of its
+records in context, separators included. Token cost follows record size
+closely, so each stratum's cost is a ratio estimate on the compact JSON
+size of its records, which one C-speed ``json.dumps`` pass measures::
+
+    base count + sum over strata of (stratum characters * cluster tokens / cluster characters)
+
+A stratified variance estimate of the ratio residuals (finite population
+corrected) gives a 95% confidence interval. Clusters are added in rounds,
+allocated to the strata in proportion to their size, until every format's
+interval is within the target relative error or the record budget is
+spent, so the upstream work depends on the sample size rather than on the
+size of the document.
+
+Length prefixes such as TOON's ``[N]`` are rendered for the sample and may
+differ from the full document's by a token, far inside the interval.
+"""
+
+import asyncio
+import json
+import math
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app import metrics
+from app.services.base import VendorService
+from app.services.conversion import FORMAT_NAMES, convert, is_toon_tabular
+
+# Two-sided 95% Student t quantiles by degrees of freedom; between entries the lower one applies
+_T_QUANTILES_95 = (
+    (1, 12.706), (2, 4.303), (3, 3.182), (4, 2.776), (5, 2.571), (6, 2.447), (7, 2.365), (8, 2.306),
+    (9, 2.262), (10, 2.228), (12, 2.179), (15, 2.131), (20, 2.086), (30, 2.042), (60, 2.000), (120, 1.980),
+)
+_Z_95 = 1.96
+
+# Clusters drawn per stratum in the first round (a variance needs two, three steady it)
+_PILOT_CLUSTERS = 3
+# Rounds of counting, the first included, before settling for the interval reached
+_MAX_ROUNDS = 4
+# Texts parsed as the source document, in order of preference
+_SOURCE_FORMATS = ("jsonCompact", "json")
+
+RecordsPath = Tuple[str, ...]
+# (stratum number, record indices, characters of the records) of a drawn cluster
+Cluster = Tuple[int, List[int], int]
+
+
+class SamplingOptions:
+    """Thresholds and sample sizes of sampled counting."""
+
+    __slots__ = ("min_records", "strata", "cluster_size", "max_records")
+
+    def __init__(self, min_records: int = 2000, strata: int = 4, cluster_size: int = 25, max_records: int = 1000):
+        """Create sampling options.
+
+        Args:
+            min_records: Arrays with fewer records are counted exactly
+            strata: Maximum number of contiguous strata the records are split into
+            cluster_size: Records per counted sample
+            max_records: Maximum number of records sampled per request
+        """
+        self.min_records = min_records
+        self.strata = strata
+        self.cluster_size = cluster_size
+        self.max_records = max_records
+
+
+class SampledCount:
+    """Extrapolated (or exact) token count of one format."""
+
+    __slots__ = ("count", "exact", "error_bound", "low", "high", "latency_ms")
+
+    def __init__(
+        self,
+        count: int,
+        exact: bool,
+        error_bound: int = 0,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        latency_ms: float = 0.0
+    ):
+        """Create a result.
+
+        Args:
+            count: Token count of the whole document in this format
+            exact: Whether the document was counted whole
+            error_bound: Half-width of the 95% confidence interval
+            low: Lower end of the 95% confidence interval
+            high: Upper end of the 95% confidence interval
+            latency_ms: Upstream latency spent on this format, summed over rounds
+        """
+        self.count = count
+        self.exact = exact
+        self.error_bound = error_bound
+        self.low = low
+        self.high = high
+        self.latency_ms = latency_ms
+
+
+class SampledBatch:
+    """Results of a sampled batch and a summary of the sample behind them."""
+
+    __slots__ = (
+        "counts", "sampled", "records", "sampled_records", "strata", "rounds", "upstream_texts",
+        "target_error", "achieved_error", "target_met"
+    )
+
+    def __init__(
+        self,
+        counts: Dict[str, SampledCount],
+        sampled: bool,
+        records: int = 0,
+        sampled_records: int = 0,
+        strata: int = 0,
+        rounds: int = 0,
+        upstream_texts: int = 0,
+        target_error: float = 0.0,
+        achieved_error: float = 0.0,
+        target_met: bool = True
+    ):
+        """Create a batch result.
+
+        Args:
+            counts: Format name to result
+            sampled: Whether the counts were extrapolated from a sample
+            records: Records in the sampled array
+            sampled_records: Records in the counted clusters
+            strata: Number of strata
+            rounds: Rounds of counting
+            upstream_texts: Sample texts counted, base documents included
+            target_error: Requested relative half-width of the intervals
+            achieved_error: Largest relative half-width reached
+            target_met: Whether every format reached the target
+        """
+        self.counts = counts
+        self.sampled = sampled
+        self.records = records
+        self.sampled_records = sampled_records
+        self.strata = strata
+        self.rounds = rounds
+        self.upstream_texts = upstream_texts
+        self.target_error = target_error
+        self.achieved_error = achieved_error
+        self.target_met = target_met
+
+
+def t_quantile(degrees_of_freedom: int) -> float:
+    """Two-sided 95% Student t quantile, rounded towards the wider interval."""
+    if degrees_of_freedom < 1:
+        return math.inf
+    if degrees_of_freedom > _T_QUANTILES_95[-1][0]:
+        return _Z_95
+    quantile = math.inf
+    for limit, value in _T_QUANTILES_95:
+        if limit > degrees_of_freedom:
+            break
+        quantile = value
+    return quantile
+
+
+def find_records(document: Any) -> Optional[Tuple[RecordsPath, List[Dict[str, Any]]]]:
+    """Locate the longest array of objects, at the top level or under object keys.
+
+    Arrays nested inside other arrays are not searched.
+
+    Args:
+        document: Parsed JSON document
+
+    Returns:
+        (path of object keys to the array, the array), or None if the
+        document holds no non-empty array of objects
+    """
+    best: Optional[Tuple[RecordsPath, List[Dict[str, Any]]]] = None
+    stack: List[Tuple[RecordsPath, Any]] = [((), document)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if isinstance(child, (dict, list)):
+                    stack.append((path + (key,), child))
+        elif (
+            isinstance(value, list)
+            and value
+            and (best is None or len(value) > len(best[1]))
+            and all(isinstance(item, dict) for item in value)
+        ):
+            best = (path, value)
+    return best
+
+
+def with_records(document: Any, path: RecordsPath, records: List[Dict[str, Any]]) -> Any:
+    """Copy of the document with the array at ``path`` replaced, sharing everything else."""
+    if not path:
+        return records
+    key = path[0]
+    copy = dict(document)
+    copy[key] = with_records(document[key], path[1:], records)
+    return copy
+
+
+def base_indices(records: List[Dict[str, Any]]) -> List[int]:
+    """Indices of the records included in every sample.
+
+    The first record fixes TOON's field order. If the full array is not
+    tabular but the first record is, the first record that breaks the
+    tabular form with it is added, so no sample turns tabular either.
+    """
+    indices = [0]
+    if is_toon_tabular(records[:1]) and not is_toon_tabular(records):
+        for index in range(1, len(records)):
+            if not is_toon_tabular([records[0], records[index]]):
+                indices.append(index)
+                break
+    return indices
+
+
+def compact_chars(records: List[Dict[str, Any]]) -> int:
+    """Total compact JSON characters of the records, without brackets and separators."""
+    if not records:
+        return 0
+    return len(json.dumps(records, ensure_ascii=False, separators=(",", ":"))) - len(records) - 1
+
+
+def stratum_ratio(base_count: int, clusters: Sequence[Tuple[int, int]]) -> Tuple[float, float]:
+    """Tokens per character of a stratum's clusters and the variance of their residuals.
+
+    Args:
+        base_count: Token count of the document holding only the base records
+        clusters: (token count of the cluster document, characters of its records) pairs
+
+    Returns:
+        (ratio, sample variance of the clusters' token residuals from it)
+    """
+    costs = [(count - base_count, chars) for count, chars in clusters]
+    ratio = sum(cost for cost, _ in costs) / max(sum(chars for _, chars in costs), 1)
+    if len(costs) < 2:
+        return ratio, 0.0
+    return ratio, sum((cost - ratio * chars) ** 2 for cost, chars in costs) / (len(costs) - 1)
+
+
+def extrapolate(
+    base_count: int,
+    strata: Sequence[Tuple[int, int, Sequence[Tuple[int, int]]]],
+    cluster_size: int
+) -> Tuple[float, float]:
+    """Estimate a document's total from cluster counts.
+
+    Args:
+        base_count: Token count of the document holding only the base records
+        strata: (records in the stratum, their characters, (cluster token count,
+            cluster characters) pairs) of each stratum
+        cluster_size: Records per cluster
+
+    Returns:
+        (estimated total, half-width of its 95% confidence interval)
+    """
+    total = float(base_count)
+    variance = 0.0
+    degrees_of_freedom = 0
+    for size, chars, clusters in strata:
+        ratio, spread = stratum_ratio(base_count, clusters)
+        total += ratio * chars
+        sampled_fraction = min(1.0, len(clusters) * cluster_size / size)
+        variance += (size / cluster_size) ** 2 * (1.0 - sampled_fraction) * spread / len(clusters)
+        degrees_of_freedom += len(clusters) - 1
+    return total, t_quantile(degrees_of_freedom) * math.sqrt(variance) if variance else 0.0
+
+
+class _Stratum:
+    """Contiguous range of records and the clusters drawn from it."""
+
+    __slots__ = ("size", "chars", "pool", "clusters")
+
+    def __init__(self, size: int, chars: int, pool: List[int]):
+        self.size = size
+        self.chars = chars
+        self.pool = pool
+        self.clusters: List[List[int]] = []
+
+
+class SampleDesign:
+    """Stratified cluster sample of an array of records.
+
+    Draws are seeded, so the same document always yields the same clusters
+    and a repeated request is answered from the token count cache. Building
+    a design measures every record, so it belongs in a worker thread.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], base: Sequence[int], options: SamplingOptions, seed: int):
+        """Split the records into strata and shuffle each stratum's draw order.
+
+        Args:
+            records: The array of records
+            base: Indices of the base records, never drawn
+            options: Sample sizes
+            seed: Random seed
+        """
+        self.records = records
+        self.cluster_size = options.cluster_size
+        pilot_records = _PILOT_CLUSTERS * options.cluster_size
+        eligible = len(records) - len(base)
+        count = max(1, min(options.strata, eligible // pilot_records, options.max_records // pilot_records))
+        self._remaining = max(options.max_records // options.cluster_size, _PILOT_CLUSTERS * count)
+
+        rng = random.Random(seed)
+        excluded = set(base)
+        self.strata: List[_Stratum] = []
+        for number in range(count):
+            start, stop = len(records) * number // count, len(records) * (number + 1) // count
+            draws = min(stop - start, options.max_records + len(excluded))
+            pool = [index for index in rng.sample(range(start, stop), draws) if index not in excluded]
+            inside = [index for index in excluded if start <= index < stop]
+            chars = compact_chars(records[start:stop]) - compact_chars([records[index] for index in inside])
+            self.strata.append(_Stratum(stop - start - len(inside), chars, pool))
+
+    @property
+    def clusters(self) -> int:
+        """Clusters drawn so far."""
+        return sum(len(stratum.clusters) for stratum in self.strata)
+
+    @property
+    def sampled_records(self) -> int:
+        """Records drawn so far."""
+        return self.clusters * self.cluster_size
+
+    def _draw(self, number: int) -> Optional[Cluster]:
+        """Draw one cluster from a stratum, or None if it or the budget is spent."""
+        stratum = self.strata[number]
+        if self._remaining <= 0 or len(stratum.pool) < self.cluster_size:
+            return None
+        indices = stratum.pool[-self.cluster_size:]
+        del stratum.pool[-self.cluster_size:]
+        stratum.clusters.append(indices)
+        self._remaining -= 1
+        return number, indices, compact_chars([self.records[index] for index in indices])
+
+    def pilot(self) -> List[Cluster]:
+        """Draw the first clusters, the same number from every stratum."""
+        drawn = []
+        for number in range(len(self.strata)):
+            for _ in range(_PILOT_CLUSTERS):
+                cluster = self._draw(number)
+                if cluster is not None:
+                    drawn.append(cluster)
+        return drawn
+
+    def allocate(self, clusters: int) -> List[Cluster]:
+        """Draw more clusters so the strata hold about ``clusters`` in total.
+
+        Each new cluster goes to the stratum with the fewest clusters per
+        record, which keeps the allocation proportional to stratum size,
+        within each stratum's remaining records and the record budget.
+        Neyman allocation would need per-stratum spreads that a pilot of a
+        few clusters does not estimate reliably.
+
+        Args:
+            clusters: Total number of clusters wanted
+
+        Returns:
+            The new clusters
+        """
+        drawn = []
+        open_strata = set(range(len(self.strata)))
+        while open_strata and self._remaining > 0 and self.clusters < clusters:
+            number = min(open_strata, key=lambda index: len(self.strata[index].clusters) / self.strata[index].size)
+            cluster = self._draw(number)
+            if cluster is None:
+                open_strata.discard(number)
+            else:
+                drawn.append(cluster)
+        return drawn
+
+
+def _render_all(document: Any, formats: Sequence[str]) -> Dict[str, str]:
+    """Serialize a document into the requested formats."""
+    return {name: convert(document, name) for name in formats}
+
+
+def _render_samples(
+    document: Any,
+    path: RecordsPath,
+    records: List[Dict[str, Any]],
+    base: Sequence[int],
+    clusters: Sequence[Cluster],
+    formats: Sequence[str],
+    include_base: bool
+) -> Dict[Tuple[str, int], str]:
+    """Serialize the base document and cluster documents into every format.
+
+    Returns:
+        (format name, cluster position or -1 for the base document) to text
+    """
+    base_records = [records[index] for index in base]
+    documents = [(-1, base_records)] if include_base else []
+    documents += [
+        (position, base_records + [records[index] for index in cluster])
+        for position, (_, cluster, _) in enumerate(clusters)
+    ]
+    texts = {}
+    for position, sample in documents:
+        sample_document = with_records(document, path, sample)
+        for name in formats:
+            texts[(name, position)] = convert(sample_document, name)
+    return texts
+
+
+async def _count_exact(
+    service: VendorService,
+    document: Any,
+    formats: List[str],
+    model: str,
+    records: int
+) -> SampledBatch:
+    """Convert and count every format of the whole document."""
+    whole = await asyncio.to_thread(_render_all, document, formats)
+    token_counts, latencies_ms = await service.count_tokens_batch(whole, model)
+    metrics.SAMPLED_REQUESTS.labels(service.vendor, "exact").inc()
+    return SampledBatch(
+        counts={
+            name: SampledCount(count=token_counts[name], exact=True, latency_ms=latencies_ms[name])
+            for name in formats
+        },
+        sampled=False,
+        records=records
+    )
+
+
+async def count_sampled(
+    service: VendorService,
+    texts: Dict[str, str],
+    model: str,
+    target_error: float,
+    options: SamplingOptions
+) -> SampledBatch:
+    """Count a batch of formats of one JSON document by sampling its records.
+
+    The document is parsed from the ``jsonCompact`` or ``json`` text; every
+    requested format is generated from it with the server-side converters,
+    so the other texts are not read and may be empty. Documents without an
+    array of at least ``options.min_records`` objects, or with too few
+    records to draw a pilot sample from, are converted and counted whole.
+
+    Args:
+        service: Vendor service counting the sample texts
+        texts: Dictionary mapping format names (see ``FORMAT_NAMES``) to text
+        model: Model ID to use for counting
+        target_error: Relative half-width of the 95% interval to reach
+        options: Thresholds and sample sizes
+
+    Returns:
+        SampledBatch with a result per format and a summary of the sample
+
+    Raises:
+        HTTPException: If a format is unknown, the document is missing or
+            invalid, or an API call fails
+    """
+    unknown = sorted(set(texts) - set(FORMAT_NAMES))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sampled mode counts the formats {', '.join(FORMAT_NAMES)}; unknown: {', '.join(unknown)}"
+        )
+    source = next((texts[name] for name in _SOURCE_FORMATS if texts.get(name)), None)
+    if source is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Sampled mode needs the document as a non-empty 'json' or 'jsonCompact' text"
+        )
+    try:
+        document = await asyncio.to_thread(json.loads, source)
+    except (ValueError, RecursionError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to parse the JSON text: {str(e)}"
+        )
+
+    formats = list(texts)
+    located = find_records(document)
+    if located is None or len(located[1]) < options.min_records:
+        return await _count_exact(service, document, formats, model, len(located[1]) if located is not None else 0)
+
+    path, records = located
+    base = await asyncio.to_thread(base_indices, records)
+    if len(records) - len(base) < _PILOT_CLUSTERS * options.cluster_size:
+        # Too few records to draw even the pilot from
+        return await _count_exact(service, document, formats, model, len(records))
+    design = await asyncio.to_thread(SampleDesign, records, base, options, len(records))
+    base_counts: Dict[str, int] = {}
+    cluster_counts: Dict[str, List[List[Tuple[int, int]]]] = {name: [[] for _ in design.strata] for name in formats}
+    latencies: Dict[str, float] = {name: 0.0 for name in formats}
+    estimates: Dict[str, Tuple[float, float]] = {}
+    upstream_texts = 0
+    rounds = 0
+    achieved = math.inf
+
+    clusters = design.pilot()
+    if not clusters:
+        return await _count_exact(service, document, formats, model, len(records))
+    while clusters and rounds < _MAX_ROUNDS:
+        rounds += 1
+        sample_texts = await asyncio.to_thread(
+            _render_samples, document, path, records, base, clusters, formats, not base_counts
+        )
+        labels = {
+            f"{name} base" if position < 0 else f"{name} sample {position}": (name, position)
+            for name, position in sample_texts
+        }
+        token_counts, latencies_ms = await service.count_tokens_batch(
+            texts={label: sample_texts[key] for label, key in labels.items()},
+            model=model
+        )
+        upstream_texts += len(labels)
+        round_latencies: Dict[str, float] = {}
+        for label, (name, position) in labels.items():
+            round_latencies[name] = max(round_latencies.get(name, 0.0), latencies_ms[label])
+            if position < 0:
+                base_counts[name] = token_counts[label]
+            else:
+                number, _, chars = clusters[position]
+                cluster_counts[name][number].append((token_counts[label], chars))
+        for name, latency in round_latencies.items():
+            latencies[name] += latency
+
+        estimates = {
+            name: extrapolate(
+                base_counts[name],
+                [
+                    (stratum.size, stratum.chars, counts)
+                    for stratum, counts in zip(design.strata, cluster_counts[name])
+                ],
+                design.cluster_size
+            )
+            for name in formats
+        }
+        errors = {name: half_width / max(total, 1.0) for name, (total, half_width) in estimates.items()}
+        achieved = max(errors.values())
+        if achieved <= target_error:
+            break
+
+        # Clusters needed scale with the square of the interval's overshoot
+        scale = (achieved / target_error) ** 2 if math.isfinite(achieved) else 4.0
+        clusters = design.allocate(math.ceil(design.clusters * scale))
+
+    target_met = achieved <= target_error
+    metrics.SAMPLED_REQUESTS.labels(service.vendor, "met" if target_met else "budget").inc()
+    metrics.SAMPLED_RECORDS.labels(service.vendor).inc(design.sampled_records)
+
+    results = {}
+    for name, (total, half_width) in estimates.items():
+        results[name] = SampledCount(
+            count=round(total),
+            exact=False,
+            error_bound=math.ceil(half_width),
+            low=max(0, math.floor(total - half_width)),
+            high=math.ceil(total + half_width),
+            latency_ms=latencies[name]
+        )
+    return SampledBatch(
+        counts=results,
+        sampled=True,
+        records=len(records),
+        sampled_records=design.sampled_records,
+        strata=len(design.strata),
+        rounds=rounds,
+        upstream_texts=upstream_texts,
+        target_error=target_error,
+        achieved_error=achieved,
+        target_met=target_met
+    )
@@ -0,0 +1,330 @@
+"""
+Rate-limit-aware scheduling of upstream vendor calls.
+
+Every upstream count of a vendor goes through its ``UpstreamScheduler``:
+
+- a token bucket caps the request rate at the configured quota,
+- an AIMD limit adapts concurrency: it grows by about one per round trip
+  while calls succeed quickly and is halved on 429s (or cut gently when
+  latency rises well above its baseline),
+- rate-limited calls are retried with jittered exponential backoff, and a
+  ``Retry-After`` from the vendor pauses all dispatch until it has passed,
+- queued interactive calls are always dispatched before bulk work.
+
+Services signal rate limiting by raising ``HTTPException(429)``, optionally
+with a ``Retry-After`` header; after the last retry that error reaches the
+client instead of a generic 500.
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional
+
+from fastapi import HTTPException
+
+INTERACTIVE = 0
+BULK = 1
+
+# Priority of upstream calls made in the current context; bulk paths set BULK
+upstream_priority: contextvars.ContextVar[int] = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+# Recent latency above this multiple of the long-run baseline counts as congestion
+_CONGESTION_FACTOR = 2.0
+# Smoothing weight of the recent latency average
+_RECENT_WEIGHT = 0.05
+# Successes averaged before latency is used as a congestion signal
+_WARMUP_SAMPLES = 20
+# Relative upward drift per second of the baseline (the lowest recent average)
+_BASELINE_DRIFT_PER_SECOND = 0.01
+# Multiplicative decrease on 429s and on congestion
+_RATE_LIMIT_BACKOFF = 0.5
+_CONGESTION_BACKOFF = 0.9
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Read a retry delay in seconds from response headers.
+
+    Supports ``retry-after-ms``, and ``Retry-After`` as seconds or an HTTP date.
+
+    Args:
+        headers: Response headers (case-insensitive mapping), if any
+
+    Returns:
+        Delay in seconds, or None if no usable header is present
+    """
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)
+
+
+def rate_limited(detail: str, retry_after: Optional[float]) -> HTTPException:
+    """Build the 429 error services raise for vendor rate limiting.
+
+    Args:
+        detail: Error detail
+        retry_after: Vendor-provided retry delay in seconds, if any
+
+    Returns:
+        HTTPException with status 429 and Retry-After headers when known
+    """
+    headers = None
+    if retry_after is not None:
+        # Retry-After only carries whole seconds; keep the precise delay alongside it
+        headers = {
+            "Retry-After": str(max(1, math.ceil(retry_after))),
+            "retry-after-ms": str(round(retry_after * 1000)),
+        }
+    return HTTPException(status_code=429, detail=detail, headers=headers)
+
+
+class UpstreamScheduler:
+    """Per-vendor admission control for upstream calls."""
+
+    def __init__(
+        self,
+        requests_per_second: float = 0.0,
+        burst: int = 0,
+        initial_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        base_backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0
+    ):
+        """Configure the scheduler.
+
+        Args:
+            requests_per_second: Sustained request quota; 0 disables the token bucket
+            burst: Token bucket capacity (defaults to one second of quota)
+            initial_concurrency: Starting concurrency limit
+            min_concurrency: Lowest concurrency the limit can shrink to
+            max_concurrency: Highest concurrency the limit can grow to
+            max_retries: Retries of a rate-limited call before giving up
+            base_backoff_seconds: First retry delay without a Retry-After
+            max_backoff_seconds: Cap on retry delays and pauses
+        """
+        self.requests_per_second = requests_per_second
+        self.burst = burst or max(1, int(requests_per_second))
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._queues: Dict[int, Deque[asyncio.Future]] = {INTERACTIVE: deque(), BULK: deque()}
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._baseline_ms: Optional[float] = None
+        self._latency_ms = 0.0
+        self._samples = 0
+        self._baseline_at = 0.0
+        self._last_decrease = 0.0
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], priority: Optional[int] = None) -> Any:
+        """Run an upstream call under the scheduler, retrying on rate limits.
+
+        Args:
+            fn: Zero-argument coroutine function performing the call
+            priority: INTERACTIVE or BULK; defaults to ``upstream_priority``
+
+        Returns:
+            The call's result
+
+        Raises:
+            HTTPException: 429 if the call is still rate limited after all
+                retries, or whatever else the call raised
+        """
+        if priority is None:
+            priority = upstream_priority.get()
+
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            start = time.monotonic()
+            try:
+                result = await fn()
+            except HTTPException as e:
+                if e.status_code != 429:
+                    self._release()
+                    raise
+                retry_after = parse_retry_after(e.headers)
+                # Adjust limits before the freed slot is handed out
+                self._on_rate_limited(retry_after)
+                self._release()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                continue
+            except BaseException:
+                self._release()
+                raise
+
+            self._on_success((time.monotonic() - start) * 1000)
+            self._release()
+            return result
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Retry delay: Retry-After plus jitter, else full-jitter exponential."""
+        if retry_after is not None:
+            return min(retry_after + random.uniform(0, self.base_backoff_seconds), self.max_backoff_seconds)
+        ceiling = min(self.base_backoff_seconds * (2 ** (attempt - 1)), self.max_backoff_seconds)
+        return random.uniform(0, ceiling)
+
+    async def _acquire(self, priority: int) -> None:
+        """Wait for a concurrency slot and a rate token."""
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(future)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled; hand the slot back
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+    def _release(self) -> None:
+        """Free a concurrency slot."""
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accrued since the last refill."""
+        if self.requests_per_second <= 0:
+            return
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.requests_per_second)
+        self._refilled_at = now
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the highest-priority waiter that is still waiting."""
+        for priority in (INTERACTIVE, BULK):
+            queue = self._queues[priority]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    return future
+        return None
+
+    def _has_waiters(self) -> bool:
+        """Whether any waiter is still queued, dropping abandoned ones at the heads."""
+        for queue in self._queues.values():
+            while queue and queue[0].done():
+                queue.popleft()
+            if queue:
+                return True
+        return False
+
+    def _dispatch(self) -> None:
+        """Grant slots to queued waiters while limits allow."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        now = time.monotonic()
+        while self._in_flight < int(self.limit) and self._has_waiters():
+            if now < self._paused_until:
+                self._schedule_wakeup(self._paused_until - now)
+                return
+            self._refill(now)
+            if self.requests_per_second > 0 and self._tokens < 1:
+                self._schedule_wakeup((1 - self._tokens) / self.requests_per_second)
+                return
+
+            future = self._next_waiter()
+            if future is None:
+                return
+            if self.requests_per_second > 0:
+                self._tokens -= 1
+            self._in_flight += 1
+            self.calls += 1
+            future.set_result(None)
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        """Retry dispatch once the pause ends or a token accrues."""
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _on_rate_limited(self, retry_after: Optional[float]) -> None:
+        """Halve the limit (once per round trip) and honor Retry-After."""
+        self.rate_limited += 1
+        now = time.monotonic()
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + min(retry_after, self.max_backoff_seconds))
+        if now - self._last_decrease >= self._latency_ms / 1000:
+            self.limit = max(float(self.min_concurrency), self.limit * _RATE_LIMIT_BACKOFF)
+            self._last_decrease = now
+
+    def _on_success(self, latency_ms: float) -> None:
+        """Grow the limit additively, or cut it gently when latency signals congestion."""
+        now = time.monotonic()
+        self._samples += 1
+        if self._samples == 1:
+            self._latency_ms = latency_ms
+        else:
+            self._latency_ms += _RECENT_WEIGHT * (latency_ms - self._latency_ms)
+        if self._samples < _WARMUP_SAMPLES:
+            return
+
+        if self._baseline_ms is None:
+            self._baseline_ms = self._latency_ms
+        else:
+            # Lowest recent average seen, allowed to drift up slowly so it can recover from outliers
+            drifted = self._baseline_ms * (1 + _BASELINE_DRIFT_PER_SECOND * (now - self._baseline_at))
+            self._baseline_ms = min(self._latency_ms, drifted)
+        self._baseline_at = now
+
+        if self._latency_ms > _CONGESTION_FACTOR * self._baseline_ms:
+            if now - self._last_decrease >= self._latency_ms / 1000:
+                self.limit = max(float(self.min_concurrency), self.limit * _CONGESTION_BACKOFF)
+                self._last_decrease = now
+        elif self._in_flight >= int(self.limit):
+            # Only grow while the limit is actually the bottleneck
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the current limit, queue depths and counters."""
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self._in_flight,
+            "queued_interactive": sum(1 for future in self._queues[INTERACTIVE] if not future.done()),
+            "queued_bulk": sum(1 for future in self._queues[BULK] if not future.done()),
+            "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+        }
@@ -0,0 +1,97 @@
+"""
+Single-flight coalescing of identical in-flight upstream calls.
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set
+
+# Whether counts made in the current context may cancel their shared call
+# once every waiter is gone; set by live counting and disconnect-cancelled routes
+cancel_abandoned: contextvars.ContextVar[bool] = contextvars.ContextVar("cancel_abandoned", default=False)
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call as a task; later callers await
+    the same task until it finishes. Every waiter sees the same result or
+    exception. Waiters are shielded from each other, so by default a
+    cancelled waiter never cancels the shared call, which goes on to cache
+    its result. Callers that opt in with ``cancel_when_abandoned`` let the
+    last waiter's cancellation cancel the call, so abandoned calls stop
+    consuming upstream capacity; a call any waiter joined without opting in
+    always runs to completion.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        # Calls joined by a waiter that did not opt in to cancellation
+        self._pinned: Set[asyncio.Task] = set()
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cancel_when_abandoned: bool = False
+    ) -> Any:
+        """Run ``fn`` once per key among concurrent callers.
+
+        Args:
+            key: Identity of the call (e.g. vendor, model and text digest)
+            fn: Zero-argument coroutine function performing the call
+            cancel_when_abandoned: Cancel the shared call if this caller is
+                cancelled as its last waiter and every waiter opted in
+
+        Returns:
+            The shared call's result
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.get_running_loop().create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        if not cancel_when_abandoned:
+            self._pinned.add(task)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waiters = self._waiters.get(task, 1) - 1
+            if waiters > 0:
+                self._waiters[task] = waiters
+            else:
+                self._waiters.pop(task, None)
+                if not task.done() and task not in self._pinned:
+                    # Every caller has gone away; later callers start a fresh call
+                    self.abandoned += 1
+                    if self._in_flight.get(key) is task:
+                        del self._in_flight[key]
+                    task.cancel()
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """Forget a finished call and mark its outcome as retrieved."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        self._waiters.pop(task, None)
+        self._pinned.discard(task)
+        # Retrieve the exception so abandoned calls don't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight."""
+        return len(self._in_flight)
@@ -0,0 +1,139 @@
+"""
+In-process cache for token counts.
+
+Token counts are a pure function of (vendor, model, text), so results are
+cached under a digest of the text rather than the text itself.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str, bytes]
+
+# Rough per-entry memory cost (OrderedDict slot, key tuple, value tuple)
+_ENTRY_OVERHEAD_BYTES = 240
+
+
+def text_digest(text: str) -> bytes:
+    """Return the content digest used to identify a text.
+
+    Args:
+        text: Text content
+
+    Returns:
+        16-byte BLAKE2b digest of the UTF-8 encoded text
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCountCache:
+    """Bounded LRU cache of token counts with TTL expiry.
+
+    Entries are evicted least-recently-used first once either the entry
+    limit or the approximate memory limit is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 86400.0):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached counts
+            max_bytes: Maximum approximate memory footprint of cached entries
+            ttl_seconds: Time after which an entry is treated as missing
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[int, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(vendor: str, model: str, text: str) -> CacheKey:
+        """Build the cache key for a (vendor, model, text) triple.
+
+        Args:
+            vendor: Vendor name
+            model: Model ID
+            text: Text content
+
+        Returns:
+            Cache key holding the text digest instead of the text
+        """
+        return (vendor, model, text_digest(text))
+
+    def get(self, key: CacheKey) -> Optional[int]:
+        """Look up a cached token count.
+
+        Args:
+            key: Cache key from ``key()``
+
+        Returns:
+            Cached token count, or None on a miss or expired entry
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        count, expires_at, size = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return count
+
+    def put(self, key: CacheKey, count: int) -> None:
+        """Store a token count, evicting old entries if over budget.
+
+        Args:
+            key: Cache key from ``key()``
+            count: Token count to cache
+        """
+        size = _ENTRY_OVERHEAD_BYTES + len(key[0]) + len(key[1]) + len(key[2])
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+
+        self._entries[key] = (count, time.monotonic() + self.ttl_seconds, size)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return current cache counters.
+
+        Returns:
+            Dictionary with entry count, byte usage, limits and hit/miss counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,276 @@
+"""
+Persistent on-disk store for token counts.
+
+Counts are kept in a SQLite database in WAL mode so that every uvicorn
+worker, and every restart, shares the same results. Reads run concurrently
+with writes; writes are buffered and flushed in batches.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.token_cache import CacheKey
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_counts (
+    vendor TEXT NOT NULL,
+    model TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    token_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (vendor, model, digest)
+) WITHOUT ROWID
+"""
+
+_CREATED_INDEX = "CREATE INDEX IF NOT EXISTS idx_token_counts_created ON token_counts (created_at)"
+
+# SQLite limits the number of host parameters per statement; stay well below it
+_MAX_LOOKUP_KEYS = 250
+
+
+class TokenCountStore:
+    """SQLite-backed token count store shared across processes.
+
+    Each thread gets its own connection, so lookups never contend on a
+    shared handle. Writes are buffered in memory and flushed as a single
+    transaction once ``flush_batch_size`` entries are pending or
+    ``flush_interval_seconds`` has passed. When the database grows past
+    ``max_bytes`` the oldest entries are removed and the freed pages are
+    returned to the filesystem.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        flush_batch_size: int = 64,
+        flush_interval_seconds: float = 1.0
+    ):
+        """Open (or create) the store.
+
+        Args:
+            path: Path of the SQLite database file
+            max_bytes: Database size above which old entries are compacted away
+            flush_batch_size: Number of buffered writes that triggers a flush
+            flush_interval_seconds: Maximum age of a buffered write before flushing
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._pending: Dict[CacheKey, int] = {}
+        self._flush_requested = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.compactions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(_SCHEMA)
+        conn.execute(_CREATED_INDEX)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            # auto_vacuum only takes effect before the database file is first written
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _select(self, keys: List[CacheKey]) -> Dict[CacheKey, int]:
+        """Look up keys synchronously on this thread's connection."""
+        conn = self._connection()
+        found: Dict[CacheKey, int] = {}
+        for start in range(0, len(keys), _MAX_LOOKUP_KEYS):
+            chunk = keys[start:start + _MAX_LOOKUP_KEYS]
+            clause = " OR ".join(["(vendor = ? AND model = ? AND digest = ?)"] * len(chunk))
+            params = [part for key in chunk for part in key]
+            rows = conn.execute(
+                f"SELECT vendor, model, digest, token_count FROM token_counts WHERE {clause}",
+                params
+            )
+            for vendor, model, digest, token_count in rows:
+                found[(vendor, model, bytes(digest))] = token_count
+        return found
+
+    async def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, int]:
+        """Look up several token counts at once.
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            Dictionary of the keys that were found to their token counts
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        found = {key: self._pending[key] for key in keys if key in self._pending}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(await asyncio.to_thread(self._select, missing))
+
+        self.reads += len(keys)
+        self.hits += len(found)
+        return found
+
+    def put(self, key: CacheKey, count: int) -> None:
+        """Buffer a token count for the next batched write.
+
+        Args:
+            key: Cache key of the counted text
+            count: Token count to store
+        """
+        self._pending[key] = count
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+        if len(self._pending) >= self.flush_batch_size:
+            self._flush_requested.set()
+
+    async def _flush_loop(self) -> None:
+        """Flush buffered writes once the batch fills or the interval passes."""
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # The batch is back in the buffer; retry on the next round
+                logger.warning("Failed to flush %d token count(s) to %s: %s", len(self._pending), self.path, e)
+
+    def _write(self, rows: List[Tuple[str, str, bytes, int, float]]) -> None:
+        """Write rows in one transaction and compact if over the size limit."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO token_counts (vendor, model, digest, token_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if self._size_bytes(conn) > self.max_bytes:
+            self._compact(conn)
+
+    @staticmethod
+    def _size_bytes(conn: sqlite3.Connection) -> int:
+        """Return the number of bytes used by live database pages."""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def _compact(self, conn: sqlite3.Connection) -> None:
+        """Delete the oldest entries until the store is at 75% of its limit."""
+        total = conn.execute("SELECT COUNT(*) FROM token_counts").fetchone()[0]
+        if total == 0:
+            return
+
+        size = self._size_bytes(conn)
+        target = int(self.max_bytes * 0.75)
+        remove = max(1, int(total * (1 - target / size)))
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM token_counts WHERE created_at <= ("
+                "SELECT created_at FROM token_counts ORDER BY created_at LIMIT 1 OFFSET ?)",
+                (min(remove, total) - 1,)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+
+    async def flush(self) -> None:
+        """Write all buffered counts to disk.
+
+        If the write fails, the batch is returned to the buffer (counts put
+        in the meantime take precedence) so a later flush retries it.
+
+        Raises:
+            sqlite3.Error: If the write fails
+        """
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        rows = [(vendor, model, digest, count, now) for (vendor, model, digest), count in pending.items()]
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except BaseException:
+            pending.update(self._pending)
+            self._pending = pending
+            raise
+        self.writes += len(rows)
+
+    async def close(self) -> None:
+        """Flush buffered writes and close all connections."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_requested.set()
+            await self._flush_task
+        await self.flush()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _live_bytes(self) -> int:
+        """Return the live size of the database through this thread's connection."""
+        return self._size_bytes(self._connection())
+
+    async def stats(self) -> Dict[str, Any]:
+        """Return current store counters.
+
+        The database size is read in a worker thread, since the query may
+        wait on another worker's write lock.
+
+        Returns:
+            Dictionary with database size, pending writes and read/write counters
+        """
+        size = await asyncio.to_thread(self._live_bytes)
+        return {
+            "path": self.path,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "pending_writes": len(self._pending),
+            "reads": self.reads,
+            "hits": self.hits,
+            "writes": self.writes,
+            "compactions": self.compactions,
+        }
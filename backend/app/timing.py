@@ -0,0 +1,195 @@
+"""
+Per-request phase timings reported in a ``Server-Timing`` header.
+
+``TimingMiddleware`` starts a ``RequestTimings`` for each request. Routes
+built with ``TimedRoute`` split the handler into phases:
+
+- ``read``: receiving the request body
+- ``parse``: decoding the JSON body
+- ``validate``: dependency resolution and pydantic validation
+- ``handler``: the endpoint itself, excluding upstream calls
+- ``upstream``: one entry per upstream count made by the endpoint
+- ``encode``: response model validation and JSON encoding, unless the
+  endpoint returned an already encoded response
+
+plus ``total`` for the whole request up to the response start. When no
+timings are active every hook is a single context variable lookup.
+"""
+
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Callable, Coroutine, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.profiling import SlowRequestProfiler
+
+# Upstream calls listed individually; later ones are summed into one entry
+_MAX_UPSTREAM_ENTRIES = 16
+
+_JSON_CONTENT_TYPES = ("application/json",)
+
+
+class RequestTimings:
+    """Phase durations of one request."""
+
+    __slots__ = ("start", "phases", "endpoint_start", "endpoint_end", "upstream_ms", "upstream_entries", "extra_upstream")
+
+    def __init__(self):
+        """Start timing a request."""
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float, Optional[str]]] = []
+        self.endpoint_start = 0.0
+        self.endpoint_end = 0.0
+        self.upstream_ms = 0.0
+        self.upstream_entries = 0
+        self.extra_upstream: List[float] = []
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None) -> None:
+        """Record a phase duration."""
+        self.phases.append((name, seconds * 1000, description))
+
+    def add_upstream(self, seconds: float, description: str) -> None:
+        """Record one upstream call."""
+        milliseconds = seconds * 1000
+        self.upstream_ms += milliseconds
+        if self.upstream_entries < _MAX_UPSTREAM_ENTRIES:
+            self.upstream_entries += 1
+            self.phases.append(("upstream", milliseconds, description))
+        else:
+            self.extra_upstream.append(milliseconds)
+
+    def header(self) -> str:
+        """Render the Server-Timing header value, ending with the total so far."""
+        entries = []
+        for name, milliseconds, description in self.phases:
+            entry = name
+            if description:
+                escaped = description.replace("\\", "\\\\").replace('"', '\\"')
+                entry += f';desc="{escaped}"'
+            entries.append(f"{entry};dur={milliseconds:.3f}")
+        if self.extra_upstream:
+            entries.append(
+                f'upstream;desc="{len(self.extra_upstream)} more";dur={sum(self.extra_upstream):.3f}'
+            )
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def record_upstream(seconds: float, description: str) -> None:
+    """Record an upstream call against the current request, if it is being timed."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add_upstream(seconds, description)
+
+
+def _timed_endpoint(call: Callable[..., Coroutine[Any, Any, Any]]) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """Wrap an async endpoint so its start and end are recorded."""
+    @functools.wraps(call)
+    async def endpoint(*args: Any, **kwargs: Any) -> Any:
+        timings = _current.get()
+        if timings is None:
+            return await call(*args, **kwargs)
+        timings.endpoint_start = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            timings.endpoint_end = time.perf_counter()
+
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """APIRoute recording read, parse, validate, handler and encode phases."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        if inspect.iscoroutinefunction(call):
+            self.dependant.call = _timed_endpoint(call)
+        handler = super().get_route_handler()
+        has_body = self.body_field is not None
+
+        async def timed_handler(request: Request) -> Response:
+            timings = _current.get()
+            if timings is None:
+                return await handler(request)
+
+            if has_body:
+                # Read and decode ahead of FastAPI, which reuses the cached body and JSON
+                mark = time.perf_counter()
+                body = await request.body()
+                timings.add("read", time.perf_counter() - mark)
+                content_type = request.headers.get("content-type", "application/json")
+                if body and content_type.split(";")[0].strip() in _JSON_CONTENT_TYPES:
+                    mark = time.perf_counter()
+                    try:
+                        await request.json()
+                    except ValueError:
+                        # FastAPI reports the decode error itself
+                        pass
+                    timings.add("parse", time.perf_counter() - mark)
+
+            mark = time.perf_counter()
+            position = len(timings.phases)
+            upstream_before = timings.upstream_ms
+            response = await handler(request)
+            done = time.perf_counter()
+
+            if timings.endpoint_start:
+                # Keep phases in order: validation precedes the endpoint's upstream calls
+                timings.phases.insert(position, ("validate", (timings.endpoint_start - mark) * 1000, None))
+                endpoint = timings.endpoint_end - timings.endpoint_start
+                upstream = (timings.upstream_ms - upstream_before) / 1000
+                # Concurrent upstream calls can add up to more than the endpoint's wall time
+                timings.add("handler", max(endpoint - upstream, 0.0))
+                timings.add("encode", done - timings.endpoint_end)
+            else:
+                timings.add("validate", done - mark)
+            return response
+
+        return timed_handler
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware adding Server-Timing headers and profiling slow requests.
+
+    Args:
+        app: Wrapped application
+        server_timing: Whether to emit the Server-Timing header
+        profiler: Optional slow request profiler
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.server_timing = server_timing
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        session = self.profiler.begin() if self.profiler is not None else None
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if session is not None:
+                self.profiler.end(session, scope, time.perf_counter() - timings.start)
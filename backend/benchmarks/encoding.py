@@ -0,0 +1,141 @@
+"""
+Micro-benchmark of response encoding on the token counting hot routes.
+
+Measures the CPU time needed to turn an already built response model into
+a response with its body, on three paths:
+
+- ``fastapi``: FastAPI's default handling of a returned model: validated
+  again against ``response_model``, dumped to Python objects and encoded
+  by ``JSONResponse``
+- ``fastapi+orjson``: the same with ``ORJSONResponse`` as the encoder
+- ``direct``: ``app.encoding.model_response``, serializing the model once
+  with pydantic-core; for the model catalog, the entry's cached bytes
+
+Run from the backend directory::
+
+    python -m benchmarks.encoding
+    python -m benchmarks.encoding --iterations 20000 --formats 16 --models 100
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.routing import APIRoute, serialize_response
+from pydantic import BaseModel
+
+from app.encoding import json_bytes_response, model_response
+from app.models import ModelInfo, ModelsResponse, TokenCountBatchResponse, TokenCountResponse
+from app.services.model_catalog import CatalogEntry
+
+Encoder = Callable[[], Awaitable[Response]]
+
+
+def build_payloads(formats: int, models: int) -> Dict[str, BaseModel]:
+    """Representative response models for each hot route."""
+    names = [f"format_{index}" for index in range(formats)]
+    return {
+        "counttokens": TokenCountResponse(vendor="anthropic", model="claude-sonnet-4-5-20250929", token_count=1234),
+        "counttokens/batch": TokenCountBatchResponse(
+            vendor="anthropic",
+            model="claude-sonnet-4-5-20250929",
+            token_counts={name: 1000 + index for index, name in enumerate(names)},
+            latencies_ms={name: 41.5 + index for index, name in enumerate(names)},
+            exact={name: True for name in names}
+        ),
+        "models": ModelsResponse(
+            vendor="google",
+            models=[
+                ModelInfo(
+                    id=f"gemini-model-{index}",
+                    display_name=f"Gemini Model {index}",
+                    created_at="2025-06-17T00:00:00Z"
+                )
+                for index in range(models)
+            ]
+        ),
+    }
+
+
+def build_encoders(route: str, model: BaseModel) -> Dict[str, Encoder]:
+    """Encoding paths for one route's response model, keyed by name."""
+    field = APIRoute("/", lambda: None, response_model=type(model)).response_field
+
+    def via_fastapi(response_class: type) -> Encoder:
+        async def encode() -> Response:
+            return response_class(await serialize_response(field=field, response_content=model))
+        return encode
+
+    if route == "models":
+        body = CatalogEntry(model, fetched_at=0.0).body
+
+        async def direct() -> Response:
+            return json_bytes_response(body)
+    else:
+        async def direct() -> Response:
+            return model_response(model)
+
+    return {
+        "fastapi": via_fastapi(JSONResponse),
+        "fastapi+orjson": via_fastapi(ORJSONResponse),
+        "direct": direct,
+    }
+
+
+async def measure(encode: Encoder, iterations: int) -> float:
+    """CPU microseconds per call of an encoder."""
+    for _ in range(min(iterations, 100)):
+        await encode()
+    start = time.process_time()
+    for _ in range(iterations):
+        await encode()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, object]]:
+    """Measure every encoding path for every route."""
+    results = []
+    for route, model in build_payloads(args.formats, args.models).items():
+        encoders = build_encoders(route, model)
+        bodies = {name: (await encode()).body for name, encode in encoders.items()}
+        if len(set(bodies.values())) != 1:
+            raise SystemExit(f"{route}: encoding paths disagree on the response body")
+        for name, encode in encoders.items():
+            results.append({
+                "route": route,
+                "path": name,
+                "bytes": len(bodies[name]),
+                "cpu_us": await measure(encode, args.iterations),
+            })
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000, help="Encodings measured per path")
+    parser.add_argument("--formats", type=int, default=8, help="Texts in the batch response")
+    parser.add_argument("--models", type=int, default=50, help="Models in the catalog response")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the micro-benchmark from the command line."""
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    print(f"{'route':<20}{'path':<16}{'bytes':>8}{'cpu us':>10}{'saved':>10}")
+    baseline: Dict[str, float] = {}
+    for result in results:
+        baseline.setdefault(result["route"], result["cpu_us"])
+        saved = baseline[result["route"]] - result["cpu_us"]
+        print(
+            f"{result['route']:<20}{result['path']:<16}{result['bytes']:>8}"
+            f"{result['cpu_us']:>10.2f}{saved:>+10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
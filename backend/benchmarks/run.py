@@ -0,0 +1,350 @@
+"""
+Load and latency benchmark of the token counting API.
+
+Starts the simulated vendor backend (``benchmarks.simulator``) in a
+subprocess, points the Anthropic and Google services at it and drives the
+real FastAPI application in-process at several concurrency levels. Each
+scenario reports throughput, latency percentiles, errors by status and
+CPU time per request; results are written as JSON so runs can be diffed
+with ``--baseline``.
+
+Run from the backend directory::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --env HEDGING_ENABLED=true
+
+CPU time covers this process, i.e. the application plus the in-process
+load generator; the simulator runs in its own process and is excluded.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SCENARIOS = ("single", "batch", "packed", "models")
+VENDOR_MODELS = {
+    "anthropic": "claude-sonnet-4-5-20250929",
+    "google": "gemini-2.5-flash",
+}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    """Commit of the benchmarked tree, marked dirty when it has local changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--", "."], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def start_simulator(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    """Start the simulated vendor backend and wait until it accepts requests."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.simulator",
+            "--port", str(port),
+            "--latency-ms", str(args.latency_ms),
+            "--latency-sigma", str(args.latency_sigma),
+            "--error-rate", str(args.error_rate),
+            "--rate-limit-rate", str(args.rate_limit_rate),
+            "--seed", str(args.seed),
+        ],
+        cwd=BACKEND_DIR
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Simulator exited with status {process.returncode}")
+        try:
+            httpx.head(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Simulator did not start within 15 seconds")
+
+
+def configure_environment(simulator_url: str, overrides: List[str]) -> None:
+    """Point the application at the simulator; must run before ``app`` is imported."""
+    os.environ.update({
+        "ANTHROPIC_API_KEY": "benchmark",
+        "GOOGLE_API_KEY": "benchmark",
+        "ANTHROPIC_BASE_URL": simulator_url,
+        "GOOGLE_BASE_URL": simulator_url + "/",
+        # Keep runs independent of any persistent state on the machine
+        "TOKEN_STORE_PATH": "",
+        "ESTIMATOR_STATE_PATH": "",
+        "PROFILE_SLOW_REQUESTS": "false",
+    })
+    for override in overrides:
+        key, _, value = override.partition("=")
+        os.environ[key] = value
+
+
+class Scenario:
+    """One benchmarked request shape against one vendor."""
+
+    def __init__(self, name: str, vendor: str, text_bytes: int, batch_size: int):
+        """Describe a scenario.
+
+        Args:
+            name: "single", "batch", "packed" (a batch in packed mode) or "models"
+            vendor: Vendor the requests target
+            text_bytes: Approximate size of each counted text
+            batch_size: Texts per batch request
+        """
+        self.name = name
+        self.vendor = vendor
+        self.text_bytes = text_bytes
+        self.batch_size = batch_size
+        self.model = VENDOR_MODELS[vendor]
+
+    def _text(self, key: str) -> str:
+        """A text unique to the scenario and ``key`` so no request is served from the token cache."""
+        prefix = f"{self.name} {key} "
+        filler = '{"id": 1, "name": "benchmark", "tags": ["a", "b"]} '
+        return prefix + filler * max(1, (self.text_bytes - len(prefix)) // len(filler))
+
+    def request(self, client: httpx.AsyncClient, key: str):
+        """Build the request coroutine for the ``key``-th request."""
+        if self.name == "single":
+            return client.post(
+                f"/api/v1/{self.vendor}/counttokens",
+                json={"text": self._text(key), "model": self.model}
+            )
+        if self.name in ("batch", "packed"):
+            texts = {f"text{index}": self._text(f"{key}-{index}") for index in range(self.batch_size)}
+            body = {"texts": texts, "model": self.model}
+            if self.name == "packed":
+                body["mode"] = "packed"
+            return client.post(f"/api/v1/{self.vendor}/counttokens/batch", json=body)
+        return client.get(f"/api/v1/{self.vendor}/models")
+
+
+async def simulator_requests() -> int:
+    """Requests the simulator has served so far."""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(os.environ["ANTHROPIC_BASE_URL"].rstrip("/") + "/stats")
+        return response.json()["requests"]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    requests: int,
+    run_id: str
+) -> Dict[str, Any]:
+    """Send ``requests`` requests with ``concurrency`` workers and summarize them."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(client, f"{run_id}-{concurrency}-{index}")
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    upstream_start = await simulator_requests()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    upstream = await simulator_requests() - upstream_start
+
+    latencies.sort()
+    ok = statuses.get("200", 0)
+    return {
+        "scenario": scenario.name,
+        "vendor": scenario.vendor,
+        "concurrency": concurrency,
+        "requests": requests,
+        "duration_seconds": round(wall, 4),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "success_rate": round(ok / requests, 4) if requests else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "cpu_ms_per_request": round(cpu / requests * 1000, 4) if requests else 0.0,
+        "upstream_per_request": round(upstream / requests, 3) if requests else 0.0,
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Run every scenario, vendor and concurrency level against the application."""
+    # Imported late: settings are read from the environment at import time
+    from app.main import app
+
+    results: List[Dict[str, Any]] = []
+    run_id = f"{time.time_ns():x}"
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            for name in args.scenarios:
+                for vendor in args.vendors:
+                    scenario = Scenario(name, vendor, args.text_bytes, args.batch_size)
+                    await run_level(client, scenario, min(4, args.warmup), args.warmup, f"{run_id}-warmup")
+                    for concurrency in args.concurrency:
+                        result = await run_level(client, scenario, concurrency, args.requests, run_id)
+                        results.append(result)
+                        print(format_row(result), flush=True)
+    return results
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str, int]:
+    """Identity of a result across runs."""
+    return result["scenario"], result["vendor"], result["concurrency"]
+
+
+def format_row(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """One table row, with relative changes against a baseline result if given."""
+    latency = result["latency_ms"]
+
+    def cell(value: float, get: Callable[[Dict[str, Any]], float], width: int) -> str:
+        text = f"{value:.1f}" if value < 1000 else f"{value:.0f}"
+        if baseline is not None:
+            before = get(baseline)
+            if before:
+                text += f" ({(value - before) / before * 100:+.0f}%)"
+        return text.rjust(width)
+
+    return (
+        f"{result['scenario']:<7} {result['vendor']:<10} c={result['concurrency']:<4}"
+        f"{cell(result['throughput_rps'], lambda r: r['throughput_rps'], 16)} rps"
+        f"{cell(latency['p50'], lambda r: r['latency_ms']['p50'], 16)}"
+        f"{cell(latency['p95'], lambda r: r['latency_ms']['p95'], 16)}"
+        f"{cell(latency['p99'], lambda r: r['latency_ms']['p99'], 16)} ms"
+        f"{cell(result['cpu_ms_per_request'], lambda r: r['cpu_ms_per_request'], 15)} cpu-ms"
+        f"  ok={result['success_rate']:.0%}  upstream/req={result.get('upstream_per_request', 0):.2f}"
+    )
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Print the results next to the matching results of a previous run."""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    previous = {result_key(result): result for result in baseline.get("results", [])}
+    print(f"\nCompared with {baseline_path} ({baseline.get('meta', {}).get('git_commit')}):")
+    print(f"{'':<27}{'throughput':>16}    {'p50':>16}{'p95':>16}{'p99':>16}    {'cpu/request':>15}")
+    for result in results:
+        print(format_row(result, previous.get(result_key(result))))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    def integers(value: str) -> List[int]:
+        return [int(part) for part in value.split(",") if part]
+
+    def choices(allowed):
+        def parse(value: str) -> List[str]:
+            parts = [part for part in value.split(",") if part]
+            unknown = set(parts) - set(allowed)
+            if unknown:
+                raise argparse.ArgumentTypeError(f"unknown value(s): {', '.join(sorted(unknown))}")
+            return parts
+        return parse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=choices(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--vendors", type=choices(VENDOR_MODELS), default=list(VENDOR_MODELS))
+    parser.add_argument("--concurrency", type=integers, default=[1, 8, 32], help="Comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--text-bytes", type=int, default=2048, help="Size of each counted text")
+    parser.add_argument("--batch-size", type=int, default=10, help="Texts per batch request")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median simulated vendor latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal shape of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of simulated 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of simulated 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Simulator random seed")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="KEY=VALUE",
+        help="Application setting override, e.g. HEDGING_ENABLED=true (repeatable)"
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare with a previous JSON result")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark suite from the command line."""
+    args = parse_args(argv)
+    port = free_port()
+    simulator = start_simulator(args, port)
+    try:
+        configure_environment(f"http://127.0.0.1:{port}", args.env)
+        results = asyncio.run(run_benchmarks(args))
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
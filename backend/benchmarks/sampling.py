@@ -0,0 +1,177 @@
+"""
+Accuracy and cost benchmark of sampled batch counting.
+
+Generates arrays of synthetic records of increasing length, converts each
+into every format and counts it through the real FastAPI application twice:
+exactly (``"mode": "exact"``) and sampled (``"mode": "sampled"``, only the
+JSON text sent). For each size it reports both wall times, the texts the
+sampled request counted, and per format the relative error of the sampled
+total and whether the exact count lies inside its 95% interval.
+
+Run from the backend directory::
+
+    python -m benchmarks.sampling
+    python -m benchmarks.sampling --vendor anthropic --records 10000,100000 --target-error 0.02
+
+OpenAI is counted locally, so the default run needs no simulator; Anthropic
+and Google are served by ``benchmarks.simulator``, whose counts are a
+quarter of the text length rounded down. Its intervals are therefore very
+narrow, and the rounding of each sample text shows as a small bias.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.run import configure_environment, free_port, git_commit, start_simulator
+from benchmarks.run import parse_args as parse_run_args
+from benchmarks.startup import VENDOR_MODELS
+
+WORDS = ("alpha", "beta", "gamma", "delta", "kappa", "sigma", "omega", "lorem ipsum", "dolor", "amet")
+
+
+def make_document(records: int, seed: int) -> Dict[str, Any]:
+    """A document holding one array of uniform records whose sizes drift along the array."""
+    rng = random.Random(seed)
+    users = []
+    for index in range(records):
+        tag_words = rng.randint(0, 6 if index < records // 2 else 12)
+        users.append({
+            "id": index,
+            "name": f"{rng.choice(WORDS)} {rng.randint(0, 10 ** rng.randint(1, 6))}",
+            "score": round(rng.random() * 100, rng.randint(0, 4)),
+            "active": rng.random() < 0.5,
+            "tags": " ".join(rng.choice(WORDS) for _ in range(tag_words)),
+        })
+    return {"meta": {"source": "benchmark", "records": records}, "users": users}
+
+
+async def measure(client: httpx.AsyncClient, vendor: str, records: int, target_error: float, seed: int) -> Dict[str, Any]:
+    """Count one generated document exactly and sampled."""
+    from app.services.conversion import convert_all
+
+    texts = convert_all(make_document(records, seed))
+    url = f"/api/v1/{vendor}/counttokens/batch"
+    model = VENDOR_MODELS[vendor]
+
+    start = time.perf_counter()
+    response = await client.post(url, json={"texts": texts, "model": model})
+    response.raise_for_status()
+    exact_seconds = time.perf_counter() - start
+    exact = response.json()["token_counts"]
+
+    sampled_texts = {name: (text if name == "json" else "") for name, text in texts.items()}
+    start = time.perf_counter()
+    response = await client.post(
+        url, json={"texts": sampled_texts, "model": model, "mode": "sampled", "target_error": target_error}
+    )
+    response.raise_for_status()
+    sampled_seconds = time.perf_counter() - start
+    sampled = response.json()
+
+    formats = {}
+    for name, count in exact.items():
+        low, high = sampled["confidence_intervals"][name]
+        formats[name] = {
+            "exact": count,
+            "sampled": sampled["token_counts"][name],
+            "error_pct": round(100 * (sampled["token_counts"][name] - count) / count, 3),
+            "covered": low <= count <= high,
+        }
+    return {
+        "records": records,
+        "json_mb": round(len(texts["json"]) / 1e6, 1),
+        "exact_s": round(exact_seconds, 3),
+        "sampled_s": round(sampled_seconds, 3),
+        "sample": sampled["sample"],
+        "formats": formats,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Measure every requested size against the in-process application."""
+    # Imported late: settings are read from the environment at import time
+    from app.main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for records in args.records:
+                result = await measure(client, args.vendor, records, args.target_error, args.seed)
+                results.append(result)
+                sample = result["sample"]
+                worst = max(abs(entry["error_pct"]) for entry in result["formats"].values())
+                covered = sum(entry["covered"] for entry in result["formats"].values())
+                print(
+                    f"{records:>9} records {result['json_mb']:>7.1f} MB  exact {result['exact_s']:>8.2f}s  "
+                    f"sampled {result['sampled_s']:>6.2f}s  texts={sample['upstream_texts']:<4} "
+                    f"sampled_records={sample['sampled_records']:<5} max|error|={worst:.2f}%  "
+                    f"covered={covered}/{len(result['formats'])}",
+                    flush=True
+                )
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vendor", choices=sorted(VENDOR_MODELS), default="openai")
+    parser.add_argument(
+        "--records",
+        type=lambda value: [int(part) for part in value.split(",") if part],
+        default=[10_000, 50_000, 200_000],
+        help="Comma-separated array lengths"
+    )
+    parser.add_argument("--target-error", type=float, default=0.01, help="Requested relative half-width")
+    parser.add_argument("--seed", type=int, default=0, help="Document generator seed")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated vendor latency")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="KEY=VALUE",
+        help="Application setting override, e.g. SAMPLED_MAX_RECORDS=2000 (repeatable)"
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the sampling benchmark from the command line."""
+    args = parse_args(argv)
+    port = free_port()
+    simulator = None
+    if args.vendor != "openai":
+        simulator = start_simulator(parse_run_args(["--latency-ms", str(args.latency_ms)]), port)
+    try:
+        configure_environment(f"http://127.0.0.1:{port}", [f"ENABLED_VENDORS={args.vendor}", *args.env])
+        results = asyncio.run(run(args))
+    finally:
+        if simulator is not None:
+            simulator.terminate()
+            simulator.wait()
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "config": {key: value for key, value in vars(args).items() if key != "output"},
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Simulated Anthropic and Google token counting APIs.
+
+Serves the endpoints the vendor SDKs call (token counting and model
+listing) with configurable latency distributions, error rates and rate
+limiting, so benchmarks exercise the real request path without vendor
+quotas or network variance.
+
+Run standalone with ``python -m benchmarks.simulator --port 8900``.
+"""
+
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+ANTHROPIC_MODELS = ("claude-sonnet-4-5-20250929", "claude-haiku-4-5-20251001", "claude-opus-4-1-20250805")
+GOOGLE_MODELS = ("gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite")
+
+
+class SimulatorConfig:
+    """Behavior of the simulated vendor APIs."""
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_ms: float = 200.0,
+        seed: int = 0
+    ):
+        """Configure the simulator.
+
+        Args:
+            latency_ms: Median response latency in milliseconds
+            latency_sigma: Log-normal shape; 0 gives a constant latency, larger
+                values a heavier tail
+            error_rate: Fraction of count requests failing with a 500
+            rate_limit_rate: Fraction of count requests failing with a 429
+            retry_after_ms: Retry delay advertised on 429 responses
+            seed: Random seed for reproducible runs
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self.random = random.Random(seed)
+
+    def latency(self) -> float:
+        """Draw one response latency in seconds."""
+        return self.latency_ms / 1000 * self.random.lognormvariate(0.0, self.latency_sigma)
+
+    def failure(self) -> Optional[Response]:
+        """Draw a failure response, or None for success."""
+        draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}},
+                status_code=429,
+                headers={"retry-after-ms": str(int(self.retry_after_ms))}
+            )
+        if draw < self.rate_limit_rate + self.error_rate:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "api_error", "message": "Simulated failure"}},
+                status_code=500
+            )
+        return None
+
+
+def count(text: str) -> int:
+    """Deterministic stand-in for a tokenizer: about four bytes per token."""
+    return max(1, len(text.encode("utf-8")) // 4)
+
+
+def create_app(config: SimulatorConfig) -> FastAPI:
+    """Build the simulator application.
+
+    Args:
+        config: Simulated latency and failure behavior
+
+    Returns:
+        FastAPI application serving Anthropic and Google endpoints
+    """
+    app = FastAPI(openapi_url=None)
+    stats: Dict[str, int] = {"requests": 0, "rate_limited": 0, "errors": 0}
+
+    async def respond(payload: Dict[str, Any]) -> Response:
+        stats["requests"] += 1
+        await asyncio.sleep(config.latency())
+        failure = config.failure()
+        if failure is not None:
+            stats["rate_limited" if failure.status_code == 429 else "errors"] += 1
+            return failure
+        return JSONResponse(payload)
+
+    @app.head("/")
+    async def warm() -> Response:
+        return Response()
+
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, int]:
+        return stats
+
+    @app.post("/v1/messages/count_tokens")
+    async def anthropic_count(request: Request) -> Response:
+        body = await request.json()
+        # Content is a string or a list of blocks, each tokenized on its own
+        tokens = 7
+        for message in body["messages"]:
+            content = message["content"]
+            blocks = [content] if isinstance(content, str) else [block.get("text", "") for block in content]
+            tokens += sum(count(block) for block in blocks)
+        return await respond({"input_tokens": tokens})
+
+    @app.get("/v1/models")
+    async def anthropic_models() -> Response:
+        await asyncio.sleep(config.latency())
+        data = [
+            {"type": "model", "id": model, "display_name": model, "created_at": "2025-01-01T00:00:00Z"}
+            for model in ANTHROPIC_MODELS
+        ]
+        return JSONResponse({"data": data, "has_more": False, "first_id": data[0]["id"], "last_id": data[-1]["id"]})
+
+    @app.post("/{version}/models/{model}:countTokens")
+    async def google_count(version: str, model: str, request: Request) -> Response:
+        body = await request.json()
+        parts = [part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])]
+        return await respond({"totalTokens": sum(count(part) for part in parts)})
+
+    @app.get("/{version}/models")
+    async def google_models(version: str) -> Response:
+        await asyncio.sleep(config.latency())
+        return JSONResponse({"models": [
+            {"name": f"models/{model}", "displayName": model, "supportedGenerationMethods": ["generateContent", "countTokens"]}
+            for model in GOOGLE_MODELS
+        ]})
+
+    return app
+
+
+def main() -> None:
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal shape of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after-ms", type=float, default=200.0, help="Retry delay sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_ms=args.retry_after_ms,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Import-time and cold start benchmark of the token counting API.
+
+Each run uses fresh processes, as an autoscaled container would:
+
+- ``import``: time to ``import app.main`` in a new interpreter
+- ``ready``: time from launching uvicorn until ``/health`` answers 200
+- ``first <vendor>``: time from launch until the first count for each
+  vendor succeeds, counted right after readiness (remote vendors are
+  served by the simulated backend of ``benchmarks.simulator``)
+
+Run from the backend directory::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --env ENABLED_VENDORS=anthropic --vendors anthropic
+
+``--backend-dir`` points at another checkout, e.g. a ``git worktree`` of an
+older commit, to compare against it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.run import BACKEND_DIR, configure_environment, free_port, git_commit, start_simulator
+from benchmarks.run import parse_args as parse_run_args
+
+VENDOR_MODELS = {
+    "anthropic": "claude-sonnet-4-5-20250929",
+    "google": "gemini-2.5-flash",
+    "openai": "gpt-4o",
+}
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(backend_dir: str) -> float:
+    """Seconds to import the application in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_server(backend_dir: str, vendors: List[str], timeout: float) -> Dict[str, float]:
+    """Seconds from launching uvicorn until readiness and until each vendor's first count."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir
+    )
+    timings: Dict[str, float] = {}
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            deadline = start + timeout
+            while "ready" not in timings:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with status {process.returncode}")
+                if time.perf_counter() > deadline:
+                    raise RuntimeError(f"Server was not ready within {timeout} seconds")
+                try:
+                    if client.get("/health").status_code == 200:
+                        timings["ready"] = time.perf_counter() - start
+                except httpx.TransportError:
+                    time.sleep(0.005)
+
+            for vendor in vendors:
+                response = client.post(
+                    f"/api/v1/{vendor}/counttokens",
+                    json={"text": "cold start", "model": VENDOR_MODELS[vendor]}
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"First {vendor} count failed: {response.status_code} {response.text}")
+                timings[f"first {vendor}"] = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return timings
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Median, minimum and maximum in milliseconds of each measurement."""
+    return {
+        name: {
+            "median_ms": round(statistics.median(values) * 1000, 1),
+            "min_ms": round(min(values) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+        for name, values in samples.items()
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument(
+        "--vendors",
+        type=lambda value: [vendor.strip() for vendor in value.split(",") if vendor.strip()],
+        default=list(VENDOR_MODELS),
+        help="Comma-separated vendors whose first count is timed"
+    )
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated vendor latency")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each server")
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="Checkout whose application is measured")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="Application setting override, e.g. ENABLED_VENDORS=openai (repeatable)"
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the startup benchmark from the command line."""
+    args = parse_args(argv)
+    unknown = sorted(set(args.vendors) - VENDOR_MODELS.keys())
+    if unknown:
+        raise SystemExit(f"Unknown vendor(s): {', '.join(unknown)}")
+
+    port = free_port()
+    simulator = start_simulator(parse_run_args(["--latency-ms", str(args.latency_ms), "--latency-sigma", "0"]), port)
+    samples: Dict[str, List[float]] = {}
+    try:
+        # Servers inherit the environment pointing them at the simulator
+        configure_environment(f"http://127.0.0.1:{port}", args.env)
+        for _ in range(args.runs):
+            samples.setdefault("import", []).append(measure_import(args.backend_dir))
+            for name, seconds in measure_server(args.backend_dir, args.vendors, args.timeout).items():
+                samples.setdefault(name, []).append(seconds)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
+    results = summarize(samples)
+    print(f"{'measurement':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<18}{result['median_ms']:>12.1f}{result['min_ms']:>10.1f}{result['max_ms']:>10.1f}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "config": {key: value for key, value in vars(args).items() if key != "output"},
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Regression tests: bulk summaries track a bounded number of formats.
+
+Format names come from the client, so a stream using ever new names must
+not grow the per-format histograms without bound.
+"""
+
+import asyncio
+import json
+
+from app.services.bulk import count_ndjson
+from app.services.openai_service import OpenAIService
+
+
+async def _chunks(lines):
+    for line in lines:
+        yield (json.dumps(line) + "\n").encode()
+
+
+async def _count(lines, max_formats):
+    output = [
+        json.loads(line)
+        async for line in count_ndjson(OpenAIService(), _chunks(lines), concurrency=1, max_formats=max_formats)
+    ]
+    return output[:-1], output[-1]["summary"]
+
+
+def test_format_names_beyond_the_limit_are_rejected():
+    lines = [{"texts": {f"format {i}": "hello world"}, "model": "gpt-4o"} for i in range(10)]
+    lines.append({"texts": {"format 0": "hello", "format 2": "world"}, "model": "gpt-4o"})
+
+    results, summary = asyncio.run(_count(lines, max_formats=3))
+
+    by_line = {result["line"]: result for result in results}
+    assert all("token_counts" in by_line[line] for line in (1, 2, 3, 11))
+    for line in range(4, 11):
+        assert by_line[line]["error"]["status_code"] == 400
+    assert sorted(summary["formats"]) == ["format 0", "format 1", "format 2"]
+    assert summary["records"] == 11
+    assert summary["failed"] == 7
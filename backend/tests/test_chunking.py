@@ -0,0 +1,58 @@
+"""
+Regression tests: chunk boundaries never change the total token count.
+
+A boundary before a line of only whitespace splits a newline piece the
+byte-pair pre-tokenizers would keep whole, so the chunk counts no longer
+add up to the count of the whole text.
+"""
+
+import pytest
+
+from app.services.bpe import get_encoding
+from app.services.chunking import SAFE_BOUNDARY, Chunker
+
+TEXTS = {
+    "blank_line": "a\n \nb\n",
+    "tab_line": "x\n\t\n y\n",
+    "crlf": "a\r\n \r\nb\r\n",
+    "crlf_nested": "k: v\r\n  \r\n  w: 1\r\n",
+}
+
+
+def test_no_boundary_before_whitespace_only_line():
+    starts = [match.start() for match in SAFE_BOUNDARY.finditer("a\n \nb")]
+    assert 2 not in starts
+    assert 4 in starts
+
+
+@pytest.mark.parametrize("encoding", ["o200k_base", "cl100k_base"])
+@pytest.mark.parametrize("name", sorted(TEXTS))
+def test_chunk_counts_sum_to_whole(name, encoding):
+    text = TEXTS[name] * 300
+    chunks, safe = Chunker(min_chars=8, max_chars=64, mask_bits=0).split(text)
+
+    assert safe
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    bpe = get_encoding(encoding)
+    assert sum(bpe.count(chunk) for chunk in chunks) == bpe.count(text)
+
+
+def test_no_boundary_before_slash_after_punctuation():
+    # o200k_base reads ":\n//" as one piece
+    starts = [match.start() for match in SAFE_BOUNDARY.finditer("url: http:\n//x\nb\n/c")]
+    assert 11 not in starts
+    assert 17 in starts
+
+
+@pytest.mark.parametrize("text", [
+    "url: http:\n//x\n" * 300,
+    "".join(f"line {i};\n// comment {i}\n" for i in range(2000)),
+    "a = 1;\r\n//\r\n/* b */\r\n" * 300,
+], ids=["url", "comments", "crlf_comments"])
+def test_o200k_chunk_counts_sum_to_whole(text):
+    chunks, safe = Chunker(min_chars=8, max_chars=64, mask_bits=0).split(text)
+
+    assert safe
+    bpe = get_encoding("o200k_base")
+    assert sum(bpe.count(chunk) for chunk in chunks) == bpe.count(text)
@@ -0,0 +1,100 @@
+"""
+Regression tests: concurrent counts on one event loop overlap.
+
+The vendor services must use the SDKs' async clients, so N concurrent
+``count_tokens`` calls against an upstream with a fixed latency finish in
+about one latency rather than N, and the event loop keeps serving other
+work while they are in flight.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.anthropic_service import AnthropicService
+from app.services.google_service import GoogleService
+
+LATENCY = 0.2
+CONCURRENT = 10
+
+
+class FakeAnthropicClient:
+    """Async stand-in for AsyncAnthropic whose counts take ``LATENCY`` seconds."""
+
+    def __init__(self):
+        self.messages = SimpleNamespace(count_tokens=self._count_tokens)
+
+    async def _count_tokens(self, model, messages):
+        await asyncio.sleep(LATENCY)
+        return SimpleNamespace(input_tokens=len(messages[0]["content"]))
+
+    async def close(self):
+        pass
+
+
+class FakeGoogleClient:
+    """Async stand-in for genai.Client whose counts take ``LATENCY`` seconds."""
+
+    def __init__(self):
+        self.aio = SimpleNamespace(models=SimpleNamespace(count_tokens=self._count_tokens), aclose=self._aclose)
+
+    async def _count_tokens(self, model, contents):
+        await asyncio.sleep(LATENCY)
+        return SimpleNamespace(total_tokens=len(str(contents)))
+
+    async def _aclose(self):
+        pass
+
+
+def _anthropic() -> AnthropicService:
+    service = AnthropicService(api_key="test")
+    service.client = FakeAnthropicClient()
+    return service
+
+
+def _google() -> GoogleService:
+    service = GoogleService(api_key="test")
+    service.client = FakeGoogleClient()
+    return service
+
+
+async def _count_concurrently(service):
+    """Run ``CONCURRENT`` distinct counts while measuring the event loop's largest stall."""
+    stalls = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    try:
+        counts = await asyncio.gather(*(
+            service.count_tokens(text=f"text number {index}", model="test-model")
+            for index in range(CONCURRENT)
+        ))
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticker
+        await service.close()
+    return counts, elapsed, max(stalls)
+
+
+@pytest.mark.parametrize("factory", [_anthropic, _google], ids=["anthropic", "google"])
+def test_concurrent_counts_overlap(factory):
+    counts, elapsed, longest_stall = asyncio.run(_count_concurrently(factory()))
+
+    assert len(counts) == CONCURRENT
+    assert all(count > 0 for count in counts)
+    # Serialized calls would take CONCURRENT * LATENCY
+    assert elapsed < 2 * LATENCY
+    # The loop kept running other tasks while the counts were in flight
+    assert longest_stall < LATENCY / 2
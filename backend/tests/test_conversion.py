@@ -0,0 +1,30 @@
+"""
+Regression tests: integers past JavaScript's safe range print as doubles.
+
+The frontend parses documents with ``JSON.parse``, so an integer beyond
+``Number.MAX_SAFE_INTEGER`` is a double there, and the server-side
+converters must print it the way ``JSON.stringify`` does.
+"""
+
+import pytest
+
+from app.services.conversion import convert_all, js_number
+
+
+@pytest.mark.parametrize("value, expected", [
+    (2 ** 53 - 1, "9007199254740991"),
+    (2 ** 53 + 1, "9007199254740992"),
+    (123456789012345678901, "123456789012345680000"),
+    (-(10 ** 22), "-1e+22"),
+    (10 ** 400, "null"),
+])
+def test_js_number_large_integers(value, expected):
+    assert js_number(value) == expected
+
+
+def test_large_integers_in_every_format():
+    texts = convert_all({"id": 123456789012345678901})
+
+    for name, text in texts.items():
+        assert "123456789012345680000" in text, name
+        assert "123456789012345678901" not in text, name
@@ -0,0 +1,67 @@
+"""
+Regression tests: live revisions targeting a vendor that is not enabled.
+
+The vendor is resolved when the revision is submitted, so the router can
+answer with an error instead of the session sending nothing at all.
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import LiveRevision
+from app.services.live import LiveSession
+from app.services.openai_service import OpenAIService
+
+
+def _resolver(openai: OpenAIService):
+    """Vendor resolver with only OpenAI enabled, like a server without other API keys."""
+    def vendor(name: str):
+        if name != "openai":
+            raise HTTPException(status_code=404, detail=f"Vendor {name} is not enabled on this server")
+        return openai
+    return vendor
+
+
+def _revision(number: int, vendor: str) -> LiveRevision:
+    return LiveRevision(
+        revision=number,
+        texts={"json": '{"key": "value"}'},
+        targets=[{"vendor": vendor, "model": "gpt-4o"}]
+    )
+
+
+async def _submit_disabled_then_enabled():
+    messages = []
+
+    async def send(message: str) -> None:
+        messages.append(json.loads(message))
+
+    session = LiveSession(_resolver(OpenAIService()), send, debounce_seconds=0.01)
+    session.start()
+    try:
+        with pytest.raises(ValueError, match="google is not enabled"):
+            session.submit(_revision(1, "google"))
+        await asyncio.sleep(0.05)
+        assert messages == []
+
+        # A rejected revision leaves the session usable
+        session.submit(_revision(1, "openai"))
+        for _ in range(100):
+            if any("counted" in message for message in messages):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await session.close()
+    return messages
+
+
+def test_disabled_vendor_is_rejected_on_submit():
+    messages = asyncio.run(_submit_disabled_then_enabled())
+
+    counts = [message for message in messages if "token_count" in message]
+    assert [(count["vendor"], count["format"]) for count in counts] == [("openai", "json")]
+    assert messages[-1]["revision"] == 1
+    assert messages[-1]["counted"] == 1
@@ -0,0 +1,34 @@
+"""
+Regression tests: sampled counting of arrays too small to sample.
+
+A document whose array holds fewer records than the pilot sample (with a
+low ``min_records``) must be counted exactly rather than returning no
+counts.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.conversion import FORMAT_NAMES
+from app.services.openai_service import OpenAIService
+from app.services.sampling import SamplingOptions, count_sampled
+
+
+@pytest.mark.parametrize("records", [[], [{"id": 1, "name": "alpha"}]], ids=["empty", "one_record"])
+def test_small_arrays_are_counted_exactly(records):
+    service = OpenAIService()
+    texts = {name: "" for name in FORMAT_NAMES}
+    texts["json"] = json.dumps({"users": records})
+
+    batch = asyncio.run(
+        count_sampled(service, texts, "gpt-4o", 0.01, SamplingOptions(min_records=0, cluster_size=1))
+    )
+
+    assert not batch.sampled
+    assert batch.records == len(records)
+    assert set(batch.counts) == set(FORMAT_NAMES)
+    for count in batch.counts.values():
+        assert count.exact
+        assert count.count > 0
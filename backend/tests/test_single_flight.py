@@ -0,0 +1,58 @@
+"""
+Regression tests: cancelling the waiters of a shared single-flight call.
+
+By default the shared call outlives its cancelled waiters so its result is
+still cached; only callers that opt in with ``cancel_when_abandoned`` stop
+it once every waiter has gone.
+"""
+
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+async def _abandon(cancel_when_abandoned: bool, pinned_waiter: bool = False):
+    """Start a shared call, cancel its waiters, and report whether it finished."""
+    flight = SingleFlight()
+    finished = asyncio.Event()
+
+    async def call() -> int:
+        await asyncio.sleep(0.05)
+        finished.set()
+        return 1
+
+    waiters = [
+        asyncio.ensure_future(flight.do("key", call, cancel_when_abandoned=cancel_when_abandoned))
+        for _ in range(2)
+    ]
+    if pinned_waiter:
+        waiters.append(asyncio.ensure_future(flight.do("key", call)))
+    await asyncio.sleep(0.01)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+
+    await asyncio.sleep(0.1)
+    return finished.is_set(), flight
+
+
+def test_shared_call_survives_cancelled_waiters_by_default():
+    finished, flight = asyncio.run(_abandon(cancel_when_abandoned=False))
+
+    assert finished
+    assert flight.abandoned == 0
+
+
+def test_shared_call_cancelled_when_abandoned_by_opted_in_waiters():
+    finished, flight = asyncio.run(_abandon(cancel_when_abandoned=True))
+
+    assert not finished
+    assert flight.abandoned == 1
+    assert flight.in_flight == 0
+
+
+def test_shared_call_survives_when_any_waiter_did_not_opt_in():
+    finished, flight = asyncio.run(_abandon(cancel_when_abandoned=True, pinned_waiter=True))
+
+    assert finished
+    assert flight.abandoned == 0